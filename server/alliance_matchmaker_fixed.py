@@ -1,5 +1,6 @@
 # Make sure numpy and fastapi are installed:
 # pip install numpy fastapi
+import os
 import numpy as np
 from typing import Dict, List, Any, Optional, Union, Tuple
 import asyncio
@@ -7,12 +8,37 @@ from fastapi import HTTPException
 # We'll keep these imports for type hinting and potential future use
 from epa_calculator import EPACalculator
 from epa_parallel import ParallelEPAProcessor
+from opr import compute_weighted_opr
+
+# How phase strengths are estimated: "even" splits alliance component scores among partners,
+# "opr" solves component OPR over every match the matchmaker was given
+COMPONENT_MODELS = ("even", "opr")
+DEFAULT_COMPONENT_MODEL = os.getenv("FTC_MATCHMAKER_COMPONENTS", "even").lower()
+SEASON_WEIGHTS = {2024: 1.0, 2023: 0.7, 2022: 0.5}
 
 class AllianceMatchmaker:
-    def __init__(self):
+    def __init__(self, component_model: Optional[str] = None):
         # No need to create processor and calculator instances
         # We'll use the pre-calculated EPA values directly
-        pass
+        self.component_model = (component_model or DEFAULT_COMPONENT_MODEL).lower()
+        if self.component_model not in COMPONENT_MODELS:
+            raise ValueError(f"Unknown component model: {self.component_model}")
+        self.component_oprs = None
+        self._opr_matches = None
+        self._opr_solve: Optional[asyncio.Future] = None
+
+    def prepare_component_oprs(self, team_matches: Dict[int, Dict[int, List]]):
+        """Solve component OPR over all teams' matches (shared matches counted once, rows weighted by season)."""
+        self.component_oprs = compute_weighted_opr(team_matches, SEASON_WEIGHTS)
+
+    async def ensure_component_oprs(self, team_matches: Dict[int, Dict[int, List]]):
+        """Solve component OPR once per team_matches (off the event loop); concurrent callers share the solve."""
+        if self.component_model != "opr":
+            return
+        if self._opr_solve is None or self._opr_matches is not team_matches:
+            self._opr_matches = team_matches
+            self._opr_solve = asyncio.ensure_future(asyncio.to_thread(self.prepare_component_oprs, team_matches))
+        await self._opr_solve
 
     async def calculate_compatibility_score(self, team1_number: int, team2_number: int, 
                                    team1_matches: Dict[int, List], team2_matches: Dict[int, List],
@@ -100,6 +126,14 @@ class AllianceMatchmaker:
         """
         Calculate a team's average stats across different game phases from match data
         """
+        if self.component_oprs is not None and team_number in self.component_oprs:
+            opr = self.component_oprs.team(team_number)
+            return {
+                "auto": round(max(opr["auto"], 0.0), 1),
+                "teleop": round(max(opr["teleop"], 0.0), 1),
+                "endgame": round(max(opr["endgame"], 0.0), 1)
+            }
+
         # Default values if no matches are found
         total_matches = 0
         auto_score = 0
@@ -107,7 +141,7 @@ class AllianceMatchmaker:
         endgame_score = 0
         
         recent_seasons = [2024, 2023, 2022]  # Focus on most recent seasons, weighted by recency
-        season_weights = {2024: 1.0, 2023: 0.7, 2022: 0.5}
+        season_weights = SEASON_WEIGHTS
         
         for season in recent_seasons:
             season_matches = matches.get(season, [])
@@ -162,6 +196,7 @@ class AllianceMatchmaker:
         """
         try:
             compatibility_scores = []
+            await self.ensure_component_oprs(team_matches)
             
             # Calculate compatibility with each other team at the event
             for other_team in event_teams:
@@ -0,0 +1,259 @@
+"""
+Backtest of match win probabilities against completed events in the local match store.
+
+Each completed event is replayed as of its start date: every team's EPA is
+computed with EPACalculator from the qualification matches it played at
+events that started earlier (the same matches get_team_matches would fetch
+from the API, minus the event being predicted), then every match of the event
+is predicted at once with calculate_win_probabilities and scored against the
+actual result.
+
+Reported per event, per season and overall:
+    brier       mean squared error of the red win probability
+    logLoss     mean negative log-likelihood (probabilities clipped to [1e-6, 1 - 1e-6])
+    accuracy    share of decided matches whose favourite won (ties are skipped)
+    calibration matches bucketed by predicted probability, with the observed red win rate
+
+Events are independent, so they are spread over a process pool; every worker
+loads the match store once and indexes each team's history by event date.
+
+Usage:
+    python backtest.py                          # store from the warm-start snapshot
+    python backtest.py --seasons 2024 --workers 8 --model rating
+    python backtest.py --synthetic 400          # synthetic data from mock_ftc_api.py
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from epa_calculator import EPACalculator
+from match_store import match_store
+
+CALIBRATION_BUCKETS = 10
+PROBABILITY_EPSILON = 1e-6
+DEFAULT_OUTPUT = "backtest_report.json"
+
+
+class TeamHistory:
+    """Qualification matches per (season, team), ordered by event start, for as-of-date lookups."""
+
+    def __init__(self, events: Dict[Tuple[int, str], Dict[str, Any]]):
+        entries = defaultdict(list)
+        for (season, event_code), record in events.items():
+            start = event_start(record)
+            for match in record["matches"]:
+                if str(match.get("tournamentLevel", "")).upper() != "QUALIFICATION":
+                    continue
+                # Tagged like get_team_matches output (the rating model looks matches up by event)
+                tagged = {**match, "eventCode": event_code}
+                for slot in match.get("teams", []):
+                    if slot.get("teamNumber") is not None:
+                        entries[(season, slot["teamNumber"])].append((start, tagged))
+        self.starts: Dict[Tuple[int, int], List[str]] = {}
+        self.matches: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for key, team_entries in entries.items():
+            team_entries.sort(key=lambda entry: entry[0])
+            self.starts[key] = [start for start, _ in team_entries]
+            self.matches[key] = [match for _, match in team_entries]
+
+    def matches_before(self, team_number: int, seasons, cutoff: str) -> Dict[int, List[Dict[str, Any]]]:
+        """{season: matches} from events that started before `cutoff` (YYYY-MM-DD)."""
+        history = {}
+        for season in seasons:
+            key = (season, team_number)
+            if key not in self.starts:
+                continue
+            count = bisect.bisect_left(self.starts[key], cutoff)
+            if count:
+                history[season] = self.matches[key][:count]
+        return history
+
+
+def event_start(record: Dict[str, Any]) -> str:
+    return str((record.get("event") or {}).get("dateStart") or "")[:10]
+
+
+def is_completed(record: Dict[str, Any]) -> bool:
+    """Every non-practice match has a final score (and there is at least one)."""
+    matches = [match for match in record["matches"] if str(match.get("tournamentLevel", "")).upper() != "PRACTICE"]
+    return bool(matches) and all(match.get("scoreRedFinal") is not None and match.get("scoreBlueFinal") is not None
+                                 for match in matches)
+
+
+def score_predictions(probabilities: np.ndarray, outcomes: np.ndarray) -> Dict[str, Any]:
+    """Additive sums for the metrics, so events can be combined exactly before normalizing."""
+    clipped = np.clip(probabilities, PROBABILITY_EPSILON, 1 - PROBABILITY_EPSILON)
+    decided = outcomes != 0.5
+    buckets = np.minimum((probabilities * CALIBRATION_BUCKETS).astype(np.int64), CALIBRATION_BUCKETS - 1)
+    return {
+        "matches": int(len(probabilities)),
+        "decided": int(decided.sum()),
+        "brierSum": float(np.sum((probabilities - outcomes) ** 2)),
+        "logLossSum": float(-np.sum(outcomes * np.log(clipped) + (1 - outcomes) * np.log(1 - clipped))),
+        "correct": int(np.sum((probabilities > 0.5) == (outcomes == 1.0), where=decided)),
+        "bucketCount": np.bincount(buckets, minlength=CALIBRATION_BUCKETS).tolist(),
+        "bucketPredicted": np.bincount(buckets, weights=probabilities, minlength=CALIBRATION_BUCKETS).tolist(),
+        "bucketObserved": np.bincount(buckets, weights=outcomes, minlength=CALIBRATION_BUCKETS).tolist(),
+    }
+
+
+def combine_sums(sums: List[Dict[str, Any]]) -> Dict[str, Any]:
+    combined = {"matches": 0, "decided": 0, "brierSum": 0.0, "logLossSum": 0.0, "correct": 0,
+                "bucketCount": [0] * CALIBRATION_BUCKETS, "bucketPredicted": [0.0] * CALIBRATION_BUCKETS,
+                "bucketObserved": [0.0] * CALIBRATION_BUCKETS}
+    for item in sums:
+        for key in ("matches", "decided", "brierSum", "logLossSum", "correct"):
+            combined[key] += item[key]
+        for key in ("bucketCount", "bucketPredicted", "bucketObserved"):
+            combined[key] = [total + value for total, value in zip(combined[key], item[key])]
+    return combined
+
+
+def summarize(sums: Dict[str, Any]) -> Dict[str, Any]:
+    """Metrics from additive sums."""
+    matches = sums["matches"]
+    calibration = []
+    for bucket, count in enumerate(sums["bucketCount"]):
+        if count:
+            calibration.append({
+                "range": [bucket / CALIBRATION_BUCKETS, (bucket + 1) / CALIBRATION_BUCKETS],
+                "matches": count,
+                "meanPredicted": round(sums["bucketPredicted"][bucket] / count, 4),
+                "observedRedWinRate": round(sums["bucketObserved"][bucket] / count, 4),
+            })
+    return {
+        "matches": matches,
+        "brier": round(sums["brierSum"] / matches, 4) if matches else None,
+        "logLoss": round(sums["logLossSum"] / matches, 4) if matches else None,
+        "accuracy": round(sums["correct"] / sums["decided"], 4) if sums["decided"] else None,
+        "calibration": calibration,
+    }
+
+
+_history: Optional[TeamHistory] = None
+_calculator: Optional[EPACalculator] = None
+
+
+def _init_worker(events: Dict[Tuple[int, str], Dict[str, Any]], model: Optional[str]):
+    global _history, _calculator
+    match_store.clear()
+    match_store.load(events)
+    _history = TeamHistory(events)
+    _calculator = EPACalculator(model)
+
+
+def backtest_event(event_key: Tuple[int, str]) -> Dict[str, Any]:
+    """Predict one stored event's matches from EPAs as of its start date and score them."""
+    season, event_code = event_key
+    record = match_store.get_event(season, event_code)
+    cutoff = event_start(record)
+    matches = [match for match in record["matches"] if str(match.get("tournamentLevel", "")).upper() != "PRACTICE"]
+    red_alliances = [[slot["teamNumber"] for slot in match.get("teams", []) if "Red" in slot.get("station", "")]
+                     for match in matches]
+    blue_alliances = [[slot["teamNumber"] for slot in match.get("teams", []) if "Blue" in slot.get("station", "")]
+                      for match in matches]
+    teams = {team for alliance in red_alliances + blue_alliances for team in alliance}
+    team_epas = {
+        str(team): _calculator.calculate_historical_epa(
+            _history.matches_before(team, _calculator.year_weights, cutoff), team)
+        for team in teams
+    }
+    probabilities = _calculator.calculate_win_probabilities(red_alliances, blue_alliances, team_epas)["red_win_probability"]
+    red_scores = np.asarray([match["scoreRedFinal"] for match in matches], dtype=np.float64)
+    blue_scores = np.asarray([match["scoreBlueFinal"] for match in matches], dtype=np.float64)
+    outcomes = np.where(red_scores > blue_scores, 1.0, np.where(red_scores < blue_scores, 0.0, 0.5))
+    return {
+        "season": season,
+        "eventCode": event_code,
+        "dateStart": cutoff,
+        "teamsWithEPA": sum(1 for epa in team_epas.values() if epa > 0),
+        "teams": len(teams),
+        "sums": score_predictions(probabilities, outcomes),
+    }
+
+
+def run_backtest(seasons: Optional[List[int]] = None, workers: int = 1, model: Optional[str] = None,
+                 events: Optional[Dict[Tuple[int, str], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Backtest every completed event of `seasons` (default: all) in `events` (default: match_store)."""
+    start_time = time.time()
+    events = events if events is not None else match_store.dump()
+    targets = sorted(key for key, record in events.items()
+                     if (not seasons or key[0] in seasons) and is_completed(record))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(events, model)) as pool:
+            results = list(pool.map(backtest_event, targets, chunksize=max(1, len(targets) // (workers * 4))))
+    else:
+        previous = match_store.dump()
+        try:
+            _init_worker(events, model)
+            results = [backtest_event(target) for target in targets]
+        finally:
+            match_store.clear()
+            match_store.load(previous)
+
+    by_season = defaultdict(list)
+    for result in results:
+        by_season[result["season"]].append(result["sums"])
+    return {
+        "model": EPACalculator(model).model,
+        "events": [{key: value for key, value in result.items() if key != "sums"} | summarize(result["sums"])
+                   for result in results],
+        "seasons": {str(season): summarize(combine_sums(sums)) for season, sums in sorted(by_season.items())},
+        "overall": summarize(combine_sums([result["sums"] for result in results])),
+        "durationSeconds": round(time.time() - start_time, 2),
+    }
+
+
+def load_synthetic(num_teams: int, seed: int = 42) -> Dict[Tuple[int, str], Dict[str, Any]]:
+    """Events of a synthetic multi-season dataset, in match_store.dump() form."""
+    from mock_ftc_api import SyntheticSeasonData
+
+    data = SyntheticSeasonData(num_teams, seed=seed)
+    match_store.clear()
+    for season, season_events in data.events.items():
+        for event in season_events:
+            match_store.put_event(season, event["code"], data.matches[event["code"]], event)
+    return match_store.dump()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backtest match win probabilities against completed events")
+    parser.add_argument("--seasons", type=int, nargs="+", help="Seasons to score (default: every stored season)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--model", choices=["average", "rating"], help="EPA model (default: FTC_EPA_MODEL)")
+    parser.add_argument("--snapshot", help="Warm-start snapshot holding the match store (default: FTC_SNAPSHOT_PATH)")
+    parser.add_argument("--synthetic", type=int, metavar="TEAMS", help="Use synthetic data instead of the store")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        events = load_synthetic(args.synthetic)
+    else:
+        import warm_start
+        if not warm_start.load_snapshot(args.snapshot or warm_start.SNAPSHOT_PATH):
+            return 1
+        events = match_store.dump()
+
+    report = run_backtest(args.seasons, args.workers, args.model, events)
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for season, metrics in report["seasons"].items():
+        print(f"{season}: {metrics['matches']} matches  brier {metrics['brier']}  "
+              f"log-loss {metrics['logLoss']}  accuracy {metrics['accuracy']}")
+    overall = report["overall"]
+    print(f"Overall ({report['model']} model): {overall['matches']} matches from {len(report['events'])} events  "
+          f"brier {overall['brier']}  log-loss {overall['logLoss']}  accuracy {overall['accuracy']}  "
+          f"in {report['durationSeconds']}s")
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
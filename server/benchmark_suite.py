@@ -0,0 +1,205 @@
+"""
+Offline end-to-end benchmark suite for the prediction endpoints.
+
+Runs the real FastAPI app in process against the local mock FTC API
+(mock_ftc_api.py), so no credentials or network are needed. For each team
+count it measures latency, throughput and upstream API call counts for the
+heavy endpoints and writes a JSON report that can be diffed between releases.
+
+Usage:
+    python benchmark_suite.py --teams 10 50 200 --output bench_report.json
+    python benchmark_suite.py --compare old_report.json new_report.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+import httpx
+import epa_table
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import set_api_transport
+from warm_start import clear_all_caches
+
+DEFAULT_TEAM_COUNTS = [10, 50, 200]
+BENCH_SEASON = 2024
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(statistics.mean(samples), 4),
+        "p50": round(_percentile(samples, 50), 4),
+        "p95": round(_percentile(samples, 95), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def _endpoint_requests(event_code: str, team_numbers: List[int], matchmaker_teams: int) -> Dict[str, Dict[str, Any]]:
+    return {
+        "/api/event-predictions-epa": {"season": BENCH_SEASON, "eventCode": event_code},
+        "/api/teams/batch-historical-epa": {"teamNumbers": team_numbers},
+        "/api/alliance-matchmaker/batch": {
+            "season": BENCH_SEASON,
+            "eventCode": event_code,
+            "teamNumbers": team_numbers[:matchmaker_teams],
+        },
+    }
+
+
+async def benchmark_endpoint(client: httpx.AsyncClient, mock_app, path: str, payload: Dict[str, Any],
+                             iterations: int, concurrency: int, cold: bool = True) -> Dict[str, Any]:
+    """Measure sequential latency and concurrent throughput for a single endpoint.
+
+    With cold=True every in-process cache is dropped before each measured request.
+    """
+    latencies = []
+    errors = 0
+    calls_before = sum(mock_app.state.calls.values())
+    routes_before = dict(mock_app.state.calls)
+    for _ in range(iterations):
+        if cold:
+            await clear_all_caches()
+        start_time = time.perf_counter()
+        response = await client.post(path, json=payload)
+        latencies.append(time.perf_counter() - start_time)
+        if response.status_code != 200:
+            errors += 1
+    sequential_calls = sum(mock_app.state.calls.values()) - calls_before
+    routes = {route: count - routes_before.get(route, 0) for route, count in mock_app.state.calls.items()
+              if count - routes_before.get(route, 0) > 0}
+
+    if cold:
+        await clear_all_caches()
+    start_time = time.perf_counter()
+    responses = await asyncio.gather(*[client.post(path, json=payload) for _ in range(concurrency)])
+    burst_time = time.perf_counter() - start_time
+    errors += sum(1 for response in responses if response.status_code != 200)
+
+    return {
+        "latencySeconds": _latency_summary(latencies),
+        "throughputRps": round(concurrency / burst_time, 3) if burst_time > 0 else None,
+        "apiCallsPerRequest": round(sequential_calls / iterations, 1),
+        "apiCallsByRoute": {route: round(count / iterations, 1) for route, count in sorted(routes.items())},
+        "errors": errors,
+        "requests": iterations + concurrency,
+    }
+
+
+async def run_benchmarks(team_counts: Optional[List[int]] = None, iterations: int = 3, concurrency: int = 4,
+                         latency_ms: float = 20.0, jitter_ms: float = 5.0, error_rate: float = 0.0,
+                         matchmaker_teams: int = 5, seed: int = 42, verbose: bool = False,
+                         cold: bool = True) -> Dict[str, Any]:
+    """Run the full suite and return the report as a dict."""
+    from main import app
+
+    team_counts = team_counts or DEFAULT_TEAM_COUNTS
+    # Never read a shared EPA table left behind by a local server
+    epa_table.set_table_dir(tempfile.mkdtemp(prefix="bench_epa_table_"))
+    report: Dict[str, Any] = {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "teamCounts": team_counts,
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "latencyMs": latency_ms,
+            "jitterMs": jitter_ms,
+            "errorRate": error_rate,
+            "matchmakerTeams": matchmaker_teams,
+            "seed": seed,
+            "coldCaches": cold,
+        },
+        "results": [],
+    }
+
+    for num_teams in team_counts:
+        event_code = f"BENCH{num_teams}"
+        mock_app = create_mock_ftc_api(num_teams, event_code, seed, latency_ms, jitter_ms, error_rate)
+        set_api_transport(httpx.ASGITransport(app=mock_app))
+        team_numbers = mock_app.state.data.team_numbers
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                         base_url="http://benchmark", timeout=None) as client:
+                for path, payload in _endpoint_requests(event_code, team_numbers, matchmaker_teams).items():
+                    print(f"Benchmarking {path} with {num_teams} teams")
+                    log_sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+                    with log_sink:
+                        result = await benchmark_endpoint(client, mock_app, path, payload, iterations,
+                                                          concurrency, cold)
+                    result.update({"endpoint": path, "teams": num_teams})
+                    report["results"].append(result)
+                    print(f"  mean {result['latencySeconds']['mean']:.3f}s, "
+                          f"{result['throughputRps']} req/s, {result['apiCallsPerRequest']} API calls/request")
+        finally:
+            set_api_transport(None)
+
+    return report
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return per-endpoint/team-count deltas between two reports."""
+    old_results = {(r["endpoint"], r["teams"]): r for r in old.get("results", [])}
+    rows = []
+    for result in new.get("results", []):
+        previous = old_results.get((result["endpoint"], result["teams"]))
+        if not previous:
+            continue
+        old_mean = previous["latencySeconds"]["mean"]
+        new_mean = result["latencySeconds"]["mean"]
+        rows.append({
+            "endpoint": result["endpoint"],
+            "teams": result["teams"],
+            "meanLatencyChangePct": round((new_mean - old_mean) / old_mean * 100, 1) if old_mean else None,
+            "apiCallsChange": round(result["apiCallsPerRequest"] - previous["apiCallsPerRequest"], 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite against a mock FTC API")
+    parser.add_argument("--teams", type=int, nargs="+", default=DEFAULT_TEAM_COUNTS)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--matchmaker-teams", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--warm", action="store_true", help="Keep caches between requests")
+    parser.add_argument("--verbose", action="store_true", help="Show server logs while benchmarking")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two existing reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old_file, open(args.compare[1]) as new_file:
+            rows = compare_reports(json.load(old_file), json.load(new_file))
+        for row in rows:
+            print(f"{row['endpoint']:<35} {row['teams']:>4} teams: "
+                  f"latency {row['meanLatencyChangePct'] or 0:+}%, API calls {row['apiCallsChange']:+}")
+        return
+
+    report = asyncio.run(run_benchmarks(
+        args.teams, args.iterations, args.concurrency, args.latency_ms, args.jitter_ms,
+        args.error_rate, args.matchmaker_teams, args.seed, args.verbose, not args.warm,
+    ))
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Wrote benchmark report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Columnar export of the local match store and season EPAs for offline analytics.
+
+A season is written as Hive-style partitions, one file per event plus one for
+the season's team EPAs:
+
+    season=2024/event=USCAFFL/matches.npz   one row per match
+    season=2024/teams.npz                   one row per team (the season table's values)
+    manifest.json                           partitions with their row counts
+
+Files are NumPy .npz archives (loadable with allow_pickle=False) or, when
+pyarrow is installed, Parquet. Partitions are produced one event at a time,
+so only a single event's columns are ever held in memory; the export endpoint
+streams them as an uncompressed zip (the partitions are already compressed),
+encoding each one in a worker thread from a snapshot taken on the event loop.
+
+Usage:
+    python columnar_export.py --output exports/         # every stored season as files
+    python columnar_export.py --seasons 2024 --format parquet --output season2024.zip
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import zipfile
+from typing import AsyncIterator, Dict, Iterator, List, Any, Optional, Tuple
+import numpy as np
+from epa_calculator import EPACalculator
+from match_store import match_store
+from season_table import SeasonTable, build_season_table, current_season_table, season_events, table_from_events
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+FORMATS = ("npz", "parquet")
+ALLIANCE_SLOTS = 3
+SCORE_FIELDS = ("Final", "Auto", "Teleop", "End")
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in FORMATS if fmt != "parquet" or PARQUET_AVAILABLE]
+
+
+def match_columns(matches: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Column arrays for one event's matches; absent teams and scores are 0, matchEPA is per team."""
+    count = len(matches)
+    calculator = EPACalculator()
+    columns = {
+        "matchNumber": np.asarray([match.get("matchNumber") or 0 for match in matches], dtype=np.int32),
+        "tournamentLevel": np.asarray([str(match.get("tournamentLevel") or "").upper() for match in matches],
+                                      dtype=str),
+        "series": np.asarray([match.get("series") or 0 for match in matches], dtype=np.int16),
+        "actualStartTime": np.asarray([match.get("actualStartTime") or "" for match in matches], dtype=str),
+        "played": np.asarray([match.get("scoreRedFinal") is not None for match in matches], dtype=bool),
+    }
+    for color in ("Red", "Blue"):
+        slots = np.zeros((count, ALLIANCE_SLOTS), dtype=np.int32)
+        match_epa = np.zeros(count, dtype=np.float32)
+        for row, match in enumerate(matches):
+            alliance = [slot["teamNumber"] for slot in match.get("teams", []) if color in slot.get("station", "")]
+            slots[row, :len(alliance)] = alliance[:ALLIANCE_SLOTS]
+            if alliance:
+                match_epa[row] = calculator.calculate_match_epa(match, alliance[0])
+        for slot in range(ALLIANCE_SLOTS):
+            columns[f"{color.lower()}{slot + 1}"] = slots[:, slot]
+        for field in SCORE_FIELDS:
+            columns[f"score{color}{field}"] = np.asarray(
+                [match.get(f"score{color}{field}") or 0 for match in matches], dtype=np.int32)
+        columns[f"{color.lower()}MatchEPA"] = match_epa
+    return columns
+
+
+def team_columns(table: SeasonTable) -> Dict[str, np.ndarray]:
+    """The season table's per-team columns (EPA, component averages, match and event counts, rank)."""
+    return {**table.columns, "rank": table.ranks}
+
+
+def event_path(season: int, event_code: str, fmt: str) -> str:
+    return f"season={season}/event={event_code}/matches.{fmt}"
+
+
+def teams_path(season: int, fmt: str) -> str:
+    return f"season={season}/teams.{fmt}"
+
+
+def encode(columns: Dict[str, np.ndarray], fmt: str = "npz") -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "parquet":
+        if not PARQUET_AVAILABLE:
+            raise ValueError("Parquet export needs pyarrow")
+        table = pyarrow.table({name: pyarrow.array(values) for name, values in columns.items()})
+        pyarrow.parquet.write_table(table, buffer)
+    elif fmt == "npz":
+        np.savez_compressed(buffer, **columns)
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return buffer.getvalue()
+
+
+def export_partitions(seasons: List[int], fmt: str = "npz") -> Iterator[Tuple[str, bytes, int]]:
+    """(relative path, encoded file, row count) per partition, one event at a time."""
+    for season in seasons:
+        for _, event_code in match_store.events(season):
+            matches = match_store.event_matches(season, event_code)
+            yield event_path(season, event_code, fmt), encode(match_columns(matches), fmt), len(matches)
+        columns = team_columns(current_season_table(season) or build_season_table(season))
+        yield teams_path(season, fmt), encode(columns, fmt), len(columns["teamNumber"])
+
+
+def manifest(fmt: str, partitions: List[Tuple[str, int]]) -> bytes:
+    return json.dumps({
+        "format": fmt,
+        "partitions": [{"path": path, "rows": rows} for path, rows in partitions],
+    }, indent=2).encode()
+
+
+class _ChunkBuffer:
+    """Write-only, unseekable sink: zipfile falls back to data descriptors and chunks can be drained."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(seasons: List[int], fmt: str = "npz",
+               written: Optional[List[Tuple[str, int]]] = None) -> Iterator[bytes]:
+    """Zip archive of every partition plus manifest.json, yielded as each partition is written."""
+    sink = _ChunkBuffer()
+    written = [] if written is None else written
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for path, data, rows in export_partitions(seasons, fmt):
+            archive.writestr(path, data)
+            written.append((path, rows))
+            yield sink.drain()
+        archive.writestr("manifest.json", manifest(fmt, written))
+    yield sink.drain()
+
+
+def _encode_event(matches: List[Dict[str, Any]], fmt: str) -> bytes:
+    return encode(match_columns(matches), fmt)
+
+
+async def stream_season_zip(season: int, fmt: str = "npz") -> AsyncIterator[bytes]:
+    """stream_zip for one season, for the event loop.
+
+    The season's events (and, if the cached season table is out of date, the
+    table's inputs) are snapshotted on the loop, so match_store is never read
+    from a thread while the loop stores events; partitions are encoded with
+    asyncio.to_thread.
+    """
+    events = [(event_code, match_store.event_matches(season, event_code))
+              for _, event_code in match_store.events(season)]
+    table = current_season_table(season)
+    table_inputs = None if table is not None else (season_events(season), match_store.last_updated(season))
+    sink = _ChunkBuffer()
+    written = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for event_code, matches in events:
+            path = event_path(season, event_code, fmt)
+            archive.writestr(path, await asyncio.to_thread(_encode_event, matches, fmt))
+            written.append((path, len(matches)))
+            yield sink.drain()
+        if table is None:
+            table = await asyncio.to_thread(table_from_events, season, *table_inputs)
+        columns = team_columns(table)
+        path = teams_path(season, fmt)
+        archive.writestr(path, await asyncio.to_thread(encode, columns, fmt))
+        written.append((path, len(columns["teamNumber"])))
+        yield sink.drain()
+        archive.writestr("manifest.json", manifest(fmt, written))
+    yield sink.drain()
+
+
+def write_export(output: str, seasons: List[int], fmt: str = "npz") -> List[Tuple[str, int]]:
+    """Write the export to a directory tree, or to a zip archive when output ends in .zip."""
+    written = []
+    if output.endswith(".zip"):
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "wb") as output_file:
+            for chunk in stream_zip(seasons, fmt, written):
+                output_file.write(chunk)
+        return written
+    for path, data, rows in export_partitions(seasons, fmt):
+        full_path = os.path.join(output, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as partition_file:
+            partition_file.write(data)
+        written.append((path, rows))
+    with open(os.path.join(output, "manifest.json"), "wb") as manifest_file:
+        manifest_file.write(manifest(fmt, written))
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export stored matches and season EPAs as columnar partitions")
+    parser.add_argument("--seasons", type=int, nargs="+", help="Seasons to export (default: every stored season)")
+    parser.add_argument("--format", choices=FORMATS, default="npz")
+    parser.add_argument("--snapshot", help="Warm-start snapshot holding the match store (default: FTC_SNAPSHOT_PATH)")
+    parser.add_argument("--output", default="export", help="Directory, or a .zip path")
+    args = parser.parse_args(argv)
+
+    if args.format not in available_formats():
+        print("Parquet export needs pyarrow (pip install pyarrow)")
+        return 1
+    import warm_start
+    if not warm_start.load_snapshot(args.snapshot or warm_start.SNAPSHOT_PATH):
+        return 1
+    written = write_export(args.output, args.seasons or match_store.seasons(), args.format)
+    print(f"Wrote {len(written)} partitions ({sum(rows for _, rows in written)} rows) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
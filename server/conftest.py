@@ -0,0 +1,10 @@
+import pytest
+from utils.circuit_breaker import api_breaker
+
+
+@pytest.fixture(autouse=True)
+def reset_api_breaker():
+    """The FTC API circuit breaker is process-wide; don't let one test's failures open it for the next."""
+    api_breaker.reset()
+    yield
+    api_breaker.reset()
@@ -5,151 +5,255 @@ import asyncio
 import httpx
 import math
 import time
-from typing import Optional
+from typing import Dict, List, Optional, Sequence
+import numpy as np
 from fastapi import HTTPException
 from utils.api_utils import ftc_api_request
+from match_fetch import fetch_event_matches_by_level
+from rating_engine import RATING_K, current_season_ratings, refresh_season_ratings
+
+# "average": recency-weighted average of per-match EPAs from the team's own matches
+# "rating": chronological rating from one pass over the season's stored matches (rating_engine.py)
+EPA_MODELS = ("average", "rating")
+DEFAULT_EPA_MODEL = os.getenv("FTC_EPA_MODEL", "average").lower()
+
+
+def parse_year_weights(value: str) -> Dict[int, float]:
+    """"2024:1.0,2023:0.7" -> {2024: 1.0, 2023: 0.7}"""
+    weights = {}
+    for item in value.split(","):
+        if item.strip():
+            season, _, weight = item.partition(":")
+            weights[int(season)] = float(weight)
+    return weights
+
+
+def parse_seasons(value: str) -> List[int]:
+    """"2022-2024" or "2022,2023,2024" -> [2022, 2023, 2024]"""
+    seasons = set()
+    for item in value.split(","):
+        first, _, last = item.strip().partition("-")
+        if first:
+            seasons.update(range(int(first), int(last or first) + 1))
+    return sorted(seasons)
+
+
+# Seasons get_team_matches fetches; older data seems unreliable
+DEFAULT_SEASONS = parse_seasons(os.getenv("FTC_EPA_SEASONS", "2022-2024"))
+# Lazy mode fetches older seasons only for teams with fewer newest-season matches than the threshold.
+# Off by default: it drops older seasons from established teams' EPAs, changing their values.
+DEFAULT_LAZY_HISTORY = os.getenv("FTC_EPA_LAZY_HISTORY", "0").lower() in ("1", "true", "yes")
+DEFAULT_HISTORY_THRESHOLD = int(os.getenv("FTC_EPA_HISTORY_THRESHOLD", "12"))
+
+# Tunable parameters (see sweep.py for searching them against historical events)
+DEFAULT_YEAR_WEIGHTS = parse_year_weights(os.getenv("FTC_EPA_YEAR_WEIGHTS", "2024:1.0,2023:0.7,2022:0.5"))
+# Weight of the last match in a season relative to the first is 1 + slope
+DEFAULT_RECENCY_SLOPE = float(os.getenv("FTC_EPA_RECENCY_SLOPE", "0.2"))
+# ΔEPA giving 10:1 win odds in 1/(1 + 10^(-ΔEPA/divisor))
+DEFAULT_WIN_PROBABILITY_DIVISOR = float(os.getenv("FTC_WIN_PROBABILITY_DIVISOR", "400"))
+
+# What calculate_match_win_probability returns when a matchup cannot be scored
+TIE_PREDICTION = {
+    'red_win_probability': 0.5,
+    'blue_win_probability': 0.5,
+    'predicted_winner': 'Tie',
+    'winner_color': '#ffffff',  # White for tie
+    'win_margin': 0
+}
+
+def alliance_epa_sums(alliances: Sequence[Sequence], team_index: Dict[str, int], epa_vector: np.ndarray) -> np.ndarray:
+    """Sum of team EPAs per alliance; teams missing from team_index use the last (0.0) slot of epa_vector."""
+    missing = len(epa_vector) - 1
+    positions = [team_index.get(str(team), missing) for alliance in alliances for team in alliance]
+    rows = np.repeat(np.arange(len(alliances)), [len(alliance) for alliance in alliances])
+    return np.bincount(rows, weights=epa_vector[positions], minlength=len(alliances))
+
+def _record_failure(failures: Optional[List[str]], source: str, error: object):
+    if failures is None or not isinstance(error, Exception):
+        return
+    if isinstance(error, HTTPException):
+        if error.status_code == 404:
+            return
+        error = f"{error.status_code} {error.detail}"
+    failures.append(f"{source}: {error}")
 
 class EPACalculator:
-    def __init__(self):
-        self.year_weights = {
-            2024: 1.0,
-            2023: 0.7,
-            2022: 0.5
-        }
-        self.k = 12  # EPA scaling factor for win probability
-
-    async def get_team_matches(self, team_number: int, start_date: Optional[str] = None) -> dict:
+    def __init__(self, model: Optional[str] = None, year_weights: Optional[Dict[int, float]] = None,
+                 recency_slope: Optional[float] = None, k: Optional[float] = None,
+                 divisor: Optional[float] = None, seasons: Optional[Sequence[int]] = None,
+                 lazy_history: Optional[bool] = None, history_threshold: Optional[int] = None):
+        self.model = (model or DEFAULT_EPA_MODEL).lower()
+        if self.model not in EPA_MODELS:
+            raise ValueError(f"Unknown EPA model: {self.model}")
+        self.year_weights = dict(year_weights if year_weights is not None else DEFAULT_YEAR_WEIGHTS)
+        self.recency_slope = DEFAULT_RECENCY_SLOPE if recency_slope is None else recency_slope
+        # Rating-model update rate: fraction of an alliance's prediction error applied per match
+        self.k = RATING_K if k is None else k
+        self.divisor = DEFAULT_WIN_PROBABILITY_DIVISOR if divisor is None else divisor
+        self.seasons = sorted(seasons if seasons is not None else DEFAULT_SEASONS)
+        if not self.seasons:
+            raise ValueError("At least one season is required")
+        self.lazy_history = DEFAULT_LAZY_HISTORY if lazy_history is None else lazy_history
+        self.history_threshold = DEFAULT_HISTORY_THRESHOLD if history_threshold is None else history_threshold
+
+    async def get_team_matches(self, team_number: int, start_date: Optional[str] = None,
+                               full_history: Optional[bool] = None,
+                               failures: Optional[List[str]] = None) -> dict:
+        """Qualification matches per season, newest season first; each season in event date order.
+
+        In lazy mode (FTC_EPA_LAZY_HISTORY, unless full_history is requested) older
+        seasons are only fetched when the newest season has fewer than
+        history_threshold matches for the team.
+
+        Failed requests are skipped; pass a failures list to have them recorded
+        (404s, i.e. no data, are not failures).
+        """
         all_matches = {}
-        
-        # Only fetch from 2022 onwards as older data seems unreliable
-        for season in range(2022, 2025):
-            try:
-                # Fetch events for the season with increased limit
-                events_response = await ftc_api_request(f"/{season}/events", {
-                    "teamNumber": team_number,
-                    "limit": 50  # Increase limit to reduce pagination
-                })
-                
-                if not events_response or not isinstance(events_response, dict):
-                    print(f"Invalid or empty response for season {season}")
-                    continue
+        if full_history is None:
+            full_history = not self.lazy_history
+        newest, *older = sorted(self.seasons, reverse=True)
+
+        newest_matches = await self._fetch_season_matches(team_number, newest, start_date, failures)
+        if newest_matches:
+            all_matches[newest] = newest_matches
+        if not older:
+            return all_matches
+        if not full_history and len(newest_matches or []) >= self.history_threshold:
+            print(f"Skipping older seasons for team {team_number}: "
+                  f"{len(newest_matches)} matches in season {newest}")
+            return all_matches
+
+        older_matches = await asyncio.gather(*[
+            self._fetch_season_matches(team_number, season, start_date, failures) for season in older
+        ])
+        for season, season_matches in zip(older, older_matches):
+            if season_matches:
+                all_matches[season] = season_matches
+        return all_matches
+
+    async def _fetch_season_matches(self, team_number: int, season: int, start_date: Optional[str] = None,
+                                    failures: Optional[List[str]] = None) -> Optional[list]:
+        """One season's qualification matches for the team (None if there are none or the season failed)."""
+        try:
+            events_response = await ftc_api_request(f"/{season}/events", {"teamNumber": team_number})
+            
+            if not events_response or not isinstance(events_response, dict):
+                print(f"Invalid or empty response for season {season}")
+                return None
+
+            events = events_response.get("events", [])
+            if not events:
+                print(f"No events found for team {team_number} in season {season}")
+                return None
 
-                events = events_response.get("events", [])
-                if not events:
-                    print(f"No events found for team {team_number} in season {season}")
+            # Prepare parallel requests for each event's matches
+            match_tasks = []
+            for event in events:
+                if not event or not isinstance(event, dict):
+                    print(f"Skipping invalid event data in season {season}")
                     continue
 
-                # Prepare parallel requests for qualification matches only
-                match_tasks = []
-                for event in events:
-                    if not event or not isinstance(event, dict):
-                        print(f"Skipping invalid event data in season {season}")
-                        continue
-
-                    event_code = event.get('code')
-                    if not event_code:
-                        print(f"Skipping event with missing code in season {season}")
-                        continue
-                        
-                    event_date = event.get('dateStart', '')
-                    if not event_date:
-                        print(f"No start date for event {event_code}, using default future date")
-                        event_date = '9999-99-99'
-                    else:
-                        event_date = event_date[:10]
-                    
-                    try:
-                        event_year = int(event_date[:4])
-                    except (ValueError, TypeError):
-                        print(f"Invalid date format for event {event_code}: {event_date}")
-                        continue
-
-                    if event_year < season:
-                        print(f"Skipping event {event_code} as event year {event_year} is less than season {season}")
-                        continue
-
-                    if start_date and event_date > start_date[:10]:
-                        print(f"Skipping event {event_code} as event date {event_date} is after start_date {start_date[:10]}")
-                        continue
-                        
-                    print(f"Requesting matches for team {team_number} at event {event_code} in season {season}")
-                    start_time = time.time()
+                event_code = event.get('code')
+                if not event_code:
+                    print(f"Skipping event with missing code in season {season}")
+                    continue
                     
-                    match_tasks.append({
-                        'event': event,
-                        'task': ftc_api_request(
-                            f"/{season}/matches/{event_code}", 
-                            {
-                                "tournamentLevel": "qual",
-                                "teamNumber": team_number,
-                                "limit": 100  # Increase limit to reduce pagination
-                            }
-                        ),
-                        'start_time': start_time
-                    })
+                event_date = event.get('dateStart', '')
+                if not event_date:
+                    print(f"No start date for event {event_code}, using default future date")
+                    event_date = '9999-99-99'
+                else:
+                    event_date = event_date[:10]
                 
-                if not match_tasks:
-                    print(f"No valid events found for team {team_number} in season {season}")
+                try:
+                    event_year = int(event_date[:4])
+                except (ValueError, TypeError):
+                    print(f"Invalid date format for event {event_code}: {event_date}")
                     continue
+
+                if event_year < season:
+                    print(f"Skipping event {event_code} as event year {event_year} is less than season {season}")
+                    continue
+
+                if start_date and event_date > start_date[:10]:
+                    print(f"Skipping event {event_code} as event date {event_date} is after start_date {start_date[:10]}")
+                    continue
+                    
+                print(f"Requesting matches for team {team_number} at event {event_code} in season {season}")
+                start_time = time.time()
                 
-                print(f"Processing {len(match_tasks)} events for team {team_number} in season {season}")
-                  # Execute all requests in parallel with timeout and concurrency limiting
-                concurrency_limit = 20  # Limit concurrent requests to avoid overwhelming the API
-                
-                # Group tasks into chunks of concurrency_limit size
-                async def process_chunk(chunk):
-                    return await asyncio.gather(*[task['task'] for task in chunk], return_exceptions=True)
-                
-                chunks = [match_tasks[i:i + concurrency_limit] for i in range(0, len(match_tasks), concurrency_limit)]
-                all_results = []
-                
-                for chunk in chunks:
-                    chunk_results = await process_chunk(chunk)
-                    all_results.extend(chunk_results)
+                match_tasks.append({
+                    'event': event,
+                    # One unfiltered call per event, split by level locally
+                    'task': fetch_event_matches_by_level(
+                        season, event_code, team_number, request=ftc_api_request
+                    ),
+                    'start_time': start_time
+                })
+            
+            if not match_tasks:
+                print(f"No valid events found for team {team_number} in season {season}")
+                return None
+            
+            print(f"Processing {len(match_tasks)} events for team {team_number} in season {season}")
+              # Execute all requests in parallel with timeout and concurrency limiting
+            concurrency_limit = 20  # Limit concurrent requests to avoid overwhelming the API
+            
+            # Group tasks into chunks of concurrency_limit size
+            async def process_chunk(chunk):
+                return await asyncio.gather(*[task['task'] for task in chunk], return_exceptions=True)
+            
+            chunks = [match_tasks[i:i + concurrency_limit] for i in range(0, len(match_tasks), concurrency_limit)]
+            all_results = []
+            
+            for chunk in chunks:
+                chunk_results = await process_chunk(chunk)
+                all_results.extend(chunk_results)
+            
+            match_results = all_results
+            
+            # Process results and filter for Qualification matches
+            season_matches = []
+            for result, task_info in zip(match_results, match_tasks):
+                end_time = time.time()
+                response_time = end_time - task_info['start_time']
+                event_code = task_info['event'].get('code', 'unknown')
                 
-                match_results = all_results
+                if isinstance(result, Exception) or not isinstance(result, dict):
+                    print(f"Error fetching matches for event {event_code}: {str(result)}")
+                    _record_failure(failures, f"{season}/{event_code}", result)
+                    continue
                 
-                # Process results and filter for Qualification matches
-                season_matches = []
-                for result, task_info in zip(match_results, match_tasks):
-                    end_time = time.time()
-                    response_time = end_time - task_info['start_time']
-                    event_code = task_info['event'].get('code', 'unknown')
-                    
-                    if isinstance(result, Exception) or not isinstance(result, dict):
-                        print(f"Error fetching matches for event {event_code}: {str(result)}")
-                        continue
-                    
-                    print(f"Received response for event {event_code} in {response_time:.2f} seconds")
-                    
-                    matches = result.get("matches", [])
-                    if not matches:
-                        print(f"No matches found for event {event_code}")
-                        continue
-
-                    match_count = 0
-                    for match in matches:
-                        if not match or not isinstance(match, dict):
-                            continue
-                        if match.get('tournamentLevel', '').upper() == "QUALIFICATION":
-                            match["eventCode"] = task_info['event'].get('code')
-                            match["eventName"] = task_info['event'].get('name')
-                            season_matches.append(match)
-                            match_count += 1
-                    
-                    print(f"Added {match_count} qualification matches from event {event_code}")
+                print(f"Received response for event {event_code} in {response_time:.2f} seconds")
                 
-                if season_matches:
-                    print(f"Total {len(season_matches)} matches found for season {season}")
-                    all_matches[season] = season_matches
-                else:
-                    print(f"No qualification matches found for season {season}")
+                matches = result.get("qual", [])
+                if not matches:
+                    print(f"No qualification matches found for event {event_code}")
+                    continue
+
+                match_count = 0
+                for match in matches:
+                    match["eventCode"] = task_info['event'].get('code')
+                    match["eventName"] = task_info['event'].get('name')
+                    match["eventDate"] = (task_info['event'].get('dateStart') or '')[:10]
+                    season_matches.append(match)
+                    match_count += 1
                 
-            except Exception as e:
-                print(f"Error processing season {season}: {str(e)}")
-                continue
-        
-        return all_matches
+                print(f"Added {match_count} qualification matches from event {event_code}")
+            
+            if season_matches:
+                print(f"Total {len(season_matches)} matches found for season {season}")
+                # Recency weighting follows list order, so order events by date (stable within an event)
+                season_matches.sort(key=lambda match: match["eventDate"] or "9999-99-99")
+                return season_matches
+            print(f"No qualification matches found for season {season}")
+            return None
+            
+        except Exception as e:
+            print(f"Error processing season {season}: {str(e)}")
+            _record_failure(failures, str(season), e)
+            return None
+    
 
     def calculate_match_epa(self, match: dict, team_number: int) -> float:
         try:
@@ -209,12 +313,28 @@ class EPACalculator:
 
         # Calculate average EPA for the season
         # More recent matches within a season are weighted slightly higher
-        weights = [1.0 + (i / len(match_epas) * 0.2) for i in range(len(match_epas))]
+        weights = [1.0 + (i / len(match_epas) * self.recency_slope) for i in range(len(match_epas))]
         weighted_sum = sum(epa * weight for epa, weight in zip(match_epas, weights))
         total_weight = sum(weights)
 
         return weighted_sum / total_weight if total_weight > 0 else 0.0
 
+    async def prepare_ratings(self, all_matches: dict):
+        """Rating model: bring the given seasons' ratings up to date, replaying them off the event loop."""
+        if self.model != "rating":
+            return
+        for season in all_matches:
+            if str(season).isdigit() and int(season) in self.year_weights:
+                await refresh_season_ratings(int(season), self.k, self.divisor)
+
+    def calculate_rating_epa(self, season: int, matches: list, team_number) -> float:
+        """Season rating after the team's latest given match; falls back to the average when it is not stored."""
+        ratings = current_season_ratings(season, self.k, self.divisor) if matches else None
+        rating = ratings.rating_after_matches(int(team_number), matches) if ratings is not None else None
+        if rating is None:
+            return self.calculate_season_epa(matches, team_number)
+        return rating
+
     def calculate_historical_epa(self, all_matches: dict, team_number) -> float:
         if not all_matches:
             return 0.0
@@ -226,7 +346,10 @@ class EPACalculator:
             try:
                 season_year = int(season)
                 if season_year in self.year_weights:
-                    season_epa = self.calculate_season_epa(matches, team_number)
+                    if self.model == "rating":
+                        season_epa = self.calculate_rating_epa(season_year, matches, team_number)
+                    else:
+                        season_epa = self.calculate_season_epa(matches, team_number)
                     year_weight = self.year_weights[season_year]
                     
                     weighted_sum += season_epa * year_weight
@@ -236,6 +359,33 @@ class EPACalculator:
 
         return weighted_sum / total_weight if total_weight > 0 else 0.0
 
+    def calculate_win_probabilities(self, red_alliances: Sequence[Sequence], blue_alliances: Sequence[Sequence],
+                                    team_epas: dict) -> Dict[str, np.ndarray]:
+        """Vectorized calculate_match_win_probability for many matchups at once.
+
+        Returns arrays (one entry per matchup) of alliance EPA sums and the red
+        win probability 1/(1 + 10^(-ΔEPA/divisor)). Teams without an EPA count as 0.
+        "undetermined" flags the matchups calculate_match_win_probability answers
+        with its 'Tie' fallback: a team whose EPA is None, or a ΔEPA so far in
+        Blue's favor that 10^(-ΔEPA/divisor) overflows.
+        """
+        team_index = {str(team): position for position, team in enumerate(team_epas)}
+        # Extra trailing 0.0 absorbs teams without an EPA
+        epa_vector = np.fromiter((float(epa or 0.0) for epa in team_epas.values()), dtype=np.float64,
+                                 count=len(team_epas))
+        epa_vector = np.append(epa_vector, 0.0)
+        none_vector = np.append(np.fromiter((epa is None for epa in team_epas.values()), dtype=np.float64,
+                                            count=len(team_epas)), 0.0)
+        red_epa = alliance_epa_sums(red_alliances, team_index, epa_vector)
+        blue_epa = alliance_epa_sums(blue_alliances, team_index, epa_vector)
+        with np.errstate(over="ignore"):
+            odds = np.power(10.0, -(red_epa - blue_epa) / self.divisor)
+        red_win_prob = 1 / (1 + odds)
+        undetermined = np.isinf(odds) | ((alliance_epa_sums(red_alliances, team_index, none_vector)
+                                          + alliance_epa_sums(blue_alliances, team_index, none_vector)) > 0)
+        return {"red_epa": red_epa, "blue_epa": blue_epa, "red_win_probability": red_win_prob,
+                "undetermined": undetermined}
+
     def calculate_match_win_probability(self, red_alliance: list, blue_alliance: list, team_epas: dict) -> dict:
         try:
             # Sum EPA scores for each alliance
@@ -246,8 +396,8 @@ class EPACalculator:
             # Calculate EPA difference (ΔEPA)
             epa_diff = red_epa - blue_epa
             
-            # Calculate win probability using the formula: 1/(1 + 10^(-ΔEPA/400))
-            red_win_prob = 1 / (1 + math.pow(10, -epa_diff/400))
+            # Calculate win probability using the formula: 1/(1 + 10^(-ΔEPA/divisor))
+            red_win_prob = 1 / (1 + math.pow(10, -epa_diff/self.divisor))
             blue_win_prob = 1 - red_win_prob
             
             # Determine winner and color styling
@@ -263,10 +413,4 @@ class EPACalculator:
             }
         except Exception as e:
             print(f"Error calculating match win probability: {e}")
-            return {
-                'red_win_probability': 0.5,
-                'blue_win_probability': 0.5,
-                'predicted_winner': 'Tie',
-                'winner_color': '#ffffff',  # White for tie
-                'win_margin': 0
-            }
+            return dict(TIE_PREDICTION)
@@ -1,7 +1,34 @@
 import asyncio
+import os
 import time
 from typing import List, Dict, Any, Optional
-from epa_calculator import EPACalculator
+import numpy as np
+from epa_calculator import EPACalculator, TIE_PREDICTION
+from utils.cache import create_cache
+from utils.deadline import start_deadline, time_remaining
+import epa_table
+
+# Computed team EPAs keyed by (team number, cutoff date); persisted by warm_start.py
+TEAM_EPA_CACHE_TTL = float(os.getenv("FTC_EPA_CACHE_TTL", "1800"))
+# Expired EPAs are kept this long as a fallback for teams whose recalculation fails or times out
+TEAM_EPA_STALE_TTL = float(os.getenv("FTC_EPA_STALE_TTL", "86400"))
+team_epa_cache = create_cache("team_epa", TEAM_EPA_CACHE_TTL, TEAM_EPA_STALE_TTL)
+
+def team_epa_key(team_number, event_start_date: Optional[str] = None) -> str:
+    return f"{team_number}@{(event_start_date or '')[:10]}"
+
+class _TeamEPAFlight:
+    """One in-flight team EPA computation and the number of callers awaiting it."""
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+# Process-wide single-flight registry, keyed like team_epa_cache
+_team_epa_flights: Dict[str, _TeamEPAFlight] = {}
+
+def _forget_flight(cache_key: str, flight: _TeamEPAFlight):
+    if _team_epa_flights.get(cache_key) is flight:
+        del _team_epa_flights[cache_key]
 
 class ParallelEPAProcessor:
     def __init__(self, concurrency_limit: int = 20):
@@ -9,63 +36,192 @@ class ParallelEPAProcessor:
         self.concurrency_limit = concurrency_limit
     
     async def calculate_team_epa(self, team_number: int, event_start_date: Optional[str] = None) -> Dict[str, Any]:
-        """Calculate EPA for a single team."""
+        """Calculate EPA for a single team.
+
+        Concurrent callers for the same (team, cutoff) share one computation.
+        It keeps running while anyone is waiting and is cancelled when the last
+        caller gives up (e.g. its request deadline passed).
+        """
+        cache_key = team_epa_key(team_number, event_start_date)
+        cached = await team_epa_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        flight = _team_epa_flights.get(cache_key)
+        if flight is None or flight.task.done() or flight.task.get_loop() is not asyncio.get_running_loop():
+            flight = _TeamEPAFlight(asyncio.create_task(self._compute_team_epa(team_number, event_start_date, cache_key)))
+            flight.task.add_done_callback(lambda _, key=cache_key, done=flight: _forget_flight(key, done))
+            _team_epa_flights[cache_key] = flight
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+    
+    async def _compute_team_epa(self, team_number: int, event_start_date: Optional[str], cache_key: str) -> Dict[str, Any]:
+        # Shared by callers with different deadlines; its lifetime is governed by its waiters instead
+        start_deadline(None)
         try:
             team_start_time = time.time()
             print(f"Processing team {team_number}")
             
-            matches = await self.calculator.get_team_matches(team_number, event_start_date if event_start_date is not None else "")
+            failures = []
+            matches = await self.calculator.get_team_matches(team_number, event_start_date if event_start_date is not None else "",
+                                                             failures=failures)
+            await self.calculator.prepare_ratings(matches)
             epa = self.calculator.calculate_historical_epa(matches, team_number)
+            if failures:
+                # Computed from partial data: usable when nothing better is available, but never cached
+                print(f"Incomplete match data for team {team_number}: {'; '.join(failures)}")
+                return {"teamNumber": team_number, "historicalEPA": epa, "matches": matches, "status": "degraded",
+                        "error": f"Failed to fetch matches: {'; '.join(failures)}"}
             
             process_time = time.time() - team_start_time
             print(f"Processed team {team_number} in {process_time:.2f} seconds")
             
-            return {"teamNumber": team_number, "historicalEPA": epa, "matches": matches}
+            result = {"teamNumber": team_number, "historicalEPA": epa, "matches": matches}
+            await team_epa_cache.set(cache_key, result)
+            return result
         except Exception as e:
             print(f"Error processing team {team_number}: {str(e)}")
             return {"teamNumber": team_number, "historicalEPA": 0.0, "error": str(e)}
     
     async def calculate_multiple_team_epas(self, team_numbers: List[int], event_start_date: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Calculate EPAs for multiple teams in parallel with concurrency limit."""
+        """Calculate EPAs for multiple teams in parallel with concurrency limit.
+
+        Current EPAs already published in the shared memory-mapped table are read
+        from it instead of being recomputed. Under a request deadline (see
+        utils/deadline.py) teams still running when it expires are cancelled.
+        Every result carries a "status": "fresh", "stale" (an expired cached
+        EPA), "degraded" (computed from partial data) or "missing".
+        """
+        table_rows = {}
+        if epa_table.table_applies(event_start_date):
+            numeric_teams = [team for team in team_numbers if str(team).isdigit()]
+            table_rows = epa_table.get_reader().lookup_many(numeric_teams, max_age=epa_table.MAX_ROW_AGE)
+            if table_rows:
+                print(f"Read {len(table_rows)} of {len(team_numbers)} team EPAs from the shared EPA table")
+        # One batched (pipelined for remote backends) lookup instead of one per team
+        cache_keys = {team: team_epa_key(team, event_start_date) for team in team_numbers}
+        cached_results = await team_epa_cache.get_many(
+            [key for team, key in cache_keys.items() if not str(team).isdigit() or int(team) not in table_rows]
+        )
         semaphore = asyncio.Semaphore(self.concurrency_limit)
         
         async def limited_process_team(team_num):
+            row = table_rows.get(int(team_num)) if str(team_num).isdigit() else None
+            if row is not None:
+                return {
+                    "teamNumber": team_num,
+                    "historicalEPA": row["epa"],
+                    "components": {"auto": row["auto"], "teleop": row["teleop"], "endgame": row["endgame"]},
+                    "source": "epa_table",
+                }
+            cached = cached_results.get(cache_keys[team_num])
+            if cached is not None:
+                return cached
             async with semaphore:
                 return await self.calculate_team_epa(team_num, event_start_date)
         
         start_time = time.time()
         print(f"Starting EPA calculations for {len(team_numbers)} teams")
         
-        # Process all teams concurrently with semaphore limiting
-        tasks = [limited_process_team(team_num) for team_num in team_numbers]
-        results = await asyncio.gather(*tasks)
+        # Process all teams concurrently with semaphore limiting, until the deadline (if any)
+        tasks = [asyncio.create_task(limited_process_team(team_num)) for team_num in team_numbers]
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=time_remaining())
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"Request deadline reached with {len(pending)} team EPAs outstanding")
+        
+        results = []
+        for team_num, task in zip(team_numbers, tasks):
+            result = None if task in pending else task.result()
+            if result is None or result.get("error"):
+                results.append(self.fallback_team_epa(team_num, event_start_date, result))
+            else:
+                results.append({**result, "status": result.get("status", "fresh")})
         
         total_time = time.time() - start_time
         print(f"Completed EPA calculations for {len(team_numbers)} teams in {total_time:.2f} seconds")
         
         return results
     
+    def fallback_team_epa(self, team_number, event_start_date: Optional[str] = None,
+                          failed: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Best available EPA for a team whose calculation failed or ran out of time.
+
+        An expired cached EPA or a shared-table row is preferred over one computed
+        from partial data (a "degraded" result), which beats none at all.
+        """
+        result = {"teamNumber": team_number, "historicalEPA": 0.0, "status": "missing"}
+        if failed and failed.get("error"):
+            result["error"] = failed["error"]
+        stale = team_epa_cache.peek(team_epa_key(team_number, event_start_date))
+        if stale is not None:
+            stored_at, value = stale
+            return {**result, "historicalEPA": value.get("historicalEPA", 0.0), "matches": value.get("matches"),
+                    "status": "stale", "updated": stored_at}
+        if str(team_number).isdigit() and epa_table.table_applies(event_start_date):
+            row = epa_table.get_reader().lookup(int(team_number))
+            if row is not None:
+                return {**result, "historicalEPA": row["epa"], "status": "stale", "updated": row["updated"],
+                        "source": "epa_table"}
+        if failed and failed.get("status") == "degraded":
+            return failed
+        return result
+    
     def get_epa_mapping(self, epa_results: List[Dict[str, Any]]) -> Dict[str, float]:
         """Convert EPA results list to a mapping of team numbers to EPA values."""
         return {str(result['teamNumber']): result.get('historicalEPA', 0.0) for result in epa_results}
     
+    def predict_matches(self, matches: List[Dict[str, Any]], team_epas: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Predict a whole schedule in one vectorized pass.
+
+        Produces exactly what calculate_match_win_probability returns per match,
+        without a coroutine (or a print) per match.
+        """
+        red_alliances = []
+        blue_alliances = []
+        for match in matches:
+            red, blue = [], []
+            for team in match.get('teams') or []:
+                station = team['station']
+                if 'Red' in station:
+                    red.append(team['teamNumber'])
+                elif 'Blue' in station:
+                    blue.append(team['teamNumber'])
+            red_alliances.append(red)
+            blue_alliances.append(blue)
+        
+        probabilities = self.calculator.calculate_win_probabilities(red_alliances, blue_alliances, team_epas)
+        red_win_probs = probabilities['red_win_probability'].tolist()
+        win_margins = np.abs(probabilities['red_epa'] - probabilities['blue_epa']).tolist()
+        undetermined = probabilities['undetermined'].tolist()
+        
+        predictions = []
+        for match, red_win_prob, win_margin, tie in zip(matches, red_win_probs, win_margins, undetermined):
+            if tie:
+                predictions.append({'matchNumber': match['matchNumber'], 'prediction': dict(TIE_PREDICTION)})
+                continue
+            predicted_winner = 'Red' if red_win_prob > 0.5 else 'Blue'
+            predictions.append({
+                'matchNumber': match['matchNumber'],
+                'prediction': {
+                    'red_win_probability': round(red_win_prob, 3),
+                    'blue_win_probability': round(1 - red_win_prob, 3),
+                    'predicted_winner': predicted_winner,
+                    'winner_color': '#fee2e2' if predicted_winner == 'Red' else '#dbeafe',
+                    'win_margin': win_margin
+                }
+            })
+        return predictions
+    
     async def calculate_match_predictions(self, 
                                          matches: List[Dict[str, Any]], 
                                          team_epas: Dict[str, float]) -> List[Dict[str, Any]]:
-        """Calculate predictions for all matches in parallel."""
-        async def process_match(match):
-            red_teams = [team['teamNumber'] for team in match['teams'] if 'Red' in team['station']]
-            blue_teams = [team['teamNumber'] for team in match['teams'] if 'Blue' in team['station']]
-            
-            prediction = self.calculator.calculate_match_win_probability(
-                red_teams, blue_teams, team_epas
-            )
-            
-            return {
-                'matchNumber': match['matchNumber'],
-                'prediction': prediction
-            }
-        
-        # Process all match predictions concurrently
-        tasks = [process_match(match) for match in matches]
-        return await asyncio.gather(*tasks)
+        """Calculate predictions for all matches (vectorized; see predict_matches)."""
+        return self.predict_matches(matches, team_epas)
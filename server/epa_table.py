@@ -0,0 +1,302 @@
+"""
+Memory-mapped team EPA table shared by every uvicorn worker.
+
+The table is a fixed-width NumPy structured array (one row per team, sorted by
+team number) stored as a .npy file per season. Readers open it with
+mmap_mode="r", so all workers share the same page-cache pages and lookups are
+a binary search with no parsing or copying.
+
+Exactly one process is the writer: it takes an exclusive lock on
+`<dir>/.writer.lock` (or is forced with FTC_EPA_TABLE_WRITER=1/0). Every other
+worker periodically hands the current-season EPAs it has computed to the
+writer as `<dir>/pending/team_epa_<season>.<pid>.npy`. The writer claims those
+files, merges them with its own EPAs into the table (the most recently
+computed row per team wins) and publishes it by writing a temporary file and
+os.replace()-ing it into place. Readers notice the new inode and remap; old
+mappings stay valid until dropped.
+
+    FTC_EPA_TABLE_DIR       directory for the table files (default cache/epa_table)
+    FTC_EPA_TABLE_REFRESH   seconds between writer refreshes (default 300)
+    FTC_EPA_TABLE_WRITER    "auto" (lock-elected), "1" or "0"
+    FTC_EPA_TABLE_MAX_AGE   rows older than this many seconds are ignored by readers
+    FTC_CURRENT_SEASON      season the table is published for (default 2024)
+"""
+import asyncio
+import os
+import time
+from datetime import date
+from typing import Dict, Iterable, List, Any, Optional
+import numpy as np
+
+TABLE_DIR = os.getenv("FTC_EPA_TABLE_DIR", os.path.join("cache", "epa_table"))
+REFRESH_INTERVAL = float(os.getenv("FTC_EPA_TABLE_REFRESH", "300"))
+MAX_ROW_AGE = float(os.getenv("FTC_EPA_TABLE_MAX_AGE", "3600"))
+WRITER_MODE = os.getenv("FTC_EPA_TABLE_WRITER", "auto").lower()
+CURRENT_SEASON = int(os.getenv("FTC_CURRENT_SEASON", "2024"))
+CHECK_INTERVAL = 2.0  # seconds between stat() calls looking for a republished table
+
+TEAM_EPA_DTYPE = np.dtype([
+    ("team", "<i4"),
+    ("epa", "<f4"),
+    ("auto", "<f4"),
+    ("teleop", "<f4"),
+    ("endgame", "<f4"),
+    ("matches", "<i4"),
+    ("updated", "<f8"),
+])
+
+
+def table_path(season: int, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or TABLE_DIR, f"team_epa_{season}.npy")
+
+
+def build_table(rows: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """Build a sorted structured array from row dicts (later rows win on duplicate teams)."""
+    by_team = {int(row["team"]): row for row in rows}
+    table = np.zeros(len(by_team), dtype=TEAM_EPA_DTYPE)
+    for index, team in enumerate(sorted(by_team)):
+        row = by_team[team]
+        table[index] = (
+            team,
+            row.get("epa", 0.0),
+            row.get("auto", 0.0),
+            row.get("teleop", 0.0),
+            row.get("endgame", 0.0),
+            row.get("matches", 0),
+            row.get("updated", time.time()),
+        )
+    return table
+
+
+def pending_path(season: int, directory: Optional[str] = None, pid: Optional[int] = None) -> str:
+    return os.path.join(directory or TABLE_DIR, "pending", f"team_epa_{season}.{pid or os.getpid()}.npy")
+
+
+def _write_atomically(path: str, table: np.ndarray):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as table_file:
+        np.save(table_file, np.sort(table.astype(TEAM_EPA_DTYPE, copy=False), order="team"))
+        table_file.flush()
+        os.fsync(table_file.fileno())
+    os.replace(temp_path, path)
+
+
+def publish_table(season: int, table: np.ndarray, directory: Optional[str] = None) -> str:
+    """Atomically replace the season's table file with `table`."""
+    path = table_path(season, directory)
+    _write_atomically(path, table)
+    return path
+
+
+class EPATableReader:
+    """Zero-copy reader over a published table that remaps when the file is replaced."""
+
+    def __init__(self, season: int, directory: Optional[str] = None):
+        self.path = table_path(season, directory)
+        self._table: Optional[np.ndarray] = None
+        self._identity = None
+        self._last_check = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._table is not None and now - self._last_check < CHECK_INTERVAL:
+            return
+        self._last_check = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._table, self._identity = None, None
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != self._identity:
+            self._table = np.load(self.path, mmap_mode="r")
+            self._identity = identity
+
+    @property
+    def table(self) -> Optional[np.ndarray]:
+        self._refresh()
+        return self._table
+
+    def lookup_many(self, team_numbers: List[int], max_age: Optional[float] = None) -> Dict[int, Dict[str, Any]]:
+        """Return {team: row dict} for the teams present (and, with max_age, fresh) in the table."""
+        table = self.table
+        if table is None or len(table) == 0 or not team_numbers:
+            return {}
+        wanted = np.asarray([int(team) for team in team_numbers], dtype="<i4")
+        positions = np.searchsorted(table["team"], wanted)
+        positions = np.minimum(positions, len(table) - 1)
+        found = table["team"][positions] == wanted
+        if max_age is not None:
+            found &= table["updated"][positions] >= time.time() - max_age
+        rows = {}
+        for team, position in zip(wanted[found].tolist(), positions[found].tolist()):
+            row = table[position]
+            rows[team] = {
+                "epa": float(row["epa"]),
+                "auto": float(row["auto"]),
+                "teleop": float(row["teleop"]),
+                "endgame": float(row["endgame"]),
+                "matches": int(row["matches"]),
+                "updated": float(row["updated"]),
+            }
+        return rows
+
+    def lookup(self, team_number: int) -> Optional[Dict[str, Any]]:
+        return self.lookup_many([team_number]).get(int(team_number))
+
+
+_readers: Dict[int, EPATableReader] = {}
+
+
+def set_table_dir(directory: str):
+    """Point readers and the writer at another directory (benchmarks and tests)."""
+    global TABLE_DIR
+    TABLE_DIR = directory
+    _readers.clear()
+
+
+def get_reader(season: int = CURRENT_SEASON) -> EPATableReader:
+    if season not in _readers:
+        _readers[season] = EPATableReader(season)
+    return _readers[season]
+
+
+def table_applies(event_start_date: Optional[str]) -> bool:
+    """The table holds current EPAs, which equal cutoff EPAs for events that have not started yet."""
+    return not event_start_date or event_start_date[:10] >= date.today().isoformat()
+
+
+_writer_lock_file = None
+
+
+def is_writer() -> bool:
+    """Elect this process as table writer using an exclusive, non-blocking file lock."""
+    global _writer_lock_file
+    if WRITER_MODE in ("1", "true", "yes"):
+        return True
+    if WRITER_MODE in ("0", "false", "no"):
+        return False
+    if _writer_lock_file is not None:
+        return True
+    os.makedirs(TABLE_DIR, exist_ok=True)
+    lock_file = open(os.path.join(TABLE_DIR, ".writer.lock"), "a+")
+    try:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        # No flock (Windows): single-process development server, so it writes
+        pass
+    except OSError:
+        lock_file.close()
+        return False
+    _writer_lock_file = lock_file
+    return True
+
+
+def collect_current_rows() -> List[Dict[str, Any]]:
+    """Rows for every current (uncut) team EPA this process has computed."""
+    from alliance_matchmaker_fixed import AllianceMatchmaker
+    from epa_parallel import team_epa_cache
+
+    matchmaker = AllianceMatchmaker()
+    rows = []
+    for key, (stored_at, result) in team_epa_cache.dump().items():
+        team, _, cutoff = str(key).partition("@")
+        if not str(team).isdigit() or not table_applies(cutoff) or result.get("error"):
+            continue
+        matches = result.get("matches") or {}
+        stats = matchmaker._calculate_team_stats(matches, int(team))
+        rows.append({
+            "team": int(team),
+            "epa": result.get("historicalEPA", 0.0),
+            "auto": stats["auto"],
+            "teleop": stats["teleop"],
+            "endgame": stats["endgame"],
+            "matches": sum(len(season_matches) for season_matches in matches.values()),
+            "updated": stored_at,
+        })
+    return rows
+
+
+def hand_off_rows(season: int, rows: List[Dict[str, Any]]) -> int:
+    """Non-writer side: replace this worker's pending file with its current rows."""
+    if not rows:
+        return 0
+    _write_atomically(pending_path(season), build_table(rows))
+    return len(rows)
+
+
+def claim_pending(season: int) -> List[np.ndarray]:
+    """Writer side: take every worker's pending rows (a file replaced while claimed waits for the next round)."""
+    directory = os.path.dirname(pending_path(season))
+    prefix = f"team_epa_{season}."
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".npy")]
+    except FileNotFoundError:
+        return []
+    tables = []
+    for name in names:
+        path = os.path.join(directory, name)
+        claimed = f"{path}.claimed"
+        try:
+            os.replace(path, claimed)
+            tables.append(np.load(claimed))
+            os.remove(claimed)
+        except (OSError, ValueError) as e:
+            print(f"Skipping pending EPA rows {name}: {str(e)}")
+    return tables
+
+
+def merge_and_publish(season: int, rows: List[Dict[str, Any]], pending: Optional[List[np.ndarray]] = None) -> int:
+    """Merge rows and handed-off tables into the published table and republish; returns the row count.
+
+    For a team present more than once the most recently computed row wins (the new one on ties).
+    """
+    parts = []
+    existing = get_reader(season).table
+    if existing is not None and len(existing):
+        parts.append(np.asarray(existing, dtype=TEAM_EPA_DTYPE))
+    parts.extend(table.astype(TEAM_EPA_DTYPE, copy=False) for table in pending or [])
+    if rows:
+        parts.append(build_table(rows))
+    if not parts:
+        return 0
+    combined = np.concatenate(parts)
+    combined = combined[np.lexsort((combined["updated"], combined["team"]))]
+    keep_last = np.append(combined["team"][1:] != combined["team"][:-1], True)
+    table = combined[keep_last]
+    publish_table(season, table)
+    print(f"Published EPA table for season {season} with {len(table)} teams")
+    return len(table)
+
+
+def refresh_table(season: int = CURRENT_SEASON) -> int:
+    """Publish every current EPA this process and the other workers have computed; returns the table size."""
+    return _share(True, season, collect_current_rows())
+
+
+def share_rows(writer: bool, season: int = CURRENT_SEASON) -> int:
+    """Publish (writer) or hand off to the writer (other workers) this process's current EPAs."""
+    return _share(writer, season, collect_current_rows())
+
+
+def _share(writer: bool, season: int, rows: List[Dict[str, Any]]) -> int:
+    if not writer:
+        return hand_off_rows(season, rows)
+    pending = claim_pending(season)
+    if not rows and not pending:
+        return 0
+    return merge_and_publish(season, rows, pending)
+
+
+async def periodic_table_refresh(interval: float = REFRESH_INTERVAL, season: int = CURRENT_SEASON,
+                                 writer: bool = True):
+    """Background task: every `interval` seconds the writer republishes and other workers hand off rows."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Rows are collected on the loop (the cache is not thread-safe); file work runs in a thread
+            await asyncio.to_thread(_share, writer, season, collect_current_rows())
+        except Exception as e:
+            print(f"Error refreshing EPA table: {str(e)}")
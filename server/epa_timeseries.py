@@ -0,0 +1,142 @@
+"""
+Per-match EPA trajectories for team charts.
+
+A TeamEPASeries replays a team's matches (oldest season first, in the order
+EPACalculator scores them: get_team_matches returns each season by event
+date) and keeps running sums per season: the count, sum and index-weighted
+sum of positive match EPAs. From those the recency-weighted season EPA and the
+year-weighted historical EPA after every match follow in O(1), the same values
+calculate_season_epa / calculate_historical_epa return for the matches seen so
+far, so the last point equals the team's (average model) scalar EPA.
+
+Series are kept per team and extended in place when a team's match list only
+grows; a changed or corrected earlier match rebuilds the series.
+
+    FTC_EPA_SERIES_CACHE_SIZE   teams whose series are kept in memory (default 1024)
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from epa_calculator import EPACalculator
+from utils.downsample import lttb_indices
+
+SERIES_CACHE_SIZE = int(os.getenv("FTC_EPA_SERIES_CACHE_SIZE", "1024"))
+GRANULARITIES = ("match", "event")
+
+
+def match_date(match: Dict[str, Any]) -> str:
+    """The match's event start date (YYYY-MM-DD), else its own start time's date; '' when neither is known."""
+    return match.get("eventDate") or str(match.get("actualStartTime") or "")[:10]
+
+
+def _series_match_id(season: int, match: Dict[str, Any]) -> Tuple:
+    # Scores are part of the identity so corrected results rebuild the series
+    return (season, match.get("eventCode"), str(match.get("tournamentLevel", "")).upper(), match.get("series") or 0,
+            match.get("matchNumber"), match.get("scoreRedFinal"), match.get("scoreBlueFinal"))
+
+
+class TeamEPASeries:
+    """Running per-season sums for one team, one point appended per match."""
+
+    def __init__(self, team_number: int, calculator: EPACalculator):
+        self.team_number = team_number
+        self.calculator = calculator
+        self.match_ids: List[Tuple] = []
+        self.points: List[Dict[str, Any]] = []
+        # season -> [positive match count, sum of match EPAs, sum of index * match EPA]
+        self.sums: Dict[int, List[float]] = {}
+
+    def season_epa(self, season: int) -> float:
+        count, total, index_sum = self.sums[season]
+        if count == 0:
+            return 0.0
+        slope = self.calculator.recency_slope
+        return (total + slope * index_sum / count) / (count + slope * (count - 1) / 2)
+
+    def historical_epa(self) -> float:
+        weights = self.calculator.year_weights
+        weighted = [(self.season_epa(season), weights[season]) for season in self.sums if season in weights]
+        total_weight = sum(weight for _, weight in weighted)
+        return sum(epa * weight for epa, weight in weighted) / total_weight if total_weight > 0 else 0.0
+
+    def append(self, season: int, match: Dict[str, Any]):
+        match_epa = self.calculator.calculate_match_epa(match, self.team_number)
+        sums = self.sums.setdefault(season, [0, 0.0, 0.0])
+        if match_epa > 0:
+            sums[2] += sums[0] * match_epa
+            sums[1] += match_epa
+            sums[0] += 1
+        self.match_ids.append(_series_match_id(season, match))
+        self.points.append({
+            "index": len(self.points),
+            "season": season,
+            "date": match_date(match) or None,
+            "eventCode": match.get("eventCode"),
+            "eventName": match.get("eventName"),
+            "matchNumber": match.get("matchNumber"),
+            "matchEPA": round(match_epa, 2),
+            "seasonEPA": round(self.season_epa(season), 2),
+            "epa": round(self.historical_epa(), 2),
+        })
+
+    def extend(self, matches: Dict[int, List[Dict[str, Any]]]) -> bool:
+        """Bring the series up to date with {season: matches}; returns False when it has to be rebuilt."""
+        ordered = [(int(season), match) for season in sorted(matches, key=int) for match in matches[season]]
+        known = len(self.match_ids)
+        if len(ordered) < known or any(_series_match_id(season, match) != match_id
+                                       for (season, match), match_id in zip(ordered, self.match_ids)):
+            return False
+        for season, match in ordered[known:]:
+            self.append(season, match)
+        return True
+
+
+_series: "OrderedDict[int, TeamEPASeries]" = OrderedDict()
+
+
+def _settings(calculator: EPACalculator) -> Tuple:
+    return calculator.recency_slope, tuple(sorted(calculator.year_weights.items()))
+
+
+def team_epa_series(team_number: int, matches: Dict[int, List[Dict[str, Any]]],
+                    calculator: Optional[EPACalculator] = None) -> TeamEPASeries:
+    """The team's series, extended with any new matches (or rebuilt when earlier ones changed)."""
+    calculator = calculator or EPACalculator()
+    series = _series.get(team_number)
+    if series is None or _settings(series.calculator) != _settings(calculator) or not series.extend(matches):
+        series = TeamEPASeries(team_number, calculator)
+        series.extend(matches)
+    _series[team_number] = series
+    _series.move_to_end(team_number)
+    while len(_series) > SERIES_CACHE_SIZE:
+        _series.popitem(last=False)
+    return series
+
+
+def series_points(series: TeamEPASeries, granularity: str = "match",
+                  max_points: Optional[int] = None) -> Dict[str, Any]:
+    """Chart points per match or per event (the last match of each), LTTB-downsampled to max_points."""
+    points = series.points
+    if granularity == "event":
+        last_of_event = {}
+        for point in points:
+            last_of_event[(point["season"], point["eventCode"])] = point
+        points = sorted(last_of_event.values(), key=lambda point: point["index"])
+    total = len(points)
+    if max_points and total > max_points:
+        keep = lttb_indices(np.asarray([point["index"] for point in points]),
+                            np.asarray([point["epa"] for point in points]), max_points)
+        points = [points[index] for index in keep.tolist()]
+    return {
+        "teamNumber": series.team_number,
+        "granularity": granularity,
+        "pointCount": total,
+        "downsampled": len(points) < total,
+        "historicalEPA": points[-1]["epa"] if points else 0.0,
+        "points": points,
+    }
+
+
+def clear_series():
+    _series.clear()
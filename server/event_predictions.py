@@ -0,0 +1,125 @@
+"""
+Cache of complete /api/event-predictions-epa responses.
+
+A response is stored per (season, event code) together with a version: a
+fingerprint of the event roster and its scored matches (count, the latest
+scored match and the newest modifiedOn). A repeat request whose freshly
+fetched event data has the same fingerprint is answered from the cache; a new
+or corrected match result changes the fingerprint and forces a recompute.
+Partial (deadline-limited) responses are never stored.
+
+Clients polling an event can send the version they hold (sinceVersion) and
+receive only what changed; every match and prediction carries its matchKey so
+a delta can be merged into the full response it updates. Each cache entry keeps compact per-item digests
+of its last FTC_EVENT_VERSION_HISTORY versions; when the client's version is
+no longer known, or most of the event changed, the full response is sent.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Any, Optional
+from utils.cache import create_cache
+
+EVENT_PREDICTION_CACHE_TTL = float(os.getenv("FTC_EVENT_PREDICTION_CACHE_TTL", "3600"))
+event_prediction_cache = create_cache("event_predictions", EVENT_PREDICTION_CACHE_TTL)
+VERSION_HISTORY = int(os.getenv("FTC_EVENT_VERSION_HISTORY", "16"))
+# A delta changing more than this fraction of the matches is sent as a full response instead
+MAX_DELTA_FRACTION = float(os.getenv("FTC_EVENT_MAX_DELTA_FRACTION", "0.5"))
+
+# Fields identifying the latest scored match and its result
+LATEST_MATCH_FIELDS = ("tournamentLevel", "series", "matchNumber", "actualStartTime", "postResultTime",
+                       "scoreRedFinal", "scoreBlueFinal")
+
+
+def event_cache_key(season: int, event_code: str) -> str:
+    return f"{season}:{event_code}"
+
+
+def is_scored(match: Dict[str, Any]) -> bool:
+    return match.get("scoreRedFinal") is not None and match.get("scoreBlueFinal") is not None
+
+
+def _match_time(match: Dict[str, Any]):
+    return (match.get("postResultTime") or match.get("actualStartTime") or "",
+            str(match.get("tournamentLevel") or ""), match.get("series") or 0, match.get("matchNumber") or 0)
+
+
+def event_fingerprint(teams: List[Dict[str, Any]], matches: List[Dict[str, Any]]) -> str:
+    """Version token for an event's prediction inputs."""
+    scored = [match for match in matches if isinstance(match, dict) and is_scored(match)]
+    latest = max(scored, key=_match_time, default=None)
+    payload = {
+        "roster": sorted(str(team.get("teamNumber")) for team in teams),
+        "scored": len(scored),
+        "latest": {field: latest.get(field) for field in LATEST_MATCH_FIELDS} if latest else None,
+        "modifiedOn": max((str(match.get("modifiedOn") or "") for match in scored), default=""),
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def match_key(match: Dict[str, Any]) -> str:
+    """Stable identity of a match within an event (match numbers repeat across levels)."""
+    return f"{match.get('tournamentLevel')}-{match.get('series', 0)}-{match.get('matchNumber')}"
+
+
+def with_match_keys(items: List[Dict[str, Any]], matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of `items` (the matches, or predictions aligned with them) carrying their match's matchKey."""
+    return [{**item, 'matchKey': match_key(match)} for item, match in zip(items, matches)]
+
+
+def response_digests(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-item digests of a full response; what the version history keeps instead of whole responses."""
+    keys = [match_key(match) for match in response['matches']]
+    return {
+        "roster": _digest(sorted(str(team.get('teamNumber')) for team in response['teams'])),
+        "matches": {key: _digest(match) for key, match in zip(keys, response['matches'])},
+        # Predictions are in schedule order, aligned with the matches list
+        "predictions": {key: _digest(prediction) for key, prediction in zip(keys, response['predictions'])},
+        "teamEPAs": {team: _digest([epa, response['teamEPAStatus'].get(team)])
+                     for team, epa in response['teamEPAs'].items()},
+    }
+
+
+def remember_version(history: Optional[Dict[str, Any]], version: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the history with `version` appended (oldest versions beyond VERSION_HISTORY dropped)."""
+    history = dict(history or {})
+    history.pop(version, None)
+    history[version] = response_digests(response)
+    while len(history) > VERSION_HISTORY:
+        del history[next(iter(history))]
+    return history
+
+
+def build_delta(history: Optional[Dict[str, Any]], since_version: str, version: str,
+                response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Changes from `since_version` to `response`, or None when a full response should be sent."""
+    previous = (history or {}).get(since_version)
+    if previous is None:
+        return None
+    current = history.get(version) or response_digests(response)
+    if current["roster"] != previous["roster"]:
+        return None
+    changed_matches = [index for index, match in enumerate(response['matches'])
+                       if previous["matches"].get(match_key(match)) != current["matches"][match_key(match)]]
+    if len(changed_matches) > MAX_DELTA_FRACTION * max(len(response['matches']), 1):
+        return None
+    changed_predictions = [index for index, match in enumerate(response['matches'])
+                           if previous["predictions"].get(match_key(match)) != current["predictions"][match_key(match)]]
+    changed_teams = [team for team, digest in current["teamEPAs"].items() if previous["teamEPAs"].get(team) != digest]
+    current_keys = set(current["matches"])
+    return {
+        'delta': True,
+        'sinceVersion': since_version,
+        'version': version,
+        'matches': [response['matches'][index] for index in changed_matches],
+        'removedMatches': [key for key in previous["matches"] if key not in current_keys],
+        'predictions': with_match_keys([response['predictions'][index] for index in changed_predictions],
+                                       [response['matches'][index] for index in changed_predictions]),
+        'teamEPAs': {team: response['teamEPAs'][team] for team in changed_teams},
+        'teamEPAStatus': {team: response['teamEPAStatus'].get(team) for team in changed_teams},
+        'partial': response['partial'],
+    }
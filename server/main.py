@@ -1,22 +1,64 @@
 # Remove the EPA-related imports and endpoint
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 import asyncio
+import json
 import time
+import numpy as np
+from contextlib import asynccontextmanager
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import httpx
 import os
 from dotenv import load_dotenv
 import base64
 from epa_calculator import EPACalculator
 from epa_parallel import ParallelEPAProcessor
-from alliance_matchmaker_fixed import AllianceMatchmaker
-from utils.api_utils import ftc_api_request
+from alliance_matchmaker_fixed import AllianceMatchmaker, COMPONENT_MODELS
+from utils.api_utils import ftc_api_request, ftc_api_paginate
+from utils.deadline import request_deadline
+from utils.request_stats import start_request_stats
 from batch_epa_endpoint import process_batch_historical_epa
+from profiling import PROFILING_ENABLED, profiling_middleware
+from match_store import match_store
+from match_fetch import fetch_team_season_matches, fetch_team_historical_matches
+from season_table import SORT_COLUMNS, get_season_table
+from epa_timeseries import GRANULARITIES, team_epa_series, series_points
+from columnar_export import available_formats, stream_season_zip
+from event_predictions import (
+    event_prediction_cache, event_cache_key, event_fingerprint, remember_version, build_delta, with_match_keys
+)
+import warm_start
+import epa_table
 
 load_dotenv()
 
-app = FastAPI(debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-start: restore cached responses/EPAs on boot, persist them periodically and on shutdown
+    background_tasks = []
+    if warm_start.SNAPSHOT_ENABLED:
+        warm_start.load_snapshot()
+        if warm_start.SNAPSHOT_INTERVAL > 0:
+            background_tasks.append(asyncio.create_task(warm_start.periodic_snapshots()))
+    # One worker (elected by file lock) publishes the shared memory-mapped EPA table; the others hand it rows
+    table_writer = epa_table.is_writer()
+    if epa_table.REFRESH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(epa_table.periodic_table_refresh(writer=table_writer)))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    try:
+        epa_table.share_rows(table_writer)
+    except Exception as e:
+        print(f"Error publishing EPA table: {str(e)}")
+    if warm_start.SNAPSHOT_ENABLED:
+        try:
+            warm_start.save_snapshot()
+        except Exception as e:
+            print(f"Error saving warm-start snapshot: {str(e)}")
+
+app = FastAPI(debug=True, lifespan=lifespan)
 
 # CORS middleware configuration
 app.add_middleware(
@@ -27,6 +69,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (X-Profile header / ?profile=1), never enabled in production
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
+# Registered last so it is outermost and owns the request's RequestStats
+@app.middleware("http")
+async def data_age_headers(request: Request, call_next):
+    """Report the age of the oldest cached FTC data behind a response (X-Data-Age, X-Data-Stale)."""
+    stats = start_request_stats()
+    response = await call_next(request)
+    if stats.max_data_age is not None:
+        response.headers["X-Data-Age"] = str(int(stats.max_data_age))
+        if stats.stale_hits:
+            response.headers["X-Data-Stale"] = "1"
+    return response
+
+# Default latency budget (seconds) for /api/event-predictions-epa; requests may pass budgetSeconds
+EVENT_PREDICTIONS_BUDGET = float(os.getenv("FTC_EVENT_PREDICTIONS_BUDGET", "20"))
+
+# Upper bound on matchups scored by one /api/match-prediction/batch call
+MAX_BATCH_MATCHUPS = int(os.getenv("FTC_MAX_BATCH_MATCHUPS", "100000"))
+
 # FTC API Configuration
 FTC_API_BASE_URL = "https://ftc-api.firstinspires.org/v2.0"
 FTC_USERNAME = os.getenv("FTC_API_USERNAME")
@@ -57,6 +121,29 @@ AUTH_TOKEN = base64.b64encode(auth_string.encode()).decode()
 #                 raise HTTPException(status_code=e.response.status_code, detail=str(e))
 #             raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_json_records(records_key: str, records, first=None):
+    """Encode an async stream of records as {"<records_key>": [...], "count": n} incrementally.
+
+    The status is already sent when a later page fails, so the document is
+    closed with an "error" field instead: the records before it are complete,
+    the rest are missing.
+    """
+    count = 0
+    yield f'{{"{records_key}": ['
+    if first is not None:
+        yield json.dumps(first)
+        count += 1
+    try:
+        async for record in records:
+            yield ("," if count else "") + json.dumps(record)
+            count += 1
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        print(f"Error streaming {records_key} after {count} records: {error}")
+        yield f'], "count": {count}, "error": {json.dumps(str(error))}}}'
+        return
+    yield f'], "count": {count}}}'
+
 # Advancement endpoints
 @app.get("/api/advancement/{season}/{eventCode}")
 async def get_event_advancement(season: int, eventCode: str, excludeSkipped: bool = False):
@@ -101,7 +188,8 @@ async def get_teams(
     eventCode: str | None = None,
     state: str | None = None,
     country: str | None = None,  # Added missing parameter
-    page: int = 1
+    page: int = 1,
+    allPages: bool = False
 ):
     params = {
         "teamNumber": teamNumber,
@@ -110,6 +198,11 @@ async def get_teams(
         "country": country,
         "page": page
     }
+    if allPages:
+        # Stream every page's teams as one JSON document instead of a single page
+        teams = ftc_api_paginate(f"/{season}/teams", "teams", params)
+        first_team = await anext(teams, None)  # Upstream errors surface before the response starts
+        return StreamingResponse(stream_json_records("teams", teams, first_team), media_type="application/json")
     return await ftc_api_request(f"/{season}/teams", params)
 
 # Schedule endpoints
@@ -185,57 +278,38 @@ async def get_event_schedule(
 @app.get("/api/teams/{teamNumber}/matches/{season}")
 async def get_team_season_matches(season: int, teamNumber: int):
     try:
-        # Get all events for the team in the season
-        events_response = await ftc_api_request(f"/{season}/events", {"teamNumber": teamNumber})
-        
-        all_matches = []
-        events_list = events_response.get("events", []) if events_response else []
-        for event in events_list:
-            # Get both qual and playoff matches for each event
-            for tournament_level in ["qual", "playoff"]:
-                try:
-                    matches_response = await ftc_api_request(
-                        f"/{season}/matches/{event['code']}", 
-                        {
-                            "tournamentLevel": tournament_level,
-                            "teamNumber": teamNumber
-                        }
-                    )
-                    
-                    if matches_response is not None and matches_response.get("matches"):
-                        # Add event context to each match
-                        for match in matches_response["matches"]:
-                            match["eventCode"] = event["code"]
-                            match["eventName"] = event["name"]
-                            match["tournamentLevel"] = tournament_level
-                            all_matches.append(match)
-                except Exception as e:
-                    print(f"Error fetching {tournament_level} matches for event {event['code']}: {str(e)}")
-                    continue
-
-        return {"matches": all_matches}
+        return {"matches": await fetch_team_season_matches(season, teamNumber)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/teams/{teamNumber}/historical-matches")
-async def get_team_historical_matches_v1(teamNumber: int):
-    all_seasons_matches = {}
-    current_season = 2024
-    
-    # Fetch data for recent seasons
-    for season in range(2020, current_season + 1):
-        try:
-            season_matches = await get_team_season_matches(season, teamNumber)
-            all_seasons_matches[season] = season_matches["matches"]
-        except HTTPException as e:
-            if e.status_code != 404:  # Ignore 404s for seasons without data
-                raise e
-            all_seasons_matches[season] = []
-    
-    return {"matches": all_seasons_matches}
+def event_predictions_response(response: dict, history: Optional[dict], since_version: Optional[str]) -> dict:
+    """Full response, or only what changed since the client's sinceVersion when that is still known."""
+    delta = build_delta(history, since_version, response['version'], response) if since_version else None
+    return delta if delta is not None else {**response, 'delta': False}
+
+async def fetch_latest_event_matches(season, event_code: str):
+    """The event's match list straight from upstream: it fingerprints the cached predictions, so a cached
+    (or stale-while-revalidate) copy would hide newly scored matches. Falls back to the cache when upstream fails."""
+    try:
+        return await ftc_api_request(f"/{season}/matches/{event_code}", bypass_cache=True)
+    except HTTPException as e:
+        if e.status_code == 504:
+            raise
+        print(f"Serving cached matches for {event_code}: {e.detail}")
+        return await ftc_api_request(f"/{season}/matches/{event_code}")
 
 @app.post("/api/event-predictions-epa")
 async def get_event_predictions_epa(data: dict):
+    try:
+        budget = float(data.get('budgetSeconds') or EVENT_PREDICTIONS_BUDGET)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="budgetSeconds must be a number")
+    # Latency budget for the whole request; teams not finished in time are flagged, not awaited.
+    # It is reset on return: the matchmaker routes call this handler and fall back without a deadline.
+    with request_deadline(budget):
+        return await compute_event_predictions_epa(data)
+
+async def compute_event_predictions_epa(data: dict):
     try:
         season = data['season']
         event_code = data['eventCode']
@@ -247,7 +321,7 @@ async def get_event_predictions_epa(data: dict):
             event_info, teams_data, matches_data = await asyncio.gather(
                 ftc_api_request(f"/{season}/events", {"eventCode": event_code}),
                 ftc_api_request(f"/{season}/teams", {"eventCode": event_code}),
-                ftc_api_request(f"/{season}/matches/{event_code}"),
+                fetch_latest_event_matches(season, event_code),
                 return_exceptions=True
             )
             
@@ -268,6 +342,18 @@ async def get_event_predictions_epa(data: dict):
             raise HTTPException(status_code=500, detail="Teams data is not a valid response")
         teams_list = teams_data.get('teams', [])
         print(f"Found {len(teams_list)} teams")
+
+        # Nothing changed at the event since the last full computation: serve it from cache
+        version = event_fingerprint(teams_list, matches_data.get('matches', []) if isinstance(matches_data, dict) else [])
+        cached = await event_prediction_cache.get(event_cache_key(season, event_code))
+        if cached is not None and cached['version'] == version and match_store.get_event(season, event_code):
+            print(f"Serving cached predictions for {event_code} (version {version})")
+            return event_predictions_response(cached['response'], cached.get('history'), data.get('sinceVersion'))
+
+        # Keep the full match list in the local store (persisted across restarts)
+        if isinstance(matches_data, dict):
+            event_record = event_info['events'][0] if isinstance(event_info, dict) and event_info.get('events') else None
+            match_store.put_event(season, event_code, matches_data.get('matches', []), event_record)
         
         try:
             # Get event start date
@@ -290,6 +376,7 @@ async def get_event_predictions_epa(data: dict):
             
             # Create EPA mapping
             team_epas = epa_processor.get_epa_mapping(epa_results)
+            team_epa_status = {str(result['teamNumber']): result.get('status', 'fresh') for result in epa_results}
             print(f"Calculated EPAs for {len(team_epas)} teams")
             
             # Calculate predictions for all matches in parallel
@@ -307,13 +394,22 @@ async def get_event_predictions_epa(data: dict):
             print(f"Error processing team EPAs or predictions: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error calculating team EPAs or match predictions: {str(e)}")
         
-        return {
+        response = {
             'eventDetails': event_info,
             'teams': teams_data.get('teams', []),
-            'matches': matches_data.get('matches', []) if isinstance(matches_data, dict) else [],
+            'matches': with_match_keys(matches_list, matches_list),
             'teamEPAs': team_epas,
-            'predictions': predictions
+            'teamEPAStatus': team_epa_status,
+            'partial': any(status != 'fresh' for status in team_epa_status.values()),
+            'predictions': with_match_keys(predictions, matches_list),
+            'version': version
         }
+        history = cached.get('history') if cached is not None else None
+        if not response['partial']:
+            history = remember_version(history, version, response)
+            await event_prediction_cache.set(event_cache_key(season, event_code),
+                                             {'version': version, 'response': response, 'history': history})
+        return event_predictions_response(response, history, data.get('sinceVersion'))
         
     except Exception as e:
         print(f"Unexpected error in get_event_predictions_epa: {str(e)}")
@@ -321,19 +417,43 @@ async def get_event_predictions_epa(data: dict):
 
 @app.get("/api/teams/{teamNumber}/historical-matches")
 async def get_team_historical_matches(teamNumber: int):
-    all_seasons_matches = {}
-    
-    # Fetch data from 2020 to 2024
-    for season in range(2020, 2025):
-        try:
-            season_matches = await get_team_season_matches(season, teamNumber)
-            all_seasons_matches[season] = season_matches["matches"]
-        except HTTPException as e:
-            if e.status_code != 404:  # Ignore 404s for seasons without data
-                raise e
-            all_seasons_matches[season] = []
-    
-    return {"matches": all_seasons_matches}
+    # Seasons, events and levels are fetched concurrently under one request limit
+    return {"matches": await fetch_team_historical_matches(teamNumber)}
+
+@app.get("/api/leaderboard/{season}")
+async def get_season_leaderboard(
+    season: int,
+    region: str | None = None,
+    state: str | None = None,
+    country: str | None = None,
+    sort: str = "epa",
+    order: str = "desc",
+    page: int = 1,
+    pageSize: int = 50,
+    refresh: bool = False
+):
+    """Season-wide team ranking served from the precomputed season table (see season_table.py)."""
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if page < 1 or not 1 <= pageSize <= 500:
+        raise HTTPException(status_code=400, detail="page must be >= 1 and pageSize between 1 and 500")
+    table = await get_season_table(season, refresh)
+    return table.query(sort, order == "desc", page, pageSize, {"region": region, "state": state, "country": country})
+
+@app.get("/api/export/{season}")
+async def export_season(season: int, format: str = "npz"):
+    """Stored matches and season EPAs as a zip of per-event columnar files (see columnar_export.py)."""
+    if format not in available_formats():
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(available_formats())}")
+    if not match_store.events(season):
+        raise HTTPException(status_code=404, detail=f"No stored matches for season {season}")
+    return StreamingResponse(
+        stream_season_zip(season, format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="ftc_{season}_{format}.zip"'},
+    )
 
 @app.get("/api/teams/{teamNumber}/historical-epa")
 async def get_team_historical_epa(teamNumber: int):
@@ -345,6 +465,26 @@ async def get_team_historical_epa(teamNumber: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/teams/{teamNumber}/epa-history")
+async def get_team_epa_history(teamNumber: int, granularity: str = "match", maxPoints: Optional[int] = None):
+    """EPA after every match (or event) for charts, LTTB-downsampled to maxPoints (see epa_timeseries.py)."""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if maxPoints is not None and not 3 <= maxPoints <= 5000:
+        raise HTTPException(status_code=400, detail="maxPoints must be between 3 and 5000")
+    try:
+        # The team EPA cache holds the matches the scalar EPA was computed from
+        result = await ParallelEPAProcessor().calculate_team_epa(teamNumber)
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+        series = team_epa_series(teamNumber, result.get("matches") or {})
+        return series_points(series, granularity, maxPoints)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error building EPA history for team {teamNumber}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/match-prediction")
 async def get_match_prediction(data: dict):
     try:
@@ -367,6 +507,62 @@ async def get_match_prediction(data: dict):
         print(f"Error in match prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/match-prediction/batch")
+async def get_match_predictions_batch(data: dict):
+    """Score many hypothetical matchups in one call.
+
+    Body: {"matchups": [[redTeams, blueTeams], ...] (or {"redTeams", "blueTeams"} objects),
+    "teamEpas": {...}} and/or {"season", "eventCode"} to calculate EPAs for teams not in teamEpas,
+    using the event's start date as cutoff. Results are parallel arrays, one entry per matchup.
+    """
+    matchups = data.get('matchups')
+    if not isinstance(matchups, list):
+        raise HTTPException(status_code=400, detail="matchups must be a list")
+    if len(matchups) > MAX_BATCH_MATCHUPS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_MATCHUPS} matchups per request")
+    try:
+        red_alliances = [matchup['redTeams'] if isinstance(matchup, dict) else matchup[0] for matchup in matchups]
+        blue_alliances = [matchup['blueTeams'] if isinstance(matchup, dict) else matchup[1] for matchup in matchups]
+    except (KeyError, IndexError, TypeError):
+        raise HTTPException(status_code=400, detail="Each matchup needs red and blue teams")
+    if not all(isinstance(alliance, list) and all(isinstance(team, (int, str)) and not isinstance(team, bool)
+                                                  for team in alliance)
+               for alliance in red_alliances + blue_alliances):
+        raise HTTPException(status_code=400, detail="Alliances must be lists of team numbers")
+    raw_epas = data.get('teamEpas') or {}
+    if not isinstance(raw_epas, dict):
+        raise HTTPException(status_code=400, detail="teamEpas must be an object mapping teams to EPAs")
+    if not all(epa is None or (isinstance(epa, (int, float)) and not isinstance(epa, bool)) for epa in raw_epas.values()):
+        raise HTTPException(status_code=400, detail="teamEpas values must be numbers")
+
+    team_epas = {str(team): epa for team, epa in raw_epas.items()}
+    unresolved = sorted({str(team) for alliance in red_alliances + blue_alliances for team in alliance} - set(team_epas))
+    if unresolved and data.get('eventCode'):
+        season = data.get('season', epa_table.CURRENT_SEASON)
+        event_info = await ftc_api_request(f"/{season}/events", {"eventCode": data['eventCode']})
+        event_start_date = event_info['events'][0].get('dateStart') if event_info and event_info.get('events') else None
+        epa_processor = ParallelEPAProcessor(concurrency_limit=50)
+        epa_results = await epa_processor.calculate_multiple_team_epas(
+            [int(team) if team.isdigit() else team for team in unresolved], event_start_date
+        )
+        # Teams whose calculation failed with nothing cached to fall back on still count as 0
+        resolved = [result for result in epa_results if result.get('status') != 'missing']
+        team_epas.update(epa_processor.get_epa_mapping(resolved))
+        unresolved = [str(result['teamNumber']) for result in epa_results if result.get('status') == 'missing']
+
+    probabilities = EPACalculator().calculate_win_probabilities(red_alliances, blue_alliances, team_epas)
+    red_win_probability = probabilities['red_win_probability']
+    return {
+        "count": len(matchups),
+        "redEPA": np.round(probabilities['red_epa'], 3).tolist(),
+        "blueEPA": np.round(probabilities['blue_epa'], 3).tolist(),
+        "redWinProbability": np.round(red_win_probability, 3).tolist(),
+        "blueWinProbability": np.round(1 - red_win_probability, 3).tolist(),
+        # "R"/"B" per matchup, same rule as /api/match-prediction (ties go to Blue)
+        "predictedWinner": "".join(np.where(red_win_probability > 0.5, "R", "B").tolist()),
+        "teamsWithoutEPA": [int(team) if team.isdigit() else team for team in unresolved],
+    }
+
 @app.post("/api/teams/batch-historical-epa")
 async def get_batch_historical_epa(data: dict):
     """
@@ -444,16 +640,20 @@ async def find_alliance_match(data: dict):
     {
         "season": 2024,
         "eventCode": "USMACMP",
-        "teamNumber": 12345
+        "teamNumber": 12345,
+        "componentModel": "opr"    # optional: "even" (default) or "opr"
     }
     """
     try:
         season = data.get('season')
         event_code = data.get('eventCode')
         team_number = data.get('teamNumber')
+        component_model = data.get('componentModel')
         
         if not all([season, event_code, team_number]):
             raise HTTPException(status_code=400, detail="Missing required parameters")
+        if component_model is not None and component_model not in COMPONENT_MODELS:
+            raise HTTPException(status_code=400, detail=f"componentModel must be one of {', '.join(COMPONENT_MODELS)}")
         
         # Get event data including teams and EPAs
         event_data = None
@@ -478,7 +678,7 @@ async def find_alliance_match(data: dict):
             team_epas = epa_processor.get_epa_mapping(epa_results)
         
         # Get historical matches for all teams
-        matchmaker = AllianceMatchmaker()
+        matchmaker = AllianceMatchmaker(component_model)
         team_matches = {}
 
         # Use ParallelEPAProcessor directly for EPA calculations
@@ -518,6 +718,8 @@ async def find_alliance_match(data: dict):
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in alliance matchmaker: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -532,16 +734,20 @@ async def find_alliance_matches_batch(data: dict):
     {
         "season": 2024,
         "eventCode": "USMACMP",
-        "teamNumbers": [12345, 67890, ...]
+        "teamNumbers": [12345, 67890, ...],
+        "componentModel": "opr"    # optional: "even" (default) or "opr"
     }
     """
     try:
         season = data.get('season')
         event_code = data.get('eventCode')
         team_numbers = data.get('teamNumbers')
+        component_model = data.get('componentModel')
         
         if not all([season, event_code, team_numbers]) or not isinstance(team_numbers, list):
             raise HTTPException(status_code=400, detail="Missing required parameters or teamNumbers is not a list")
+        if component_model is not None and component_model not in COMPONENT_MODELS:
+            raise HTTPException(status_code=400, detail=f"componentModel must be one of {', '.join(COMPONENT_MODELS)}")
         
         # Get event data including teams and EPAs
         event_data = None
@@ -566,7 +772,7 @@ async def find_alliance_matches_batch(data: dict):
             team_epas = epa_processor.get_epa_mapping(epa_results)
         
         # Get historical matches for all teams
-        matchmaker = AllianceMatchmaker()
+        matchmaker = AllianceMatchmaker(component_model)
         team_matches = {}
 
         # Use ParallelEPAProcessor directly for EPA calculations
@@ -620,6 +826,8 @@ async def find_alliance_matches_batch(data: dict):
         
         return results
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in batch alliance matchmaker: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,113 @@
+"""
+Concurrent match fetching for a team's season and multi-season history.
+
+A team's history used to be fetched one request at a time: season by season,
+event by event, level by level. Here every request of a history goes through
+one shared semaphore, so the whole tree (seasons -> events) is
+fanned out at once while never having more than FTC_MATCH_FETCH_CONCURRENCY
+requests to the FTC API in flight. Results are reassembled in the original
+season/event/level order.
+
+Each event's matches are requested once, without a tournamentLevel filter, and
+split into qual and playoff locally (split_matches_by_level), which halves the
+calls a team's season costs compared with one request per level.
+"""
+import asyncio
+import os
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, List, Any, Optional
+from fastapi import HTTPException
+from utils.api_utils import ftc_api_request
+
+TOURNAMENT_LEVELS = ("qual", "playoff")
+HISTORY_SEASONS = range(2020, 2025)
+FETCH_CONCURRENCY = int(os.getenv("FTC_MATCH_FETCH_CONCURRENCY", "16"))
+
+# FTC API tournamentLevel values; older seasons report elimination rounds individually
+LEVEL_ALIASES = {
+    "QUALIFICATION": "qual",
+    "PLAYOFF": "playoff",
+    "QUARTERFINAL": "playoff",
+    "SEMIFINAL": "playoff",
+    "FINAL": "playoff",
+}
+
+RequestFunc = Callable[[str, dict], Awaitable[Any]]
+
+
+def split_matches_by_level(matches: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Split an unfiltered match list into {"qual": [...], "playoff": [...]}; other levels are dropped."""
+    by_level = {level: [] for level in TOURNAMENT_LEVELS}
+    for match in matches or []:
+        if not isinstance(match, dict):
+            continue
+        level = LEVEL_ALIASES.get(str(match.get("tournamentLevel", "")).upper())
+        if level is not None:
+            by_level[level].append(match)
+    return by_level
+
+
+async def fetch_event_matches_by_level(season: int, event_code: str, team_number: Optional[int] = None,
+                                       request: Optional[RequestFunc] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch an event's matches in one call and split them by level.
+
+    `request` defaults to ftc_api_request; callers pass their own module's
+    reference (or a rate-limited wrapper) so it can be patched independently.
+    """
+    request = request or ftc_api_request
+    params = {"teamNumber": team_number} if team_number is not None else None
+    matches_response = await request(f"/{season}/matches/{event_code}", params)
+    matches = matches_response.get("matches", []) if isinstance(matches_response, dict) else []
+    return split_matches_by_level(matches)
+
+
+async def _limited_request(semaphore: asyncio.Semaphore, endpoint: str, params: Optional[dict]) -> Any:
+    async with semaphore:
+        return await ftc_api_request(endpoint, params)
+
+
+async def fetch_team_season_matches(season: int, team_number: int,
+                                    semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict[str, Any]]:
+    """Qual and playoff matches of every event the team attended in a season, tagged with event context."""
+    semaphore = semaphore or asyncio.Semaphore(FETCH_CONCURRENCY)
+    events_response = await _limited_request(semaphore, f"/{season}/events", {"teamNumber": team_number})
+    events_list = events_response.get("events", []) if events_response else []
+
+    results = await asyncio.gather(*[
+        fetch_event_matches_by_level(season, event["code"], team_number, partial(_limited_request, semaphore))
+        for event in events_list
+    ], return_exceptions=True)
+
+    all_matches = []
+    for event, by_level in zip(events_list, results):
+        if isinstance(by_level, Exception):
+            print(f"Error fetching matches for event {event['code']}: {str(by_level)}")
+            continue
+        for level in TOURNAMENT_LEVELS:
+            # Add event context to each match
+            for match in by_level[level]:
+                match["eventCode"] = event["code"]
+                match["eventName"] = event["name"]
+                match["tournamentLevel"] = level
+                all_matches.append(match)
+    return all_matches
+
+
+async def fetch_team_historical_matches(team_number: int, seasons: Iterable[int] = HISTORY_SEASONS,
+                                        concurrency: int = FETCH_CONCURRENCY) -> Dict[int, List[Dict[str, Any]]]:
+    """Matches per season for every season at once; seasons the API returns 404 for are empty."""
+    seasons = list(seasons)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*[
+        fetch_team_season_matches(season, team_number, semaphore) for season in seasons
+    ], return_exceptions=True)
+
+    all_seasons_matches = {}
+    for season, result in zip(seasons, results):
+        if isinstance(result, HTTPException) and result.status_code == 404:
+            all_seasons_matches[season] = []  # Ignore 404s for seasons without data
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            all_seasons_matches[season] = result
+    return all_seasons_matches
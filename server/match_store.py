@@ -0,0 +1,103 @@
+"""
+Local store of full event match lists, indexed by event and by team.
+
+Endpoints that fetch an event's complete (unfiltered) match list record it
+here. The store is process-wide, persisted by warm_start.py, and serves as
+the local match data for season-level computations.
+"""
+import itertools
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+EventKey = Tuple[int, str]
+
+
+class MatchStore:
+    def __init__(self):
+        self._events: Dict[EventKey, Dict[str, Any]] = {}
+        self._team_events: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        # Per season: a version bumped on every change (from one process-wide counter, so it never
+        # repeats after clear()) and the latest update time
+        self._versions: Dict[int, int] = {}
+        self._updated: Dict[int, float] = {}
+        self._version_counter = itertools.count(1)
+
+    def _touch(self, season: int, updated: float):
+        self._versions[season] = next(self._version_counter)
+        self._updated[season] = max(self._updated.get(season, 0.0), updated)
+
+    def put_event(self, season: int, event_code: str, matches: List[Dict[str, Any]],
+                  event: Optional[Dict[str, Any]] = None):
+        """Store (or replace) the full match list for one event and re-index its teams."""
+        key = (int(season), event_code)
+        previous = self._events.get(key)
+        if previous is not None:
+            for team in previous["teams"]:
+                self._team_events[(key[0], team)].discard(event_code)
+        teams = sorted({slot.get("teamNumber") for match in matches for slot in match.get("teams", [])
+                        if slot.get("teamNumber") is not None})
+        self._events[key] = {
+            "event": event if event is not None else (previous or {}).get("event"),
+            "matches": matches,
+            "teams": teams,
+            "updated": time.time(),
+        }
+        for team in teams:
+            self._team_events[(key[0], team)].add(event_code)
+        self._touch(key[0], self._events[key]["updated"])
+
+    def get_event(self, season: int, event_code: str) -> Optional[Dict[str, Any]]:
+        return self._events.get((int(season), event_code))
+
+    def event_matches(self, season: int, event_code: str) -> List[Dict[str, Any]]:
+        record = self.get_event(season, event_code)
+        return record["matches"] if record else []
+
+    def events(self, season: Optional[int] = None) -> List[EventKey]:
+        return sorted(key for key in self._events if season is None or key[0] == int(season))
+
+    def last_updated(self, season: int) -> float:
+        """When any event of the season was last stored (0.0 if none)."""
+        return self._updated.get(int(season), 0.0)
+
+    def version(self, season: int) -> int:
+        """Changes whenever an event of the season is stored (0 if none ever was)."""
+        return self._versions.get(int(season), 0)
+
+    def seasons(self) -> List[int]:
+        return sorted({season for season, _ in self._events})
+
+    def team_events(self, season: int, team_number: int) -> List[str]:
+        return sorted(self._team_events.get((int(season), int(team_number)), ()))
+
+    def team_matches(self, season: int, team_number: int) -> List[Dict[str, Any]]:
+        """All stored matches in a season that include the team, grouped by event."""
+        team_matches = []
+        for event_code in self.team_events(season, team_number):
+            for match in self.event_matches(season, event_code):
+                if any(slot.get("teamNumber") == team_number for slot in match.get("teams", [])):
+                    team_matches.append(match)
+        return team_matches
+
+    def clear(self):
+        self._events.clear()
+        self._team_events.clear()
+        self._versions.clear()
+        self._updated.clear()
+
+    def dump(self) -> Dict[EventKey, Dict[str, Any]]:
+        return dict(self._events)
+
+    def load(self, events: Dict[EventKey, Dict[str, Any]]):
+        for (season, event_code), record in events.items():
+            self._events[(season, event_code)] = record
+            for team in record["teams"]:
+                self._team_events[(season, team)].add(event_code)
+            self._touch(season, record["updated"])
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+match_store = MatchStore()
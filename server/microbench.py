@@ -0,0 +1,236 @@
+"""
+Micro-benchmarks for the pure-CPU hot paths of EPACalculator and AllianceMatchmaker.
+
+Inputs are generated with the synthetic season builder from mock_ftc_api.py at
+several scales (a single team, one event, a full season). Each benchmark is
+timed repeatedly and reports ops/sec plus peak allocations; results can be
+stored as a baseline and later runs fail when ops/sec drop by more than the
+configured percentage.
+
+Usage:
+    python microbench.py --save-baseline
+    python microbench.py --threshold 15          # exits 1 on regression
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Any, Optional
+from alliance_matchmaker_fixed import AllianceMatchmaker
+from epa_calculator import EPACalculator
+from epa_parallel import ParallelEPAProcessor
+from mock_ftc_api import SyntheticSeasonData
+
+DEFAULT_SCALES = {"team": 1, "event": 40, "season": 400}
+DEFAULT_BASELINE = "microbench_baseline.json"
+
+
+def build_inputs(num_teams: int, seed: int = 7) -> Dict[str, Any]:
+    """Build team match histories, EPAs and matchups shaped like get_team_matches output."""
+    data = SyntheticSeasonData(num_teams, seed=seed)
+    calculator = EPACalculator()
+    team_matches: Dict[int, Dict[int, List[Dict[str, Any]]]] = {team: {} for team in data.team_numbers}
+    for season, events in data.events.items():
+        for event in events:
+            for match in data.matches[event["code"]]:
+                if match["tournamentLevel"] != "QUALIFICATION":
+                    continue
+                for slot in match["teams"]:
+                    if slot["teamNumber"] in team_matches:
+                        team_matches[slot["teamNumber"]].setdefault(season, []).append(match)
+    team_epas = {str(team): calculator.calculate_historical_epa(matches, team)
+                 for team, matches in team_matches.items()}
+    matchups = []
+    team_slots = []
+    schedule = []
+    for event in data.events[data.target_season]:
+        for match in data.matches[event["code"]]:
+            schedule.append(match)
+            red = [slot["teamNumber"] for slot in match["teams"] if "Red" in slot["station"]]
+            blue = [slot["teamNumber"] for slot in match["teams"] if "Blue" in slot["station"]]
+            matchups.append((red, blue))
+            team_slots.extend((match, slot["teamNumber"]) for slot in match["teams"])
+    return {
+        "teams": data.team_numbers,
+        "team_matches": team_matches,
+        "team_epas": team_epas,
+        "matchups": matchups,
+        "team_slots": team_slots,
+        "schedule": schedule,
+    }
+
+
+def benchmark_cases(inputs: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    """Return one zero-argument callable per hot path, each covering the whole input set."""
+    calculator = EPACalculator()
+    matchmaker = AllianceMatchmaker()
+    processor = ParallelEPAProcessor()
+    teams = inputs["teams"]
+    team_matches = inputs["team_matches"]
+    team_epas = inputs["team_epas"]
+    current_season = max((season for matches in team_matches.values() for season in matches), default=2024)
+
+    def match_epa():
+        for match, team in inputs["team_slots"]:
+            calculator.calculate_match_epa(match, team)
+
+    def season_epa():
+        for team in teams:
+            calculator.calculate_season_epa(team_matches[team].get(current_season, []), team)
+
+    def historical_epa():
+        for team in teams:
+            calculator.calculate_historical_epa(team_matches[team], team)
+
+    def win_probability():
+        for red, blue in inputs["matchups"]:
+            calculator.calculate_match_win_probability(red, blue, team_epas)
+
+    def predict_matches():
+        processor.predict_matches(inputs["schedule"], team_epas)
+
+    def team_stats():
+        for team in teams:
+            matchmaker._calculate_team_stats(team_matches[team], team)
+
+    def best_partner():
+        asyncio.run(matchmaker.find_best_alliance_partner(teams[0], teams, team_epas, team_matches))
+
+    return {
+        "calculate_match_epa": match_epa,
+        "calculate_season_epa": season_epa,
+        "calculate_historical_epa": historical_epa,
+        "calculate_match_win_probability": win_probability,
+        "predict_matches": predict_matches,
+        "_calculate_team_stats": team_stats,
+        "find_best_alliance_partner": best_partner,
+    }
+
+
+def time_callable(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """Calibrate a loop count like timeit.autorange, then time `repeat` rounds of it."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    per_op = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_op.append((time.perf_counter() - start) / number)
+
+    median = statistics.median(per_op)
+    return {
+        "opsPerSec": round(1 / median, 3) if median > 0 else float("inf"),
+        "medianSeconds": median,
+        "stdevSeconds": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "loops": number,
+    }
+
+
+def measure_allocations(func: Callable[[], Any]) -> Dict[str, float]:
+    """Run once under tracemalloc and report peak and retained allocations."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peakKiB": round((peak - before) / 1024, 1), "retainedKiB": round((after - before) / 1024, 1)}
+
+
+def run_microbenchmarks(scales: Optional[Dict[str, int]] = None, repeat: int = 5, min_time: float = 0.05,
+                        only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Run every benchmark at every scale; keys are "<function>@<scale>"."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for scale_name, num_teams in (scales or DEFAULT_SCALES).items():
+        cases = benchmark_cases(build_inputs(num_teams))
+        for name, func in cases.items():
+            if only and name not in only:
+                continue
+            # calculate_match_win_probability prints per call; keep that out of the terminal
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                timing = time_callable(func, repeat, min_time)
+                allocations = measure_allocations(func)
+            results[f"{name}@{scale_name}"] = {"teams": num_teams, **timing, **allocations}
+            print(f"{name:<34} {scale_name:<7} {timing['opsPerSec']:>12.2f} ops/s "
+                  f"{allocations['peakKiB']:>10.1f} KiB peak")
+    return results
+
+
+def check_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                      threshold_pct: float) -> List[Dict[str, Any]]:
+    """Return the benchmarks whose ops/sec fell more than threshold_pct below the baseline."""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or not previous.get("opsPerSec"):
+            continue
+        change_pct = (result["opsPerSec"] - previous["opsPerSec"]) / previous["opsPerSec"] * 100
+        if change_pct < -threshold_pct:
+            regressions.append({
+                "benchmark": key,
+                "baselineOpsPerSec": previous["opsPerSec"],
+                "opsPerSec": result["opsPerSec"],
+                "changePct": round(change_pct, 1),
+            })
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for EPA and matchmaker hot paths")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed ops/sec drop in percent")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per timing round")
+    parser.add_argument("--only", nargs="+", help="Benchmark names to run")
+    parser.add_argument("--scales", nargs="+", choices=list(DEFAULT_SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    scales = {name: DEFAULT_SCALES[name] for name in args.scales}
+    results = run_microbenchmarks(scales, args.repeat, args.min_time, args.only)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = check_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['benchmark']}: {regression['baselineOpsPerSec']:.2f} -> "
+              f"{regression['opsPerSec']:.2f} ops/s ({regression['changePct']}%)")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Local mock of the FTC Events API used for offline benchmarking and tests.
+
+Serves synthetic but realistically shaped seasons (events, teams, qual and
+playoff matches) with configurable latency and error injection. Mount it in
+process with httpx.ASGITransport and route ftc_api_request through it via
+utils.api_utils.set_api_transport.
+"""
+import asyncio
+import math
+import random
+from collections import Counter
+from typing import Dict, List, Any, Optional
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SEASONS = [2022, 2023, 2024]
+EVENT_SIZE = 24
+QUAL_MATCHES_PER_TEAM = 5
+TEAMS_PAGE_SIZE = 50
+API_VERSION_PREFIX = "/v2.0"
+
+
+class SyntheticSeasonData:
+    """Deterministic synthetic FTC data built around one target event."""
+
+    def __init__(self, num_teams: int, target_event_code: str = "BENCH", seed: int = 42,
+                 seasons: Optional[List[int]] = None):
+        self.rng = random.Random(seed)
+        self.seasons = seasons or SEASONS
+        self.target_season = self.seasons[-1]
+        self.target_event_code = target_event_code
+        self.team_numbers = sorted(self.rng.sample(range(1000, 30000), num_teams))
+        self.strength: Dict[int, float] = {}
+        self.team_info: Dict[int, Dict[str, Any]] = {}
+        self.events: Dict[int, List[Dict[str, Any]]] = {season: [] for season in self.seasons}
+        self.event_teams: Dict[str, List[int]] = {}
+        self.matches: Dict[str, List[Dict[str, Any]]] = {}
+        self._filler_next = 30000
+        for team in self.team_numbers:
+            self._register_team(team)
+        self._build()
+
+    def _register_team(self, team: int):
+        self.strength[team] = max(5.0, self.rng.gauss(60, 20))
+        state = self.rng.choice(["CA", "TX", "WA", "MI", "NY", "FL"])
+        self.team_info[team] = {
+            "teamNumber": team,
+            "nameShort": f"Team {team}",
+            "nameFull": f"Synthetic Robotics {team}",
+            "city": "Springfield",
+            "stateProv": state,
+            "country": "USA",
+            "homeRegion": f"US{state}",
+            "rookieYear": self.rng.randint(2008, 2023),
+        }
+
+    def _filler_team(self) -> int:
+        team = self._filler_next
+        self._filler_next += 1
+        self._register_team(team)
+        return team
+
+    def _event_date(self, season: int, index: int, total: int) -> str:
+        # FTC seasons run from October through March of the following year
+        day = int(170 * index / max(total, 1))
+        month = 10 + day // 28
+        year = season + (month - 1) // 12
+        month = (month - 1) % 12 + 1
+        return f"{year:04d}-{month:02d}-{day % 28 + 1:02d}T09:00:00"
+
+    def _add_event(self, season: int, code: str, teams: List[int], date_start: str):
+        region = self.team_info[teams[0]]["homeRegion"] if teams else "USCA"
+        self.events[season].append({
+            "code": code,
+            "name": f"Synthetic Event {code}",
+            "type": "2",
+            "regionCode": region,
+            "stateprov": region[2:],
+            "country": "USA",
+            "city": "Springfield",
+            "dateStart": date_start,
+            "dateEnd": date_start,
+        })
+        self.event_teams[code] = teams
+        self.matches[code] = self._build_matches(teams, date_start)
+
+    def _build(self):
+        for season in self.seasons:
+            slots = []
+            for team in self.team_numbers:
+                slots.extend([team] * self.rng.randint(1, 3))
+            self.rng.shuffle(slots)
+            num_events = max(1, math.ceil(len(slots) / EVENT_SIZE))
+            for index in range(num_events):
+                chunk = list(dict.fromkeys(slots[index * EVENT_SIZE:(index + 1) * EVENT_SIZE]))
+                while len(chunk) < min(EVENT_SIZE, 8):
+                    chunk.append(self._filler_team())
+                code = f"S{season}E{index:03d}"
+                self._add_event(season, code, chunk, self._event_date(season, index, num_events + 1))
+        # The target event is the last event of the most recent season
+        self._add_event(
+            self.target_season,
+            self.target_event_code,
+            list(self.team_numbers),
+            self._event_date(self.target_season, 1, 1),
+        )
+
+    def _alliance_scores(self, teams: List[int]) -> Dict[str, int]:
+        total = sum(self.strength[team] for team in teams) * self.rng.uniform(0.8, 1.2)
+        auto = int(total * self.rng.uniform(0.2, 0.3))
+        endgame = int(total * self.rng.uniform(0.15, 0.25))
+        teleop = int(total) - auto - endgame
+        foul = self.rng.choice([0, 0, 0, 5, 10])
+        return {"Final": auto + teleop + endgame + foul, "Auto": auto, "Teleop": teleop, "End": endgame, "Foul": foul}
+
+    def _make_match(self, number: int, level: str, red: List[int], blue: List[int], when: str) -> Dict[str, Any]:
+        red_scores = self._alliance_scores(red)
+        blue_scores = self._alliance_scores(blue)
+        match = {
+            "matchNumber": number,
+            "tournamentLevel": level,
+            "description": f"{'Qualification' if level == 'QUALIFICATION' else 'Playoff'} {number}",
+            "actualStartTime": when,
+            "postResultTime": when,
+            "teams": [{"teamNumber": team, "station": f"Red{i + 1}", "dq": False, "onField": True}
+                      for i, team in enumerate(red)] +
+                     [{"teamNumber": team, "station": f"Blue{i + 1}", "dq": False, "onField": True}
+                      for i, team in enumerate(blue)],
+        }
+        for key, value in red_scores.items():
+            match[f"scoreRed{key}"] = value
+        for key, value in blue_scores.items():
+            match[f"scoreBlue{key}"] = value
+        return match
+
+    def _build_matches(self, teams: List[int], date_start: str) -> List[Dict[str, Any]]:
+        matches: List[Dict[str, Any]] = []
+        if len(teams) < 4:
+            return matches
+        day = date_start[:10]
+        num_quals = math.ceil(len(teams) * QUAL_MATCHES_PER_TEAM / 4)
+        order: List[int] = []
+        for number in range(1, num_quals + 1):
+            if len(order) < 4:
+                order.extend(self.rng.sample(teams, len(teams)))
+            picked: List[int] = []
+            while len(picked) < 4:
+                if not order:
+                    order.extend(self.rng.sample(teams, len(teams)))
+                team = order.pop()
+                if team not in picked:
+                    picked.append(team)
+            when = f"{day}T{10 + number * 7 // 60 % 8:02d}:{number * 7 % 60:02d}:00"
+            matches.append(self._make_match(number, "QUALIFICATION", picked[:2], picked[2:], when))
+        seeds = sorted(teams, key=lambda team: self.strength[team], reverse=True)[:8]
+        alliances = [seeds[i:i + 2] for i in range(0, len(seeds) - 1, 2)]
+        for number, (red, blue) in enumerate(zip(alliances[::2], alliances[1::2]), start=1):
+            matches.append(self._make_match(number, "PLAYOFF", red, blue, f"{day}T17:{number:02d}:00"))
+        return matches
+
+    def season_team_count(self, season: int) -> int:
+        return len({team for event in self.events.get(season, []) for team in self.event_teams[event["code"]]})
+
+
+def create_mock_ftc_api(num_teams: int = 50, target_event_code: str = "BENCH", seed: int = 42,
+                        latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                        error_rate: float = 0.0, error_status: int = 503) -> FastAPI:
+    """
+    Build a FastAPI app that mimics the FTC Events API endpoints used by the server.
+
+    The returned app exposes `app.state.data` (the SyntheticSeasonData) and
+    `app.state.calls` (a Counter of requests per route) for benchmark accounting.
+    """
+    data = SyntheticSeasonData(num_teams, target_event_code, seed)
+    rng = random.Random(seed + 1)
+    app = FastAPI()
+    app.state.data = data
+    app.state.calls = Counter()
+
+    @app.middleware("http")
+    async def inject_latency_and_errors(request: Request, call_next):
+        parts = [part for part in request.url.path.split("/") if part and part != API_VERSION_PREFIX.strip("/")]
+        app.state.calls[parts[1] if len(parts) > 1 else "season"] += 1
+        delay = latency_ms + (rng.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse(status_code=error_status, content={"message": "Injected upstream error"})
+        return await call_next(request)
+
+    router = APIRouter()
+
+    def _int_param(value: Optional[str]) -> Optional[int]:
+        return int(value) if value not in (None, "") else None
+
+    @router.get("/{season}")
+    async def season_summary(season: int):
+        return {
+            "eventCount": len(data.events.get(season, [])),
+            "teamCount": data.season_team_count(season),
+            "gameName": f"Synthetic {season}",
+        }
+
+    @router.get("/{season}/events")
+    async def events(season: int, eventCode: Optional[str] = None, teamNumber: Optional[str] = None):
+        team = _int_param(teamNumber)
+        result = data.events.get(season, [])
+        if eventCode:
+            result = [event for event in result if event["code"] == eventCode]
+        if team is not None:
+            result = [event for event in result if team in data.event_teams[event["code"]]]
+        return {"events": result, "eventCount": len(result)}
+
+    @router.get("/{season}/teams")
+    async def teams(season: int, eventCode: Optional[str] = None, teamNumber: Optional[str] = None,
+                    state: Optional[str] = None, country: Optional[str] = None, page: Optional[str] = None):
+        if eventCode:
+            numbers = data.event_teams.get(eventCode, [])
+        else:
+            numbers = sorted({team for event in data.events.get(season, [])
+                              for team in data.event_teams[event["code"]]})
+        team = _int_param(teamNumber)
+        result = [data.team_info[number] for number in numbers if team is None or number == team]
+        if state:
+            result = [info for info in result if info["stateProv"] == state]
+        if country:
+            result = [info for info in result if info["country"] == country]
+        page_number = _int_param(page) or 1
+        page_total = max(1, math.ceil(len(result) / TEAMS_PAGE_SIZE))
+        start = (page_number - 1) * TEAMS_PAGE_SIZE
+        return {
+            "teams": result[start:start + TEAMS_PAGE_SIZE],
+            "teamCountTotal": len(result),
+            "teamCountPage": len(result[start:start + TEAMS_PAGE_SIZE]),
+            "pageCurrent": page_number,
+            "pageTotal": page_total,
+        }
+
+    @router.get("/{season}/matches/{eventCode}")
+    async def matches(season: int, eventCode: str, tournamentLevel: Optional[str] = None,
+                      teamNumber: Optional[str] = None):
+        result = data.matches.get(eventCode, [])
+        if tournamentLevel:
+            level = "QUALIFICATION" if tournamentLevel.lower().startswith("qual") else "PLAYOFF"
+            result = [match for match in result if match["tournamentLevel"] == level]
+        team = _int_param(teamNumber)
+        if team is not None:
+            result = [match for match in result
+                      if any(slot["teamNumber"] == team for slot in match["teams"])]
+        return {"matches": result}
+
+    # Serve both bare paths and the official "/v2.0" prefix used by ftc_api_request
+    app.include_router(router)
+    app.include_router(router, prefix=API_VERSION_PREFIX)
+    return app
@@ -0,0 +1,207 @@
+"""
+Component OPR (offensive power rating) by sparse regularized least squares.
+
+Every alliance appearance is one row of a team-by-appearance design matrix A
+(a 1 in each partner's column) and its alliance score is the target, so a
+team's OPR is its share x of alliance scores in the least-squares sense:
+
+    minimize  sum_i w_i (A_i x - y_i)^2 + ridge * |x - prior|^2
+
+solved for total, auto, teleop and endgame at once. A is kept as COO index
+arrays and the normal equations are solved with conjugate gradient, so a
+season-wide system with thousands of teams costs a few sparse products per
+iteration and never forms or inverts a dense matrix. The ridge term (shrinking
+toward the average per-team contribution) keeps teams with few matches, and
+under-determined event systems, well posed.
+
+Alliances without component scores still count toward total OPR but are
+left out of the component fits, rather than being split 30/50/20.
+
+    FTC_OPR_RIDGE   regularization strength, in matches (default 1.0)
+"""
+import os
+import time
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+import numpy as np
+from match_store import match_store
+
+OPR_RIDGE = float(os.getenv("FTC_OPR_RIDGE", "1.0"))
+COMPONENTS = ("total", "auto", "teleop", "endgame")
+SCORE_FIELDS = {"total": "Final", "auto": "Auto", "teleop": "Teleop", "endgame": "End"}
+
+
+class SparseMatrix:
+    """Minimal COO matrix: the products conjugate gradient needs, via np.bincount."""
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int], data: Optional[np.ndarray] = None):
+        self.rows = rows
+        self.cols = cols
+        self.shape = shape
+        self.data = data if data is not None else np.ones(len(rows), dtype=np.float64)
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """A @ x for x of shape (n,) or (n, k)."""
+        if x.ndim == 1:
+            return np.bincount(self.rows, weights=self.data * x[self.cols], minlength=self.shape[0])
+        return np.column_stack([self.matvec(x[:, column]) for column in range(x.shape[1])])
+
+    def rmatvec(self, y: np.ndarray) -> np.ndarray:
+        """A.T @ y for y of shape (m,) or (m, k)."""
+        if y.ndim == 1:
+            return np.bincount(self.cols, weights=self.data * y[self.rows], minlength=self.shape[1])
+        return np.column_stack([self.rmatvec(y[:, column]) for column in range(y.shape[1])])
+
+
+def conjugate_gradient(apply, b: np.ndarray, tol: float = 1e-8, max_iter: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Solve apply(x) = b for a symmetric positive definite operator, one independent CG per column of b."""
+    b = b.reshape(len(b), -1)
+    x = np.zeros_like(b)
+    r = b.copy()
+    p = r.copy()
+    rs = np.sum(r * r, axis=0)
+    threshold = (tol * np.maximum(np.linalg.norm(b, axis=0), 1e-12)) ** 2
+    max_iter = max_iter or 10 * len(b)
+    iterations = 0
+    while iterations < max_iter and np.any(rs > threshold):
+        Ap = apply(p)
+        curvature = np.sum(p * Ap, axis=0)
+        # Converged columns stop moving
+        alpha = np.divide(rs, curvature, out=np.zeros_like(rs), where=(rs > threshold) & (curvature > 0))
+        x += alpha * p
+        r -= alpha * Ap
+        rs_next = np.sum(r * r, axis=0)
+        beta = np.divide(rs_next, rs, out=np.zeros_like(rs), where=rs > 0)
+        p = r + beta * p
+        rs = rs_next
+        iterations += 1
+    return x, iterations
+
+
+def _match_id(season: Any, match: Dict[str, Any]) -> Any:
+    if match.get("eventCode") is None or match.get("matchNumber") is None:
+        return id(match)
+    return (season, match["eventCode"], str(match.get("tournamentLevel", "")).lower(),
+            match.get("series", 0), match["matchNumber"])
+
+
+class OPRSystem:
+    """Design matrix, targets and row weights for a set of matches."""
+
+    def __init__(self, weighted_matches: Iterable[Tuple[Dict[str, Any], float]]):
+        team_index: Dict[int, int] = {}
+        rows, cols, targets, weights = [], [], [], []
+        for match, weight in weighted_matches:
+            for color in ("Red", "Blue"):
+                alliance = [slot.get("teamNumber") for slot in match.get("teams", [])
+                            if color in slot.get("station", "") and slot.get("teamNumber") is not None]
+                final = match.get(f"score{color}Final")
+                if not alliance or final is None:
+                    continue
+                values = [match.get(f"score{color}{SCORE_FIELDS[component]}") or 0 for component in COMPONENTS]
+                has_components = any(values[1:])
+                row = len(targets)
+                for team in alliance:
+                    rows.append(row)
+                    cols.append(team_index.setdefault(int(team), len(team_index)))
+                targets.append(values)
+                weights.append([weight] + [weight if has_components else 0.0] * 3)
+        self.team_numbers = np.fromiter(team_index, dtype=np.int64, count=len(team_index))
+        self.team_index = team_index
+        self.design = SparseMatrix(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                                   (len(targets), len(team_index)))
+        self.targets = np.asarray(targets, dtype=np.float64).reshape(-1, len(COMPONENTS))
+        self.weights = np.asarray(weights, dtype=np.float64).reshape(-1, len(COMPONENTS))
+
+    def solve(self, ridge: float = OPR_RIDGE) -> Tuple[np.ndarray, int]:
+        """Per-team contributions, shape (teams, 4), and the CG iteration count."""
+        if len(self.team_index) == 0:
+            return np.zeros((0, len(COMPONENTS))), 0
+        alliance_sizes = self.design.matvec(np.ones(len(self.team_index)))
+        weight_totals = np.maximum(self.weights.sum(axis=0), 1e-12)
+        # Average per-team contribution, the value teams without evidence shrink toward
+        prior = (self.weights * self.targets).sum(axis=0) / weight_totals / max(float(alliance_sizes.mean()), 1.0)
+        residual = self.targets - np.outer(alliance_sizes, prior)
+
+        def normal_operator(x):
+            return self.design.rmatvec(self.weights * self.design.matvec(x)) + ridge * x
+
+        deviation, iterations = conjugate_gradient(normal_operator, self.design.rmatvec(self.weights * residual))
+        return prior + deviation, iterations
+
+
+class OPRResult:
+    """Solved contributions indexed by team number."""
+
+    def __init__(self, system: OPRSystem, ridge: float = OPR_RIDGE):
+        self.team_index = system.team_index
+        self.values, self.iterations = system.solve(ridge)
+        self.alliances = len(system.targets)
+        self.built_at = time.time()
+
+    def __contains__(self, team_number: Any) -> bool:
+        return int(team_number) in self.team_index
+
+    def __len__(self) -> int:
+        return len(self.team_index)
+
+    def team(self, team_number: int) -> Optional[Dict[str, float]]:
+        index = self.team_index.get(int(team_number))
+        if index is None:
+            return None
+        return {component: float(value) for component, value in zip(COMPONENTS, self.values[index])}
+
+    def as_dict(self) -> Dict[int, Dict[str, float]]:
+        return {team: self.team(team) for team in self.team_index}
+
+
+def compute_opr(matches: Iterable[Dict[str, Any]], ridge: float = OPR_RIDGE) -> OPRResult:
+    """OPR over a match list (an event or any other set of matches, equally weighted)."""
+    return OPRResult(OPRSystem((match, 1.0) for match in matches), ridge)
+
+
+def compute_weighted_opr(matches_by_season: Dict[int, Dict[Any, List[Dict[str, Any]]]],
+                         season_weights: Dict[int, float], ridge: float = OPR_RIDGE) -> OPRResult:
+    """OPR over {team: {season: [matches]}}, de-duplicating shared matches and weighting rows by season."""
+    seen = set()
+    weighted = []
+    for seasons in matches_by_season.values():
+        for season, season_matches in (seasons or {}).items():
+            weight = season_weights.get(int(season), 0.0)
+            if weight <= 0:
+                continue
+            for match in season_matches or []:
+                match_id = _match_id(season, match)
+                if match_id not in seen:
+                    seen.add(match_id)
+                    weighted.append((match, weight))
+    return OPRResult(OPRSystem(weighted), ridge)
+
+
+def event_opr(season: int, event_code: str, ridge: float = OPR_RIDGE) -> OPRResult:
+    """OPR from an event's qualification matches in match_store."""
+    return compute_opr(_qualification_matches(match_store.event_matches(season, event_code)), ridge)
+
+
+_season_oprs: Dict[int, Tuple[int, OPRResult]] = {}
+
+
+def season_opr(season: int, ridge: float = OPR_RIDGE) -> OPRResult:
+    """OPR from every stored qualification match of the season; reused until the season's matches change."""
+    version = match_store.version(season)
+    cached = _season_oprs.get(season)
+    if cached is not None and cached[0] == version and ridge == OPR_RIDGE:
+        return cached[1]
+    matches = [match for _, event_code in match_store.events(season)
+               for match in _qualification_matches(match_store.event_matches(season, event_code))]
+    result = compute_opr(matches, ridge)
+    if ridge == OPR_RIDGE:
+        _season_oprs[season] = (version, result)
+    return result
+
+
+def _qualification_matches(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [match for match in matches if str(match.get("tournamentLevel", "")).upper() == "QUALIFICATION"]
+
+
+def clear_season_oprs():
+    _season_oprs.clear()
@@ -0,0 +1,124 @@
+"""
+Opt-in per-request profiling for the API endpoints.
+
+Enabled only when FTC_ENABLE_PROFILING is set and FTC_ENV is not "production".
+A request is profiled when it carries an `X-Profile: 1` header or a
+`profile=1` query parameter. For that request we:
+
+* sample the event-loop thread's stack every FTC_PROFILE_INTERVAL_MS and write
+  the samples as folded stacks (`frame;frame;frame count`), the input format
+  of flamegraph.pl, speedscope and inferno;
+* record the span breakdown of time spent awaiting ftc_api_request, parsing
+  JSON and everything else (EPA math, serialization) via RequestStats.
+
+Results are written to FTC_PROFILE_DIR and summarised in a Server-Timing header.
+Concurrent requests share the event loop, so their frames can appear in the
+samples too; profile on an otherwise idle server for clean flamegraphs.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any
+from fastapi import Request
+from utils.request_stats import current_request_stats, start_request_stats
+
+PROFILING_ENABLED = (
+    os.getenv("FTC_ENABLE_PROFILING", "").lower() in ("1", "true", "yes")
+    and os.getenv("FTC_ENV", "development").lower() != "production"
+)
+PROFILE_DIR = os.getenv("FTC_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("FTC_PROFILE_INTERVAL_MS", "2")) / 1000
+
+
+class StackSampler:
+    """Background thread that periodically samples one thread's Python stack."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def _profile_requested(request: Request) -> bool:
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    return flag is not None and flag.lower() in ("1", "true", "yes")
+
+
+def _write_profile(request: Request, samples: Counter, breakdown: Dict[str, Any]) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+    profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{request.method.lower()}_{slug}"
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as folded_file:
+        for stack, count in samples.most_common():
+            folded_file.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as summary_file:
+        json.dump(breakdown, summary_file, indent=2)
+    return profile_id
+
+
+async def profiling_middleware(request: Request, call_next):
+    """HTTP middleware; register with app.middleware("http") when PROFILING_ENABLED."""
+    if not _profile_requested(request):
+        return await call_next(request)
+
+    # Reuse the request's stats when an outer middleware (data age headers) already started them
+    stats = current_request_stats() or start_request_stats()
+    sampler = StackSampler(threading.get_ident())
+    cpu_start = time.process_time()
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        samples = sampler.stop()
+    cpu_seconds = time.process_time() - cpu_start
+    summary = stats.summary()
+    other_seconds = max(0.0, summary["elapsedSeconds"] - summary["upstreamSeconds"] - summary["jsonSeconds"])
+    breakdown = {
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        **summary,
+        # Upstream awaits overlap under asyncio.gather, so upstreamSeconds can exceed elapsed time
+        "otherSeconds": round(other_seconds, 6),
+        "cpuSeconds": round(cpu_seconds, 6),
+        "samples": sum(samples.values()),
+        "sampleIntervalSeconds": PROFILE_INTERVAL,
+        "spans": stats.spans,
+    }
+    profile_id = _write_profile(request, samples, breakdown)
+    print(f"Saved profile {profile_id} ({breakdown['samples']} samples, {summary['apiCalls']} API calls)")
+
+    response.headers["X-Profile-Id"] = profile_id
+    response.headers["Server-Timing"] = ", ".join([
+        f"total;dur={summary['elapsedSeconds'] * 1000:.1f}",
+        f"upstream;dur={summary['upstreamSeconds'] * 1000:.1f}",
+        f"json;dur={summary['jsonSeconds'] * 1000:.1f}",
+        f"cpu;dur={cpu_seconds * 1000:.1f}",
+    ])
+    return response
@@ -0,0 +1,257 @@
+"""
+Single-pass chronological EPA ratings over a season's full match stream.
+
+Instead of averaging each team's own matches (fetched team by team), every
+scored match of a season in match_store is replayed once, in date order, and
+all participants' ratings are updated after each match:
+
+    predicted = sum of the alliance's ratings
+    rating   += k * (alliance score - predicted) / alliance size
+
+Ratings are in points per team, like the averaged EPA, and start at the
+season's mean per-team contribution. The whole pass is O(matches). The rating
+of every team after every match is kept (plus the pre-match red win
+probability, 1/(1 + 10^(-ΔEPA/divisor))), so ratings at any point in the
+season can be looked up afterwards without replaying it.
+
+    FTC_RATING_K   fraction of an alliance's prediction error applied per match (default 0.2)
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
+import numpy as np
+from match_store import match_store
+
+RATING_K = float(os.getenv("FTC_RATING_K", "0.2"))
+WIN_PROBABILITY_DIVISOR = 400.0
+LEVEL_ORDER = {"QUALIFICATION": 0, "PLAYOFF": 1, "QUARTERFINAL": 1, "SEMIFINAL": 2, "FINAL": 3}
+
+
+def match_id(event_code: str, match: Dict[str, Any]) -> Tuple[str, str, int, int]:
+    """Identity of a match within a season; levels are compared case-insensitively."""
+    return (event_code, str(match.get("tournamentLevel", "")).upper(), match.get("series") or 0,
+            match.get("matchNumber") or 0)
+
+
+def _is_scored(match: Dict[str, Any]) -> bool:
+    return match.get("scoreRedFinal") is not None and match.get("scoreBlueFinal") is not None
+
+
+def season_match_stream(events: Iterable[Tuple[str, Optional[Dict[str, Any]], List[Dict[str, Any]]]]
+                        ) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(event code, time, match) for every scored match in date order.
+
+    A match's time is its actual (or scheduled) start, else its event's start
+    date; ties are broken by event, level and match number.
+    """
+    stream = []
+    for event_code, event, matches in events:
+        event_start = str((event or {}).get("dateStart") or "")
+        for match in matches:
+            level = str(match.get("tournamentLevel", "")).upper()
+            if not _is_scored(match) or level == "PRACTICE":
+                continue
+            when = str(match.get("actualStartTime") or match.get("startTime") or event_start)
+            order = (when, event_start, event_code, LEVEL_ORDER.get(level, 0),
+                     match.get("series") or 0, match.get("matchNumber") or 0)
+            stream.append((order, event_code, when, match))
+    stream.sort(key=lambda item: item[0])
+    return [(event_code, when, match) for _, event_code, when, match in stream]
+
+
+class SeasonRatings:
+    """Ratings after every match of one season, from one chronological pass."""
+
+    def __init__(self, season: int, stream: List[Tuple[str, str, Dict[str, Any]]], k: float = RATING_K,
+                 divisor: float = WIN_PROBABILITY_DIVISOR, source_version: int = 0):
+        self.season = season
+        self.k = k
+        self.divisor = divisor
+        self.source_version = source_version
+        self.built_at = time.time()
+
+        alliances = []
+        total_score = 0.0
+        total_slots = 0
+        for _, _, match in stream:
+            red = [slot["teamNumber"] for slot in match.get("teams", [])
+                   if "Red" in slot.get("station", "") and slot.get("teamNumber") is not None]
+            blue = [slot["teamNumber"] for slot in match.get("teams", [])
+                    if "Blue" in slot.get("station", "") and slot.get("teamNumber") is not None]
+            alliances.append((red, blue))
+            total_score += (match["scoreRedFinal"] or 0) + (match["scoreBlueFinal"] or 0)
+            total_slots += len(red) + len(blue)
+        self.initial = total_score / total_slots if total_slots else 0.0
+
+        ratings: Dict[int, float] = {}
+        self.match_ids: Dict[Tuple, int] = {}
+        self.match_times = np.asarray([when for _, when, _ in stream], dtype=object)
+        red_win_probability = np.empty(len(stream))
+        red_won = np.empty(len(stream))
+        history_team, history_match, history_rating = [], [], []
+        for index, ((event_code, _, match), (red, blue)) in enumerate(zip(stream, alliances)):
+            self.match_ids[match_id(event_code, match)] = index
+            red_predicted = sum(ratings.get(team, self.initial) for team in red)
+            blue_predicted = sum(ratings.get(team, self.initial) for team in blue)
+            red_win_probability[index] = 1 / (1 + 10 ** (-(red_predicted - blue_predicted) / divisor))
+            red_score, blue_score = match["scoreRedFinal"] or 0, match["scoreBlueFinal"] or 0
+            red_won[index] = 1.0 if red_score > blue_score else 0.0 if red_score < blue_score else 0.5
+            for alliance, predicted, score in ((red, red_predicted, red_score), (blue, blue_predicted, blue_score)):
+                if not alliance:
+                    continue
+                update = k * (score - predicted) / len(alliance)
+                for team in alliance:
+                    ratings[team] = ratings.get(team, self.initial) + update
+                    history_team.append(team)
+                    history_match.append(index)
+                    history_rating.append(ratings[team])
+
+        self.ratings = ratings
+        self.red_win_probability = red_win_probability
+        self.red_won = red_won
+        # Per-team history: match indices (ascending) and the rating after each
+        history_team = np.asarray(history_team, dtype=np.int64)
+        history_match = np.asarray(history_match, dtype=np.int64)
+        history_rating = np.asarray(history_rating, dtype=np.float64)
+        order = np.argsort(history_team, kind="stable")
+        teams, starts = np.unique(history_team[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self.history: Dict[int, Tuple[np.ndarray, np.ndarray]] = {
+            int(team): (history_match[order[bounds[i]:bounds[i + 1]]], history_rating[order[bounds[i]:bounds[i + 1]]])
+            for i, team in enumerate(teams)
+        }
+
+    def __len__(self) -> int:
+        return len(self.match_times)
+
+    def rating(self, team_number: int) -> Optional[float]:
+        """Rating after the team's last match of the season."""
+        return self.ratings.get(int(team_number))
+
+    def rating_after(self, team_number: int, match_index: int) -> Optional[float]:
+        """Rating after the team's last match at or before match_index (None before its first match)."""
+        history = self.history.get(int(team_number))
+        if history is None:
+            return None
+        position = np.searchsorted(history[0], match_index, side="right")
+        return float(history[1][position - 1]) if position else None
+
+    def rating_at(self, team_number: int, before: str) -> Optional[float]:
+        """Rating from matches that started before an ISO timestamp (or date)."""
+        matches_before = int(np.searchsorted(self.match_times, before, side="left"))
+        return self.rating_after(team_number, matches_before - 1)
+
+    def rating_after_matches(self, team_number: int, matches: List[Dict[str, Any]]) -> Optional[float]:
+        """Rating after the latest of `matches` (tagged with eventCode) found in this season's stream."""
+        indices = [self.match_ids.get(match_id(match.get("eventCode"), match)) for match in matches]
+        indices = [index for index in indices if index is not None]
+        return self.rating_after(team_number, max(indices)) if indices else None
+
+    def snapshot(self, match_index: Optional[int] = None) -> Dict[int, float]:
+        """Every team's rating after match_index (default: end of season)."""
+        if match_index is None:
+            return dict(self.ratings)
+        ratings = {team: self.rating_after(team, match_index) for team in self.history}
+        return {team: rating for team, rating in ratings.items() if rating is not None}
+
+
+def stored_season_events(season: int) -> List[Tuple[str, Optional[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """(event code, event, matches) for every stored event of the season; cheap enough for the event loop."""
+    events = []
+    for _, event_code in match_store.events(season):
+        record = match_store.get_event(season, event_code)
+        events.append((event_code, record.get("event"), record["matches"]))
+    return events
+
+
+def build_season_ratings(season: int, k: float = RATING_K, divisor: float = WIN_PROBABILITY_DIVISOR) -> SeasonRatings:
+    """Replay every event of the season currently in match_store."""
+    return SeasonRatings(season, season_match_stream(stored_season_events(season)), k, divisor,
+                         match_store.version(season))
+
+
+_season_ratings: Dict[Tuple[int, float, float], SeasonRatings] = {}
+_rebuilds: Dict[Tuple[int, float, float], Tuple[int, asyncio.Task]] = {}
+# Background refreshes started by current_season_ratings, kept referenced until they finish
+_background_refreshes: Set[asyncio.Task] = set()
+
+
+def _ratings_key(season: int, k: float, divisor: float) -> Tuple[int, float, float]:
+    return int(season), float(k), float(divisor)
+
+
+def _forget_rebuild(key: Tuple[int, float, float], task: asyncio.Task):
+    if key in _rebuilds and _rebuilds[key][1] is task:
+        del _rebuilds[key]
+
+
+def _background_refresh_done(task: asyncio.Task):
+    _background_refreshes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error refreshing season ratings: {task.exception()}")
+
+
+def _keep(key: Tuple[int, float, float], ratings: SeasonRatings):
+    current = _season_ratings.get(key)
+    if current is None or current.source_version < ratings.source_version:
+        _season_ratings[key] = ratings
+
+
+def get_season_ratings(season: int, k: float = RATING_K, divisor: float = WIN_PROBABILITY_DIVISOR) -> SeasonRatings:
+    """Ratings for a season, replayed again (inline) only when the season's stored matches change."""
+    key = _ratings_key(season, k, divisor)
+    ratings = _season_ratings.get(key)
+    if ratings is None or ratings.source_version != match_store.version(season):
+        ratings = _season_ratings[key] = build_season_ratings(season, k, divisor)
+    return ratings
+
+
+async def refresh_season_ratings(season: int, k: float = RATING_K,
+                                 divisor: float = WIN_PROBABILITY_DIVISOR) -> SeasonRatings:
+    """Up-to-date ratings for a season, replayed in a worker thread; concurrent callers share one replay."""
+    key = _ratings_key(season, k, divisor)
+    version = match_store.version(season)
+    ratings = _season_ratings.get(key)
+    if ratings is not None and ratings.source_version == version:
+        return ratings
+    rebuild = _rebuilds.get(key)
+    if rebuild is None or rebuild[0] != version or rebuild[1].get_loop() is not asyncio.get_running_loop():
+        # The event list is taken on the loop; stored match lists are replaced, never mutated, by put_event
+        events = stored_season_events(season)
+        task = asyncio.create_task(asyncio.to_thread(
+            lambda: SeasonRatings(season, season_match_stream(events), k, divisor, version)))
+        task.add_done_callback(lambda done, key=key: _forget_rebuild(key, done))
+        rebuild = _rebuilds[key] = (version, task)
+    ratings = await asyncio.shield(rebuild[1])
+    _keep(key, ratings)
+    return ratings
+
+
+def current_season_ratings(season: int, k: float = RATING_K,
+                           divisor: float = WIN_PROBABILITY_DIVISOR) -> Optional[SeasonRatings]:
+    """get_season_ratings, except that on the event loop a season is never replayed inline.
+
+    There the latest replay is returned (None before the first one) and, when
+    it is out of date, a rebuild is started in a worker thread. Callers await
+    refresh_season_ratings first to be sure of current ratings.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return get_season_ratings(season, k, divisor)
+    key = _ratings_key(season, k, divisor)
+    ratings = _season_ratings.get(key)
+    if ratings is None or ratings.source_version != match_store.version(season):
+        rebuild = _rebuilds.get(key)
+        if rebuild is None or rebuild[0] != match_store.version(season):
+            task = asyncio.create_task(refresh_season_ratings(season, k, divisor))
+            _background_refreshes.add(task)
+            task.add_done_callback(_background_refresh_done)
+    return ratings
+
+
+def clear_season_ratings():
+    _season_ratings.clear()
+    _rebuilds.clear()
+    _background_refreshes.clear()
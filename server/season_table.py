@@ -0,0 +1,299 @@
+"""
+Season-wide team EPA table behind the leaderboard endpoint.
+
+The table is built in a single pass over every event's full match list for a
+season (from match_store, filled with one /matches call per event rather than
+per-team fetches). For each qualification match the alliance-level values are
+computed once and credited to every team on the alliance, using the same
+formulas as EPACalculator.calculate_season_epa and
+AllianceMatchmaker._calculate_team_stats.
+
+Rows live in NumPy arrays with a precomputed sort order per column, so a
+leaderboard request (filter, sort, page) is a few array operations and never
+recomputes EPAs. Tables are rebuilt when the season's stored matches change or
+after FTC_SEASON_TABLE_TTL seconds (at most once per FTC_SEASON_TABLE_MIN_AGE).
+A rebuild refetches every event that was not yet final when it was stored.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+import numpy as np
+from epa_calculator import DEFAULT_RECENCY_SLOPE
+from match_fetch import FETCH_CONCURRENCY
+from match_store import match_store
+from utils.api_utils import ftc_api_request, ftc_api_paginate
+
+SEASON_TABLE_TTL = float(os.getenv("FTC_SEASON_TABLE_TTL", "3600"))
+# New match data triggers a rebuild only once the table is at least this old
+SEASON_TABLE_MIN_AGE = float(os.getenv("FTC_SEASON_TABLE_MIN_AGE", "60"))
+NUMERIC_COLUMNS = ("epa", "auto", "teleop", "endgame", "matches", "events")
+SORT_COLUMNS = NUMERIC_COLUMNS + ("teamNumber",)
+FILTER_FIELDS = {"region": "homeRegion", "state": "stateProv", "country": "country"}
+
+
+class _TeamAccumulator:
+    """Running sums for one team; season EPA uses calculate_season_epa's recency weights in O(1) memory."""
+    __slots__ = ("epa_sum", "epa_index_sum", "epa_count", "auto", "teleop", "endgame", "matches", "events")
+
+    def __init__(self):
+        self.epa_sum = 0.0
+        self.epa_index_sum = 0.0
+        self.epa_count = 0
+        self.auto = 0.0
+        self.teleop = 0.0
+        self.endgame = 0.0
+        self.matches = 0
+        self.events = set()
+
+    def add(self, event_code: str, match_epa: float, auto: float, teleop: float, endgame: float):
+        if match_epa > 0:
+            self.epa_index_sum += self.epa_count * match_epa
+            self.epa_sum += match_epa
+            self.epa_count += 1
+        self.auto += auto
+        self.teleop += teleop
+        self.endgame += endgame
+        self.matches += 1
+        self.events.add(event_code)
+
+    def season_epa(self, slope: float = DEFAULT_RECENCY_SLOPE) -> float:
+        # sum((1 + slope * i / n) * x_i) / sum(1 + slope * i / n) for i in 0..n-1
+        n = self.epa_count
+        if n == 0:
+            return 0.0
+        return (self.epa_sum + slope * self.epa_index_sum / n) / (n + slope * (n - 1) / 2)
+
+
+def _alliance_values(match: Dict[str, Any], color: str, opponent: str, size: int):
+    """(match EPA, auto, teleop, endgame) credited to each of `size` teams on one alliance."""
+    score = match.get(f"score{color}Final", 0) or 0
+    opponent_score = match.get(f"score{opponent}Final", 0) or 0
+    if score == 0 and opponent_score == 0:
+        match_epa = 0.0
+    else:
+        match_epa = (score / size) * (1 + opponent_score / max(score, 1))
+    auto = match.get(f"score{color}Auto", 0) or 0
+    teleop = match.get(f"score{color}Teleop", 0) or 0
+    endgame = match.get(f"score{color}End", 0) or 0
+    if auto == 0 and teleop == 0 and endgame == 0:
+        # Rough estimates based on typical score distributions
+        auto, teleop, endgame = score * 0.3, score * 0.5, score * 0.2
+    return match_epa, auto / size, teleop / size, endgame / size
+
+
+def accumulate_season(events: List[Dict[str, Any]]) -> Dict[int, _TeamAccumulator]:
+    """One pass over [{"code", "matches"}, ...] (chronological) crediting every team slot."""
+    teams: Dict[int, _TeamAccumulator] = {}
+    for event in events:
+        for match in event["matches"]:
+            if str(match.get("tournamentLevel", "")).upper() != "QUALIFICATION":
+                continue
+            red = [slot["teamNumber"] for slot in match.get("teams", []) if "Red" in slot.get("station", "")]
+            blue = [slot["teamNumber"] for slot in match.get("teams", []) if "Blue" in slot.get("station", "")]
+            for alliance, color, opponent in ((red, "Red", "Blue"), (blue, "Blue", "Red")):
+                if not alliance:
+                    continue
+                values = _alliance_values(match, color, opponent, len(alliance))
+                for team in alliance:
+                    accumulator = teams.get(team)
+                    if accumulator is None:
+                        accumulator = teams[team] = _TeamAccumulator()
+                    accumulator.add(event["code"], *values)
+    return teams
+
+
+class SeasonTable:
+    """Column arrays for one season plus precomputed sort orders for every sortable column."""
+
+    def __init__(self, season: int, accumulators: Dict[int, _TeamAccumulator], team_info: Dict[int, Dict[str, Any]],
+                 source_updated: float = 0.0):
+        self.season = season
+        self.built_at = time.time()
+        self.source_updated = source_updated
+        team_numbers = sorted(accumulators)
+        self.columns: Dict[str, np.ndarray] = {
+            "teamNumber": np.asarray(team_numbers, dtype=np.int64),
+            "epa": np.asarray([accumulators[team].season_epa() for team in team_numbers], dtype=np.float64),
+            "matches": np.asarray([accumulators[team].matches for team in team_numbers], dtype=np.int64),
+            "events": np.asarray([len(accumulators[team].events) for team in team_numbers], dtype=np.int64),
+        }
+        matches = np.maximum(self.columns["matches"], 1)
+        for component in ("auto", "teleop", "endgame"):
+            totals = np.asarray([getattr(accumulators[team], component) for team in team_numbers], dtype=np.float64)
+            self.columns[component] = totals / matches
+        self.info = [team_info.get(team, {}) for team in team_numbers]
+        self.filter_values = {
+            name: np.asarray([str(info.get(field) or "").lower() for info in self.info], dtype=object)
+            for name, field in FILTER_FIELDS.items()
+        }
+        # Stable sort orders per (column, descending); ties keep team-number order
+        self.orders: Dict[tuple, np.ndarray] = {}
+        for column in SORT_COLUMNS:
+            self.orders[(column, False)] = np.argsort(self.columns[column], kind="stable")
+            self.orders[(column, True)] = np.argsort(-self.columns[column], kind="stable")
+        ranks = np.empty(len(team_numbers), dtype=np.int64)
+        ranks[self.orders[("epa", True)]] = np.arange(1, len(team_numbers) + 1)
+        self.ranks = ranks
+
+    def __len__(self) -> int:
+        return len(self.columns["teamNumber"])
+
+    def query(self, sort: str = "epa", descending: bool = True, page: int = 1, page_size: int = 50,
+              filters: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+        order = self.orders[(sort, descending)]
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in (filters or {}).items():
+            if value:
+                mask &= self.filter_values[name] == value.lower()
+        selected = order[mask[order]]
+        page_rows = selected[(page - 1) * page_size:page * page_size]
+        return {
+            "season": self.season,
+            "teamCount": int(len(selected)),
+            "page": page,
+            "pageSize": page_size,
+            "pageTotal": max(1, -(-len(selected) // page_size)),
+            "sort": sort,
+            "order": "desc" if descending else "asc",
+            "builtAt": self.built_at,
+            "teams": [self.row(index) for index in page_rows.tolist()],
+        }
+
+    def row(self, index: int) -> Dict[str, Any]:
+        info = self.info[index]
+        return {
+            "rank": int(self.ranks[index]),
+            "teamNumber": int(self.columns["teamNumber"][index]),
+            "nameShort": info.get("nameShort"),
+            "region": info.get("homeRegion"),
+            "state": info.get("stateProv"),
+            "country": info.get("country"),
+            "epa": round(float(self.columns["epa"][index]), 2),
+            "auto": round(float(self.columns["auto"][index]), 1),
+            "teleop": round(float(self.columns["teleop"][index]), 1),
+            "endgame": round(float(self.columns["endgame"][index]), 1),
+            "matches": int(self.columns["matches"][index]),
+            "events": int(self.columns["events"][index]),
+        }
+
+
+def season_events(season: int) -> List[Dict[str, Any]]:
+    """The season's events currently in match_store, in chronological order.
+
+    Stored records are replaced rather than mutated, so the list is a snapshot
+    that can be read from a worker thread while the event loop keeps storing.
+    """
+    events = []
+    for _, event_code in match_store.events(season):
+        record = match_store.get_event(season, event_code)
+        date_start = ((record.get("event") or {}).get("dateStart") or "")[:10]
+        events.append({"code": event_code, "dateStart": date_start, "matches": record["matches"]})
+    events.sort(key=lambda event: (event["dateStart"], event["code"]))
+    return events
+
+
+def table_from_events(season: int, events: List[Dict[str, Any]], source_updated: float,
+                      team_info: Optional[Dict[int, Dict[str, Any]]] = None) -> SeasonTable:
+    return SeasonTable(season, accumulate_season(events), team_info or {}, source_updated)
+
+
+def build_season_table(season: int, team_info: Optional[Dict[int, Dict[str, Any]]] = None) -> SeasonTable:
+    """Build the table from the season's events currently in match_store."""
+    return table_from_events(season, season_events(season), match_store.last_updated(season), team_info)
+
+
+def event_finished_at(event: Optional[Dict[str, Any]]) -> Optional[float]:
+    """When an event's results are final: the end of its last day, with a day's margin for time zones."""
+    date_end = ((event or {}).get("dateEnd") or "")[:10]
+    if not date_end:
+        return None
+    return (datetime.fromisoformat(date_end) + timedelta(days=2)).timestamp()
+
+
+def needs_refresh(record: Optional[Dict[str, Any]], event: Dict[str, Any], now: Optional[float] = None) -> bool:
+    """An event is (re)fetched unless it was stored after it finished (or, without dates, within the TTL)."""
+    if record is None:
+        return True
+    now = now if now is not None else time.time()
+    finished_at = event_finished_at(event) or event_finished_at(record.get("event"))
+    if finished_at is None:
+        return now - record["updated"] >= SEASON_TABLE_TTL
+    return record["updated"] < finished_at
+
+
+async def load_season_matches(season: int, concurrency: int = FETCH_CONCURRENCY) -> int:
+    """Store every event's full match list for the season (one call per event not yet stored or not final)."""
+    events_response = await ftc_api_request(f"/{season}/events")
+    events = events_response.get("events", []) if events_response else []
+    now = time.time()
+    stale = [event for event in events if needs_refresh(match_store.get_event(season, event["code"]), event, now)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load_event(event):
+        stored = match_store.get_event(season, event["code"]) is not None
+        async with semaphore:
+            try:
+                # A stored event is being refreshed: a cached (or stale) response would be just as old
+                matches_response = await ftc_api_request(f"/{season}/matches/{event['code']}", bypass_cache=stored)
+            except Exception as e:
+                print(f"Error fetching matches for event {event['code']}: {str(e)}")
+                return
+        match_store.put_event(season, event["code"], (matches_response or {}).get("matches", []), event)
+
+    await asyncio.gather(*[load_event(event) for event in stale])
+    print(f"Loaded {len(stale)} of {len(events)} events for season {season}")
+    return len(stale)
+
+
+async def load_team_info(season: int) -> Dict[int, Dict[str, Any]]:
+    return {team["teamNumber"]: team async for team in ftc_api_paginate(f"/{season}/teams", "teams")}
+
+
+_tables: Dict[int, SeasonTable] = {}
+_builds: Dict[int, asyncio.Task] = {}
+
+
+def table_is_current(table: Optional[SeasonTable]) -> bool:
+    if table is None:
+        return False
+    age = time.time() - table.built_at
+    if age >= SEASON_TABLE_TTL:
+        return False
+    return age < SEASON_TABLE_MIN_AGE or match_store.last_updated(table.season) <= table.source_updated
+
+
+async def _rebuild(season: int) -> SeasonTable:
+    await load_season_matches(season)
+    team_info = await load_team_info(season)
+    table = await asyncio.to_thread(table_from_events, season, season_events(season),
+                                    match_store.last_updated(season), team_info)
+    _tables[season] = table
+    print(f"Built season {season} table with {len(table)} teams")
+    return table
+
+
+def current_season_table(season: int) -> Optional[SeasonTable]:
+    """The cached table for a season if it is still current, without rebuilding or fetching anything."""
+    table = _tables.get(season)
+    return table if table_is_current(table) else None
+
+
+async def get_season_table(season: int, refresh: bool = False) -> SeasonTable:
+    """The current table for a season, rebuilding it (once, for concurrent callers) when out of date.
+
+    refresh forces a rebuild, but still at most once per SEASON_TABLE_MIN_AGE.
+    """
+    table = _tables.get(season)
+    if table_is_current(table) and not (refresh and time.time() - table.built_at >= SEASON_TABLE_MIN_AGE):
+        return table
+    build = _builds.get(season)
+    if build is None or build.done() or build.get_loop() is not asyncio.get_running_loop():
+        build = _builds[season] = asyncio.create_task(_rebuild(season))
+    return await asyncio.shield(build)
+
+
+def clear_season_tables():
+    _tables.clear()
+    _builds.clear()
@@ -0,0 +1,340 @@
+"""
+Hyperparameter sweep of EPACalculator settings against historical events.
+
+Searches year weights, the in-season recency slope, the rating-model k and the
+win-probability divisor (grid or random search) and ranks every setting by
+how well it would have predicted the completed events in the local match
+store, scored as in backtest.py.
+
+Nothing is refetched or recomputed per setting. The match data is reduced
+once to arrays: for every (event, team) the prefix sums of the team's
+per-match EPAs before the event in each season (count, sum and index-weighted
+sum, from which the recency-weighted season EPA follows for any slope), plus
+the alliance slots and outcome of every match to predict. One setting is then
+a handful of NumPy operations, and settings are spread over a process pool.
+The rating model replays each season once per distinct k.
+
+Ranked by --metric (default logLoss); calibrationError is the match-weighted
+mean gap between predicted and observed win rates over calibration buckets,
+and earlyBrier is the Brier score over each season's first third of events,
+where faster-converging settings do better.
+
+Usage:
+    python sweep.py --divisor 100 200 400 --recency-slope 0 0.2 0.5
+    python sweep.py --model rating --k 0.1 0.2 0.3 --divisor 150 300
+    python sweep.py --random 200 --synthetic 400
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from backtest import TeamHistory, event_start, is_completed, load_synthetic, score_predictions, summarize
+from epa_calculator import (
+    DEFAULT_RECENCY_SLOPE, DEFAULT_WIN_PROBABILITY_DIVISOR, DEFAULT_YEAR_WEIGHTS, EPACalculator
+)
+from match_store import match_store
+from rating_engine import RATING_K, SeasonRatings, match_id, season_match_stream
+
+DEFAULT_OUTPUT = "sweep_report.json"
+RANK_METRICS = ("logLoss", "brier", "calibrationError", "earlyBrier", "accuracy")
+# Random search ranges
+RANDOM_RANGES = {"recencySlope": (0.0, 1.0), "k": (0.05, 0.5), "divisor": (50.0, 600.0)}
+
+
+class SweepData:
+    """Parameter-independent arrays for every completed event of the target seasons."""
+
+    def __init__(self, events: Dict[Tuple[int, str], Dict[str, Any]], seasons: List[int],
+                 target_seasons: Optional[List[int]] = None):
+        calculator = EPACalculator("average")
+        history = TeamHistory(events)
+        self.seasons = sorted(seasons)
+        self.streams = {season: season_match_stream(
+            (code, record.get("event"), record["matches"]) for (event_season, code), record in events.items()
+            if event_season == season) for season in self.seasons}
+        stream_index = {season: {match_id(code, match): index for index, (code, _, match) in enumerate(stream)}
+                        for season, stream in self.streams.items()}
+
+        # Per (season, team): prefix arrays over the team's history in event order
+        prefixes = {}
+        for (season, team), matches in history.matches.items():
+            if season not in stream_index:
+                continue
+            epas = np.asarray([calculator.calculate_match_epa(match, team) for match in matches], dtype=np.float64)
+            positive = epas > 0
+            values = epas[positive]
+            prefixes[(season, team)] = {
+                "positives": np.concatenate([[0], np.cumsum(positive)]),
+                "sum": np.concatenate([[0.0], np.cumsum(values)]),
+                "index_sum": np.concatenate([[0.0], np.cumsum(np.arange(len(values)) * values)]),
+                "last_match": np.concatenate([[-1], np.maximum.accumulate(
+                    [stream_index[season].get(match_id(match["eventCode"], match), -1) for match in matches])]),
+            }
+
+        targets = sorted(key for key, record in events.items()
+                         if (not target_seasons or key[0] in target_seasons) and is_completed(record))
+        rows: Dict[Tuple[Tuple[int, str], int], int] = {}
+        row_team, row_stats = [], []
+        slot_rows, slot_match, slot_red = [], [], []
+        outcomes, match_season, match_early = [], [], []
+        season_starts = defaultdict(list)
+        for key in targets:
+            season_starts[key[0]].append(event_start(events[key]))
+        early_cutoff = {season: sorted(starts)[len(starts) // 3] for season, starts in season_starts.items()}
+
+        for key in targets:
+            record = events[key]
+            cutoff = event_start(record)
+            for match in record["matches"]:
+                if str(match.get("tournamentLevel", "")).upper() == "PRACTICE":
+                    continue
+                match_index = len(outcomes)
+                for slot in match.get("teams", []):
+                    team = slot.get("teamNumber")
+                    if team is None:
+                        continue
+                    row = rows.get((key, team))
+                    if row is None:
+                        row = rows[(key, team)] = len(row_team)
+                        row_team.append(team)
+                        row_stats.append(self._row_stats(history, prefixes, team, cutoff))
+                    slot_rows.append(row)
+                    slot_match.append(match_index)
+                    slot_red.append("Red" in slot.get("station", ""))
+                red_score, blue_score = match["scoreRedFinal"], match["scoreBlueFinal"]
+                outcomes.append(1.0 if red_score > blue_score else 0.0 if red_score < blue_score else 0.5)
+                match_season.append(key[0])
+                match_early.append(cutoff < early_cutoff[key[0]] or len(season_starts[key[0]]) < 3)
+
+        stats = np.asarray(row_stats, dtype=np.float64).reshape(len(row_team), 5, len(self.seasons))
+        self.count, self.sum, self.index_sum, self.present, self.last_match = stats.transpose(1, 0, 2)
+        self.row_team = np.asarray(row_team, dtype=np.int64)
+        self.slot_rows = np.asarray(slot_rows, dtype=np.int64)
+        self.slot_match = np.asarray(slot_match, dtype=np.int64)
+        self.slot_sign = np.where(slot_red, 1.0, -1.0)
+        self.outcomes = np.asarray(outcomes, dtype=np.float64)
+        self.match_season = np.asarray(match_season, dtype=np.int64)
+        self.early = np.asarray(match_early, dtype=bool)
+        self.events = len(targets)
+        # The rating model's replays for the last k evaluated; settings are sorted by k
+        self._ratings_k: Optional[float] = None
+        self._ratings: Optional[np.ndarray] = None
+
+    def _row_stats(self, history: TeamHistory, prefixes, team: int, cutoff: str) -> List[List[float]]:
+        stats = [[0.0] * len(self.seasons) for _ in range(5)]
+        stats[4] = [-1.0] * len(self.seasons)
+        for column, season in enumerate(self.seasons):
+            key = (season, team)
+            if key not in history.starts:
+                continue
+            count = int(np.searchsorted(np.asarray(history.starts[key]), cutoff, side="left"))
+            if not count:
+                continue
+            prefix = prefixes[key]
+            positives = int(prefix["positives"][count])
+            stats[0][column] = positives
+            stats[1][column] = prefix["sum"][positives]
+            stats[2][column] = prefix["index_sum"][positives]
+            stats[3][column] = 1.0
+            stats[4][column] = prefix["last_match"][count]
+        return stats
+
+    def average_season_epas(self, slope: float) -> np.ndarray:
+        """calculate_season_epa for every (row, season) from the prefix sums."""
+        n = self.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            epas = (self.sum + slope * self.index_sum / n) / (n + slope * (n - 1) / 2)
+        return np.where(n > 0, epas, 0.0)
+
+    def season_ratings(self, k: float) -> np.ndarray:
+        """The rating after each (row, season)'s last earlier match, NaN where there is none; replayed once per k."""
+        if self._ratings_k == k and self._ratings is not None:
+            return self._ratings
+        ratings_by_row = np.full(self.last_match.shape, np.nan)
+        for column, season in enumerate(self.seasons):
+            ratings = SeasonRatings(season, self.streams[season], k)
+            for row in np.flatnonzero(self.last_match[:, column] >= 0).tolist():
+                rating = ratings.rating_after(int(self.row_team[row]), int(self.last_match[row, column]))
+                if rating is not None:
+                    ratings_by_row[row, column] = rating
+        self._ratings_k, self._ratings = k, ratings_by_row
+        return ratings_by_row
+
+    def rating_season_epas(self, k: float, slope: float) -> np.ndarray:
+        """calculate_rating_epa for every (row, season): the rating after the team's last earlier match."""
+        ratings = self.season_ratings(k)
+        return np.where(np.isnan(ratings), self.average_season_epas(slope), ratings)
+
+    def evaluate(self, config: Dict[str, Any], model: str = "average") -> Dict[str, Any]:
+        """Backtest metrics for one setting."""
+        if model == "rating":
+            season_epas = self.rating_season_epas(config["k"], config["recencySlope"])
+        else:
+            season_epas = self.average_season_epas(config["recencySlope"])
+        weights = np.asarray([config["yearWeights"].get(season, 0.0) for season in self.seasons])
+        # calculate_historical_epa: weighted over seasons with matches and a year weight
+        included = self.present * (weights > 0)
+        total_weight = included @ weights
+        with np.errstate(invalid="ignore", divide="ignore"):
+            team_epas = np.where(total_weight > 0, (season_epas * included) @ weights / total_weight, 0.0)
+        differences = np.bincount(self.slot_match, weights=self.slot_sign * team_epas[self.slot_rows],
+                                  minlength=len(self.outcomes))
+        with np.errstate(over="ignore"):
+            probabilities = 1 / (1 + np.power(10.0, -differences / config["divisor"]))
+        metrics = summarize(score_predictions(probabilities, self.outcomes))
+        early = summarize(score_predictions(probabilities[self.early], self.outcomes[self.early]))
+        matches = max(metrics["matches"], 1)
+        metrics["calibrationError"] = round(sum(bucket["matches"] * abs(bucket["meanPredicted"] - bucket["observedRedWinRate"])
+                                                for bucket in metrics["calibration"]) / matches, 4)
+        metrics["earlyBrier"] = early["brier"]
+        return metrics
+
+
+def grid_configs(year_weights: List[Dict[int, float]], slopes: List[float], ks: List[float],
+                 divisors: List[float]) -> List[Dict[str, Any]]:
+    return [{"yearWeights": weights, "recencySlope": slope, "k": k, "divisor": divisor}
+            for weights, slope, k, divisor in itertools.product(year_weights, slopes, ks, divisors)]
+
+
+def random_configs(count: int, seasons: List[int], seed: int = 0) -> List[Dict[str, Any]]:
+    """Random settings; year weights decay from 1.0 for the newest season."""
+    rng = random.Random(seed)
+    newest_first = sorted(seasons, reverse=True)
+    configs = []
+    for _ in range(count):
+        decay = rng.uniform(0.2, 1.0)
+        configs.append({
+            "yearWeights": {season: round(decay ** age, 3) for age, season in enumerate(newest_first)},
+            **{name: round(rng.uniform(low, high), 3) for name, (low, high) in RANDOM_RANGES.items()},
+        })
+    return configs
+
+
+_data: Optional[SweepData] = None
+
+
+def _init_worker(data: SweepData):
+    global _data
+    _data = data
+
+
+def _evaluate(job: Tuple[Dict[str, Any], str]) -> Dict[str, Any]:
+    config, model = job
+    return {**config, **_data.evaluate(config, model)}
+
+
+def run_sweep(data: SweepData, configs: List[Dict[str, Any]], model: str = "average", workers: int = 1,
+              metric: str = "logLoss") -> List[Dict[str, Any]]:
+    """Evaluate every setting and return results ranked best first."""
+    jobs = [(config, model) for config in configs]
+    if model == "rating":
+        # Replays are per k, so keep settings sharing a k in the same worker chunk
+        jobs.sort(key=lambda job: job[0]["k"])
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+            results = list(pool.map(_evaluate, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        _init_worker(data)
+        results = [_evaluate(job) for job in jobs]
+    descending = metric == "accuracy"
+    results.sort(key=lambda result: (result[metric] is None, -(result[metric] or 0) if descending else result[metric]))
+    for rank, result in enumerate(results, start=1):
+        result["rank"] = rank
+    return results
+
+
+def env_settings(config: Dict[str, Any], model: str) -> Dict[str, str]:
+    """The environment variables that configure EPACalculator with this setting."""
+    settings = {
+        "FTC_EPA_MODEL": model,
+        "FTC_EPA_YEAR_WEIGHTS": ",".join(f"{season}:{weight}" for season, weight in sorted(config["yearWeights"].items(), reverse=True)),
+        "FTC_EPA_RECENCY_SLOPE": str(config["recencySlope"]),
+        "FTC_WIN_PROBABILITY_DIVISOR": str(config["divisor"]),
+    }
+    if model == "rating":
+        settings["FTC_RATING_K"] = str(config["k"])
+    return settings
+
+
+def parse_weights(value: str, seasons: List[int]) -> Dict[int, float]:
+    """"1,0.7,0.5" -> weights for the newest, next and oldest seasons."""
+    weights = [float(weight) for weight in value.split(",")]
+    return dict(zip(sorted(seasons, reverse=True), weights))
+
+
+def main() -> int:
+    default_weights = ",".join(str(DEFAULT_YEAR_WEIGHTS[season]) for season in sorted(DEFAULT_YEAR_WEIGHTS, reverse=True))
+    parser = argparse.ArgumentParser(description="Sweep EPA and win-probability parameters against historical events")
+    parser.add_argument("--model", choices=["average", "rating"], default="average")
+    parser.add_argument("--year-weights", nargs="+", default=[default_weights],
+                        help="Comma-separated weights, newest season first")
+    parser.add_argument("--recency-slope", type=float, nargs="+", default=[DEFAULT_RECENCY_SLOPE])
+    parser.add_argument("--k", type=float, nargs="+", default=[RATING_K], help="Rating-model update rate")
+    parser.add_argument("--divisor", type=float, nargs="+", default=[DEFAULT_WIN_PROBABILITY_DIVISOR])
+    parser.add_argument("--random", type=int, metavar="N", help="Random search of N settings instead of the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seasons", type=int, nargs="+", help="Seasons to score (default: every stored season)")
+    parser.add_argument("--metric", choices=RANK_METRICS, default="logLoss")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--snapshot", help="Warm-start snapshot holding the match store (default: FTC_SNAPSHOT_PATH)")
+    parser.add_argument("--synthetic", type=int, metavar="TEAMS", help="Use synthetic data instead of the store")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        events = load_synthetic(args.synthetic)
+    else:
+        import warm_start
+        if not warm_start.load_snapshot(args.snapshot or warm_start.SNAPSHOT_PATH):
+            return 1
+        events = match_store.dump()
+
+    history_seasons = sorted(DEFAULT_YEAR_WEIGHTS)
+    if args.random:
+        configs = random_configs(args.random, history_seasons, args.seed)
+    else:
+        configs = grid_configs([parse_weights(value, history_seasons) for value in args.year_weights],
+                               args.recency_slope, args.k if args.model == "rating" else [RATING_K], args.divisor)
+
+    start_time = time.time()
+    data = SweepData(events, history_seasons, args.seasons)
+    prepared = time.time() - start_time
+    results = run_sweep(data, configs, args.model, args.workers, args.metric)
+    duration = time.time() - start_time
+    print(f"Evaluated {len(results)} settings on {len(data.outcomes)} matches from {data.events} events "
+          f"in {duration:.2f}s ({prepared:.2f}s preparing data)")
+
+    print(f"{'rank':>4}  {'yearWeights':<18} {'slope':>6} {'k':>6} {'divisor':>8}  "
+          f"{'logLoss':>8} {'brier':>7} {'calErr':>7} {'early':>7} {'acc':>6}")
+    for result in results[:args.top]:
+        weights = ",".join(str(result["yearWeights"][season]) for season in sorted(result["yearWeights"], reverse=True))
+        print(f"{result['rank']:>4}  {weights:<18} {result['recencySlope']:>6} {result['k']:>6} {result['divisor']:>8}  "
+              f"{result['logLoss']:>8} {result['brier']:>7} {result['calibrationError']:>7} "
+              f"{result['earlyBrier']:>7} {result['accuracy']:>6}")
+    if results:
+        print("Best setting:", " ".join(f"{name}={value}" for name, value in env_settings(results[0], args.model).items()))
+
+    with open(args.output, "w") as output_file:
+        json.dump({
+            "model": args.model,
+            "metric": args.metric,
+            "matches": int(len(data.outcomes)),
+            "events": data.events,
+            "durationSeconds": round(duration, 2),
+            "results": [{**result, "yearWeights": {str(season): weight for season, weight in result["yearWeights"].items()}}
+                        for result in results],
+        }, output_file, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
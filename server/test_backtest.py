@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from backtest import TeamHistory, load_synthetic, run_backtest, score_predictions, summarize
+from match_store import match_store
+
+
+@pytest.fixture(scope="module")
+def synthetic_events():
+    events = load_synthetic(60, seed=3)
+    match_store.clear()
+    return events
+
+
+def test_metrics_from_sums():
+    probabilities = np.array([0.9, 0.2, 0.6, 0.5])
+    outcomes = np.array([1.0, 0.0, 0.0, 0.5])
+    metrics = summarize(score_predictions(probabilities, outcomes))
+    assert metrics["matches"] == 4
+    assert metrics["brier"] == pytest.approx(np.mean((probabilities - outcomes) ** 2), abs=1e-4)
+    expected_log_loss = -np.mean(outcomes * np.log(probabilities) + (1 - outcomes) * np.log(1 - probabilities))
+    assert metrics["logLoss"] == pytest.approx(expected_log_loss, abs=1e-4)
+    # The tie is not counted; 0.6 for a red loss is the one miss
+    assert metrics["accuracy"] == pytest.approx(2 / 3, abs=1e-4)
+    assert [bucket["matches"] for bucket in metrics["calibration"]] == [1, 1, 1, 1]
+
+
+def test_history_excludes_the_event_being_predicted(synthetic_events):
+    history = TeamHistory(synthetic_events)
+    (season, event_code), record = next(
+        (key, record) for key, record in sorted(synthetic_events.items()) if key[0] == 2024 and record["matches"])
+    cutoff = record["event"]["dateStart"][:10]
+    team = record["matches"][0]["teams"][0]["teamNumber"]
+    before = history.matches_before(team, [2022, 2023, 2024], cutoff)
+    assert all(match["eventCode"] != event_code for matches in before.values() for match in matches)
+    assert all(synthetic_events[(season, match["eventCode"])]["event"]["dateStart"][:10] < cutoff
+               for season, matches in before.items() for match in matches)
+
+
+def test_backtest_reports_events_seasons_and_overall(synthetic_events):
+    report = run_backtest(seasons=[2023, 2024], events=synthetic_events)
+    assert set(report["seasons"]) == {"2023", "2024"}
+    assert report["overall"]["matches"] == sum(event["matches"] for event in report["events"])
+    assert 0 < report["overall"]["brier"] < 0.25
+    assert report["overall"]["accuracy"] > 0.6
+    assert {event["eventCode"] for event in report["events"]} >= {"BENCH"}
+
+
+def test_parallel_backtest_matches_serial(synthetic_events):
+    serial = run_backtest(seasons=[2024], workers=1, model="rating", events=synthetic_events)
+    parallel = run_backtest(seasons=[2024], workers=2, model="rating", events=synthetic_events)
+    assert parallel["events"] == serial["events"]
+    assert parallel["overall"] == serial["overall"]
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+from benchmark_suite import run_benchmarks, compare_reports
+from mock_ftc_api import create_mock_ftc_api
+
+@pytest.mark.asyncio
+async def test_mock_api_serves_target_event():
+    mock_app = create_mock_ftc_api(num_teams=12, target_event_code="TESTEVT")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app), base_url="http://mock") as client:
+        teams = (await client.get("/v2.0/2024/teams", params={"eventCode": "TESTEVT"})).json()
+        matches = (await client.get("/2024/matches/TESTEVT", params={"tournamentLevel": "qual"})).json()
+
+    assert teams["teamCountTotal"] == 12
+    assert matches["matches"]
+    assert all(match["tournamentLevel"] == "QUALIFICATION" for match in matches["matches"])
+    assert mock_app.state.calls["teams"] == 1
+    assert mock_app.state.calls["matches"] == 1
+
+@pytest.mark.asyncio
+async def test_mock_api_error_injection():
+    mock_app = create_mock_ftc_api(num_teams=4, error_rate=1.0, error_status=503)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app), base_url="http://mock") as client:
+        response = await client.get("/2024/events")
+
+    assert response.status_code == 503
+
+@pytest.mark.asyncio
+async def test_run_benchmarks_report_shape():
+    report = await run_benchmarks(team_counts=[6], iterations=1, concurrency=1, latency_ms=0, jitter_ms=0)
+
+    endpoints = {result["endpoint"] for result in report["results"]}
+    assert endpoints == {
+        "/api/event-predictions-epa",
+        "/api/teams/batch-historical-epa",
+        "/api/alliance-matchmaker/batch",
+    }
+    for result in report["results"]:
+        assert result["errors"] == 0
+        assert result["apiCallsPerRequest"] > 0
+        assert result["latencySeconds"]["p95"] >= result["latencySeconds"]["min"]
+
+    deltas = compare_reports(report, report)
+    assert all(row["meanLatencyChangePct"] == 0 for row in deltas)
@@ -0,0 +1,180 @@
+import asyncio
+import fnmatch
+import time
+import pytest
+import pytest_asyncio
+from utils.cache import MemoryCache, DiskCache, RedisCache, TieredCache
+
+class FakeRedisServer:
+    """Local stand-in speaking enough RESP for RedisCache (GET/SET/MGET/DEL/SCAN)."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = 0
+        self.delay = 0.0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, args):
+        name = args[0].upper()
+        if name == b"SET":
+            self.data[args[1]] = args[2]
+            return b"+OK\r\n"
+        if name == b"GET":
+            return self._bulk(self.data.get(args[1]))
+        if name == b"MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(self._bulk(self.data.get(key)) for key in args[1:])
+        if name == b"DEL":
+            removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if name == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            keys = [key for key in self.data if fnmatch.fnmatchcase(key.decode(), pattern)]
+            return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(self._bulk(key) for key in keys)
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer):
+        while True:
+            command = await self._read_command(reader)
+            if command is None:
+                break
+            self.commands += 1
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            writer.write(self._execute(command))
+            await writer.drain()
+        writer.close()
+
+@pytest_asyncio.fixture
+async def redis_server():
+    server = FakeRedisServer()
+    port = await server.start()
+    yield server, port
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_memory_cache_expires():
+    cache = MemoryCache(ttl=60, retention=600)
+    cache.set_local("fresh", 1)
+    cache.set_local("stale", 2, stored_at=time.time() - 120)
+    cache.set_local("dead", 3, stored_at=0)
+
+    assert await cache.get_many(["fresh", "stale", "dead", "missing"]) == {"fresh": 1}
+    assert cache.peek("stale")[1] == 2
+    assert set(cache.dump()) == {"fresh", "stale"}
+    assert cache.peek("dead") is None and len(cache) == 2
+
+def test_memory_cache_prunes_dead_entries():
+    cache = MemoryCache(ttl=60)
+    for key in range(100):
+        cache.set_local(key, key, stored_at=0)
+    cache.load([("restored", (0, "dead")), ("kept", (time.time(), "live"))])
+    assert cache.prune() == 100
+    assert len(cache) == 1 and cache.get_local("kept") == "live"
+
+@pytest.mark.asyncio
+async def test_disk_cache_shared_between_instances(tmp_path):
+    path = str(tmp_path / "team_epa.sqlite3")
+    writer = DiskCache(path, ttl=60)
+    await writer.set_many({f"{team}@": {"historicalEPA": team / 100} for team in range(1000)})
+
+    reader = DiskCache(path, ttl=60)
+    found = await reader.get_many([f"{team}@" for team in range(0, 1200, 100)])
+
+    assert len(found) == 10
+    assert found["500@"]["historicalEPA"] == 5.0
+    await reader.clear()
+    assert await writer.get("500@") is None
+
+@pytest.mark.asyncio
+async def test_disk_cache_prunes_expired_rows(tmp_path):
+    cache = DiskCache(str(tmp_path / "responses.sqlite3"), ttl=60)
+    await cache.set_many({"old": 1, "new": 2})
+    cache._db.execute("UPDATE cache SET stored_at = 0 WHERE key = 'old'")
+
+    assert await cache.get_many(["old", "new"]) == {"new": 2}
+    assert await cache.prune() == 1
+    assert cache._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 1
+
+@pytest.mark.asyncio
+async def test_redis_cache_drops_connection_after_cancellation(redis_server):
+    server, port = redis_server
+    cache = RedisCache(f"redis://127.0.0.1:{port}/0", ttl=60, namespace="team_epa")
+    await cache.set_many({"a": "value-a", "b": "value-b"})
+
+    server.delay = 0.2
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(cache.get_many(["a"]), 0.05)
+    server.delay = 0.0
+
+    # The cancelled MGET's reply must not be read as this one's
+    assert await cache.get_many(["b"]) == {"b": "value-b"}
+
+@pytest.mark.asyncio
+async def test_redis_cache_multi_get_is_one_command(redis_server):
+    server, port = redis_server
+    cache = RedisCache(f"redis://127.0.0.1:{port}/0", ttl=60, namespace="team_epa")
+    await cache.set_many({f"{team}@": {"historicalEPA": float(team)} for team in range(50)})
+    commands_before = server.commands
+
+    found = await cache.get_many([f"{team}@" for team in range(50)] + ["missing@"])
+
+    assert server.commands - commands_before == 1
+    assert len(found) == 50
+    assert found["49@"] == {"historicalEPA": 49.0}
+
+    await cache.delete("0@")
+    assert await cache.get("0@") is None
+    await cache.clear()
+    assert server.data == {}
+
+@pytest.mark.asyncio
+async def test_tiered_cache_fills_local_from_shared(redis_server):
+    server, port = redis_server
+    url = f"redis://127.0.0.1:{port}/0"
+    await TieredCache(MemoryCache(60), RedisCache(url, 60, "responses")).set("k", b"body")
+
+    other_worker = TieredCache(MemoryCache(60), RedisCache(url, 60, "responses"))
+    assert await other_worker.get("k") == b"body"
+    commands_before = server.commands
+    assert await other_worker.get("k") == b"body"
+    assert server.commands == commands_before
+
+@pytest.mark.asyncio
+async def test_tiered_cache_keeps_shared_entry_age(tmp_path, redis_server):
+    _, port = redis_server
+    path = str(tmp_path / "team_epa.sqlite3")
+    await DiskCache(path, ttl=60).set("k", "value")
+    DiskCache(path, ttl=60)._execute("UPDATE cache SET stored_at = ?", (time.time() - 50,))
+    written_at = time.time()
+    await RedisCache(f"redis://127.0.0.1:{port}/0", ttl=60, namespace="team_epa").set("k", "value")
+
+    # The local copy is not re-stamped, so it expires when the shared entry does
+    disk_worker = TieredCache(MemoryCache(60), DiskCache(path, ttl=60))
+    assert await disk_worker.get("k") == "value"
+    assert disk_worker.peek("k")[0] < time.time() - 49
+
+    redis_worker = TieredCache(MemoryCache(60), RedisCache(f"redis://127.0.0.1:{port}/0", ttl=60, namespace="team_epa"))
+    assert await redis_worker.get("k") == "value"
+    assert redis_worker.peek("k")[0] == pytest.approx(written_at, abs=1)
@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import ftc_api_request, set_api_transport, response_cache
+from utils.cassette import Cassette, set_cassette, RECORD, REPLAY
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    response_cache.reset()
+    yield str(tmp_path / "ftc.jsonl.gz")
+    set_cassette(None)
+    set_api_transport(None)
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(cassette_path):
+    mock_app = create_mock_ftc_api(num_teams=8, target_event_code="CASSETTE")
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    set_cassette(Cassette(cassette_path, RECORD))
+    recorded_teams = await ftc_api_request("/2024/teams", {"eventCode": "CASSETTE", "page": None})
+    recorded_matches = await ftc_api_request("/2024/matches/CASSETTE")
+    set_cassette(None)
+
+    # Cut the upstream off entirely; replay must not touch it
+    set_api_transport(None)
+    set_cassette(Cassette(cassette_path, REPLAY, latency_scale=0))
+    calls_before = sum(mock_app.state.calls.values())
+
+    assert await ftc_api_request("/2024/teams", {"eventCode": "CASSETTE"}) == recorded_teams
+    assert await ftc_api_request("/2024/matches/CASSETTE") == recorded_matches
+    assert sum(mock_app.state.calls.values()) == calls_before
+
+@pytest.mark.asyncio
+async def test_replay_reproduces_errors_and_misses(cassette_path):
+    mock_app = create_mock_ftc_api(num_teams=4, error_rate=1.0, error_status=503)
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    set_cassette(Cassette(cassette_path, RECORD))
+    with pytest.raises(HTTPException):
+        await ftc_api_request("/2024/events")
+    set_cassette(Cassette(cassette_path, REPLAY, latency_scale=0))
+
+    with pytest.raises(HTTPException) as recorded_error:
+        await ftc_api_request("/2024/events")
+    assert recorded_error.value.status_code == 503
+
+    with pytest.raises(HTTPException) as missing:
+        await ftc_api_request("/2024/teams")
+    assert missing.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_replay_survives_truncated_recording(cassette_path):
+    cassette = Cassette(cassette_path, RECORD)
+    cassette.record("/2024/events", None, 200, 0.0, {"events": [1]})
+    cassette.record("/2024/teams", None, 200, 0.0, {"teams": [2]})
+    cassette.close()
+    # A recorder killed mid-write leaves a truncated gzip member behind
+    with open(cassette_path, "rb") as cassette_file:
+        complete = cassette_file.read()
+    cassette = Cassette(cassette_path, RECORD)
+    cassette.record("/2024/awards", None, 200, 0.0, {"awards": ["x" * 5000]})
+    cassette.close()
+    with open(cassette_path, "rb") as cassette_file:
+        grown = cassette_file.read()
+    with open(cassette_path, "wb") as cassette_file:
+        cassette_file.write(grown[:len(complete) + (len(grown) - len(complete)) // 2])
+
+    set_cassette(Cassette(cassette_path, REPLAY, latency_scale=0))
+    assert await ftc_api_request("/2024/events") == {"events": [1]}
+    assert await ftc_api_request("/2024/teams") == {"teams": [2]}
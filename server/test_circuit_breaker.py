@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from main import app
+from mock_ftc_api import create_mock_ftc_api
+from utils import api_utils
+from utils.api_utils import ftc_api_request, set_api_transport, response_cache, RESPONSE_CACHE_TTL
+from utils.cache import request_key
+from utils.circuit_breaker import CircuitBreaker, api_breaker, CLOSED, OPEN, HALF_OPEN
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    response_cache.reset()
+    yield
+    set_api_transport(None)
+    response_cache.reset()
+
+def store_expired(endpoint, body, params=None, age=None):
+    stored_at = time.time() - (age if age is not None else RESPONSE_CACHE_TTL + 60)
+    response_cache.set_local(request_key(endpoint, params), json.dumps(body).encode(), stored_at=stored_at)
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.is_open()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()  # the single half-open probe
+    assert breaker.state == HALF_OPEN and not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_upstream_calls():
+    mock_app = create_mock_ftc_api(num_teams=4, error_rate=1.0, error_status=503)
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    for _ in range(api_breaker.failure_threshold):
+        with pytest.raises(HTTPException):
+            await ftc_api_request("/2024/events")
+    assert api_breaker.state == OPEN
+
+    calls_before = sum(mock_app.state.calls.values())
+    with pytest.raises(HTTPException) as error:
+        await ftc_api_request("/2024/teams")
+    assert error.value.status_code == 503
+    assert sum(mock_app.state.calls.values()) == calls_before
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_the_breaker():
+    set_api_transport(httpx.ASGITransport(app=create_mock_ftc_api(num_teams=4, error_rate=1.0, error_status=404)))
+    for _ in range(api_breaker.failure_threshold + 1):
+        with pytest.raises(HTTPException):
+            await ftc_api_request("/2024/events")
+    assert api_breaker.state == CLOSED
+
+@pytest.mark.asyncio
+async def test_expired_response_served_then_refreshed_in_background():
+    mock_app = create_mock_ftc_api(num_teams=4)
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    store_expired("/2024/events", {"events": [], "stale": True})
+
+    assert (await ftc_api_request("/2024/events"))["stale"] is True
+    await asyncio.gather(*api_utils._refresh_tasks.values())
+
+    refreshed = await ftc_api_request("/2024/events")
+    assert "stale" not in refreshed and refreshed["events"]
+    assert sum(mock_app.state.calls.values()) == 1
+
+@pytest.mark.asyncio
+async def test_open_circuit_serves_stale_without_refreshing():
+    store_expired("/2024/events", {"events": ["cached"]})
+    for _ in range(api_breaker.failure_threshold):
+        api_breaker.record_failure()
+
+    with patch("utils.api_utils._schedule_refresh") as schedule:
+        assert (await ftc_api_request("/2024/events")) == {"events": ["cached"]}
+    schedule.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_data_age_headers():
+    store_expired("/2024/events", {"events": []}, params={"eventCode": None, "teamNumber": None}, age=RESPONSE_CACHE_TTL + 120)
+    for _ in range(api_breaker.failure_threshold):
+        api_breaker.record_failure()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/events/2024")
+    assert response.status_code == 200
+    assert int(response.headers["X-Data-Age"]) >= RESPONSE_CACHE_TTL + 120
+    assert response.headers["X-Data-Stale"] == "1"
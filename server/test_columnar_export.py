@@ -0,0 +1,103 @@
+import io
+import json
+import zipfile
+import numpy as np
+import pytest
+import httpx
+from unittest.mock import patch
+from backtest import load_synthetic
+from columnar_export import match_columns, stream_zip, stream_season_zip, write_export, export_partitions
+from epa_calculator import EPACalculator
+from match_store import match_store
+import season_table
+from season_table import build_season_table, clear_season_tables
+from main import app
+
+
+@pytest.fixture
+def stored_events():
+    events = load_synthetic(12, seed=3)
+    match_store.clear()
+    match_store.load(events)
+    yield events
+    match_store.clear()
+
+
+def test_match_columns():
+    matches = [
+        {"matchNumber": 1, "tournamentLevel": "qualification", "scoreRedFinal": 60, "scoreBlueFinal": 30,
+         "teams": [{"teamNumber": 1, "station": "Red1"}, {"teamNumber": 2, "station": "Red2"},
+                   {"teamNumber": 3, "station": "Blue1"}, {"teamNumber": 4, "station": "Blue2"}]},
+        {"matchNumber": 2, "tournamentLevel": "QUALIFICATION", "scoreRedFinal": None, "scoreBlueFinal": None,
+         "teams": [{"teamNumber": 3, "station": "Red1"}, {"teamNumber": 1, "station": "Blue1"}]},
+    ]
+    columns = match_columns(matches)
+    assert columns["tournamentLevel"].tolist() == ["QUALIFICATION", "QUALIFICATION"]
+    assert columns["red1"].tolist() == [1, 3] and columns["red2"].tolist() == [2, 0]
+    assert columns["played"].tolist() == [True, False]
+    assert columns["scoreBlueFinal"].tolist() == [30, 0]
+    assert columns["redMatchEPA"][0] == pytest.approx(EPACalculator().calculate_match_epa(matches[0], 1))
+
+
+def test_export_round_trips_through_npz(stored_events, tmp_path):
+    written = write_export(str(tmp_path), [2024])
+    season_events = [key for key in stored_events if key[0] == 2024]
+    assert len(written) == len(season_events) + 1
+
+    _, event_code = season_events[0]
+    with np.load(tmp_path / "season=2024" / f"event={event_code}" / "matches.npz", allow_pickle=False) as data:
+        assert data["matchNumber"].tolist() == [match["matchNumber"] for match in stored_events[(2024, event_code)]["matches"]]
+    with np.load(tmp_path / "season=2024" / "teams.npz", allow_pickle=False) as data:
+        table = build_season_table(2024)
+        assert np.array_equal(data["teamNumber"], table.columns["teamNumber"])
+        assert np.allclose(data["epa"], table.columns["epa"])
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert [entry["path"] for entry in manifest["partitions"]] == [path for path, _ in written]
+
+
+def test_stream_zip_yields_per_partition(stored_events):
+    chunks = list(stream_zip([2024]))
+    partitions = list(export_partitions([2024]))
+    # One chunk per partition plus the manifest and central directory
+    assert len(chunks) == len(partitions) + 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == [path for path, _, _ in partitions] + ["manifest.json"]
+        assert archive.read(partitions[0][0]) == partitions[0][1]
+
+
+@pytest.mark.asyncio
+async def test_async_stream_matches_sync_export(stored_events):
+    chunks = [chunk async for chunk in stream_season_zip(2024)]
+    assert len(chunks) == len(list(stream_zip([2024])))
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        for path, data, _ in export_partitions([2024]):
+            assert archive.read(path) == data
+
+
+@pytest.mark.asyncio
+async def test_async_stream_reuses_current_season_table(stored_events):
+    clear_season_tables()
+    season_table._tables[2024] = build_season_table(2024)
+    try:
+        with patch("columnar_export.table_from_events") as rebuild:
+            chunks = [chunk async for chunk in stream_season_zip(2024)]
+    finally:
+        clear_season_tables()
+    rebuild.assert_not_called()
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert "season=2024/teams.npz" in archive.namelist()
+
+
+@pytest.mark.asyncio
+async def test_export_endpoint(stored_events):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/export/2024")
+        bad_format = await client.get("/api/export/2024", params={"format": "csv"})
+        missing = await client.get("/api/export/1999")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert "season=2024/teams.npz" in archive.namelist()
+    assert bad_format.status_code == 400
+    assert missing.status_code == 404
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from epa_parallel import ParallelEPAProcessor, team_epa_cache, team_epa_key
+from main import app
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import ftc_api_request, set_api_transport, response_cache
+from utils.deadline import start_deadline, time_remaining
+import warm_start
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    warm_start.clear_caches()
+    yield
+    start_deadline(None)
+    set_api_transport(None)
+    warm_start.clear_caches()
+
+def test_deadline_is_scoped_to_context():
+    assert time_remaining() is None
+    start_deadline(5)
+    assert 4 < time_remaining() <= 5
+    start_deadline(None)
+    assert time_remaining() is None
+
+@pytest.mark.asyncio
+async def test_api_request_fails_fast_after_deadline():
+    set_api_transport(httpx.ASGITransport(app=create_mock_ftc_api(num_teams=4, latency_ms=500)))
+    start_deadline(0.1)
+    started = time.perf_counter()
+    with pytest.raises(HTTPException) as error:
+        await ftc_api_request("/2024/events")
+    assert error.value.status_code == 504
+    assert time.perf_counter() - started < 0.4
+
+    with pytest.raises(HTTPException):
+        await ftc_api_request("/2024/teams")
+
+@pytest.mark.asyncio
+async def test_slow_teams_are_cancelled_and_flagged():
+    async def fake_calculate(self, team_number, event_start_date=None):
+        if team_number == 3:
+            await asyncio.sleep(10)
+        if team_number == 4:
+            return {"teamNumber": 4, "historicalEPA": 0.0, "error": "upstream down"}
+        return {"teamNumber": team_number, "historicalEPA": float(team_number)}
+
+    # Team 3 has an expired cache entry to fall back on
+    team_epa_cache.set_local(team_epa_key(3, "2020-01-01"), {"historicalEPA": 33.0, "matches": {}},
+                              stored_at=time.time() - team_epa_cache.ttl - 60)
+
+    start_deadline(0.2)
+    with patch.object(ParallelEPAProcessor, "calculate_team_epa", fake_calculate):
+        started = time.perf_counter()
+        results = await ParallelEPAProcessor().calculate_multiple_team_epas([1, 3, 4, 5], "2020-01-01")
+    assert time.perf_counter() - started < 1
+
+    by_team = {result["teamNumber"]: result for result in results}
+    assert [result["teamNumber"] for result in results] == [1, 3, 4, 5]
+    assert by_team[1]["status"] == "fresh"
+    assert by_team[3]["status"] == "stale" and by_team[3]["historicalEPA"] == 33.0
+    assert by_team[4]["status"] == "missing" and by_team[4]["error"] == "upstream down"
+
+@pytest.mark.asyncio
+async def test_event_predictions_return_partial_results():
+    set_api_transport(httpx.ASGITransport(app=create_mock_ftc_api(num_teams=24, target_event_code="BUDGET")))
+
+    async def fake_calculate(self, team_number, event_start_date=None):
+        if team_number % 2:
+            await asyncio.sleep(10)
+        return {"teamNumber": team_number, "historicalEPA": 10.0}
+
+    with patch.object(ParallelEPAProcessor, "calculate_team_epa", fake_calculate):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/event-predictions-epa",
+                                         json={"season": 2024, "eventCode": "BUDGET", "budgetSeconds": 0.5})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["partial"] is True
+    assert set(body["teamEPAStatus"].values()) == {"fresh", "missing"}
+    assert len(body["predictions"]) == len(body["matches"])
+
+@pytest.mark.asyncio
+async def test_matchmaker_fallback_runs_without_expired_deadline():
+    set_api_transport(httpx.ASGITransport(app=create_mock_ftc_api(num_teams=6, target_event_code="SLOW",
+                                                                  latency_ms=200)))
+    deadlines_seen = []
+
+    async def fake_calculate(self, team_number, event_start_date=None):
+        deadlines_seen.append(time_remaining())
+        return {"teamNumber": team_number, "historicalEPA": float(team_number % 50), "matches": {}}
+
+    # Event predictions time out; the fallback must not inherit their spent deadline
+    with patch("main.EVENT_PREDICTIONS_BUDGET", 0.05), \
+            patch.object(ParallelEPAProcessor, "calculate_team_epa", fake_calculate):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            teams = (await client.get("/api/teams/2024", params={"eventCode": "SLOW"})).json()["teams"]
+            response = await client.post("/api/alliance-matchmaker", json={
+                "season": 2024, "eventCode": "SLOW", "teamNumber": teams[0]["teamNumber"]})
+
+    assert response.status_code == 200
+    assert deadlines_seen and all(remaining is None for remaining in deadlines_seen)
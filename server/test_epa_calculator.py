@@ -112,4 +112,50 @@ async def test_get_team_matches_invalid_event_data(calculator):
         result = await calculator.get_team_matches(12345)
         
         assert isinstance(result, dict)
-        assert len(result) == 0  # Should skip invalid event
\ No newline at end of file
+        assert len(result) == 0  # Should skip invalid event
+
+
+def make_season_api(matches_per_season):
+    """Fake ftc_api_request: one event per season with the given number of qualification matches."""
+    calls = []
+
+    async def fake_ftc_api_request(endpoint, params=None):
+        season = int(endpoint.split("/")[1])
+        calls.append(season)
+        if endpoint.endswith("/events"):
+            return {"events": [{"code": f"E{season}", "name": f"Event {season}", "dateStart": f"{season}-11-01"}]}
+        return {"matches": [
+            {"matchNumber": number, "tournamentLevel": "QUALIFICATION",
+             "teams": [{"teamNumber": 12345, "station": "Red1"}], "scoreRedFinal": 50, "scoreBlueFinal": 40}
+            for number in range(1, matches_per_season.get(season, 0) + 1)
+        ]}
+    return fake_ftc_api_request, calls
+
+@pytest.mark.asyncio
+async def test_lazy_history_skips_older_seasons_for_established_teams():
+    fake_api, calls = make_season_api({2024: 12, 2023: 10, 2022: 8})
+    calculator = EPACalculator(seasons=[2022, 2023, 2024], lazy_history=True, history_threshold=12)
+    with patch('epa_calculator.ftc_api_request', fake_api):
+        result = await calculator.get_team_matches(12345)
+        assert list(result) == [2024]
+        assert set(calls) == {2024}
+
+        # An explicit request for full history loads every season
+        full = await calculator.get_team_matches(12345, full_history=True)
+        assert list(full) == [2024, 2023, 2022]
+
+@pytest.mark.asyncio
+async def test_lazy_history_loads_older_seasons_below_threshold():
+    fake_api, calls = make_season_api({2024: 3, 2023: 10})
+    calculator = EPACalculator(seasons=[2023, 2024], lazy_history=True, history_threshold=12)
+    with patch('epa_calculator.ftc_api_request', fake_api):
+        result = await calculator.get_team_matches(12345)
+    assert list(result) == [2024, 2023]
+    assert len(result[2023]) == 10
+    assert calls[0] == 2024
+
+def test_season_range_from_config():
+    from epa_calculator import parse_seasons
+    assert parse_seasons("2021-2023") == [2021, 2022, 2023]
+    assert parse_seasons("2024, 2022") == [2022, 2024]
+    assert EPACalculator(seasons=[2024, 2023]).seasons == [2023, 2024]
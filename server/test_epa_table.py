@@ -0,0 +1,63 @@
+import time
+import pytest
+import epa_table
+from epa_parallel import ParallelEPAProcessor
+
+@pytest.fixture(autouse=True)
+def table_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(epa_table, "CHECK_INTERVAL", 0.0)
+    epa_table.set_table_dir(str(tmp_path))
+    yield tmp_path
+
+def test_publish_and_lookup():
+    table = epa_table.build_table([
+        {"team": 19376, "epa": 88.5, "auto": 20.0, "teleop": 50.0, "endgame": 18.5, "matches": 30},
+        {"team": 5773, "epa": 61.0, "matches": 12},
+    ])
+    epa_table.publish_table(2024, table)
+
+    rows = epa_table.get_reader(2024).lookup_many([5773, 19376, 11111])
+
+    assert set(rows) == {5773, 19376}
+    assert rows[19376]["epa"] == pytest.approx(88.5)
+    assert rows[19376]["teleop"] == pytest.approx(50.0)
+    assert rows[5773]["matches"] == 12
+
+def test_republish_is_picked_up_and_new_rows_win():
+    epa_table.publish_table(2024, epa_table.build_table([{"team": 100, "epa": 10.0}, {"team": 200, "epa": 20.0}]))
+    reader = epa_table.get_reader(2024)
+    assert reader.lookup(100)["epa"] == pytest.approx(10.0)
+
+    epa_table.merge_and_publish(2024, [{"team": 100, "epa": 15.0}, {"team": 300, "epa": 30.0}])
+
+    assert reader.lookup(100)["epa"] == pytest.approx(15.0)
+    assert reader.lookup(200)["epa"] == pytest.approx(20.0)
+    assert reader.lookup(300)["epa"] == pytest.approx(30.0)
+
+def test_max_age_filters_stale_rows():
+    epa_table.publish_table(2024, epa_table.build_table([{"team": 100, "epa": 10.0, "updated": time.time() - 7200}]))
+
+    assert epa_table.get_reader(2024).lookup_many([100], max_age=3600) == {}
+
+@pytest.mark.asyncio
+async def test_processor_reads_table_instead_of_recomputing():
+    epa_table.publish_table(epa_table.CURRENT_SEASON, epa_table.build_table([{"team": 16461, "epa": 77.0}]))
+
+    results = await ParallelEPAProcessor().calculate_multiple_team_epas([16461])
+
+    assert results[0]["source"] == "epa_table"
+    assert ParallelEPAProcessor().get_epa_mapping(results) == {"16461": pytest.approx(77.0)}
+
+def test_writer_merges_rows_handed_off_by_other_workers():
+    now = time.time()
+    epa_table.hand_off_rows(2024, [{"team": 100, "epa": 10.0, "updated": now - 60}, {"team": 200, "epa": 20.0}])
+    assert epa_table.claim_pending(2025) == []
+
+    # The writer's own, older row for team 100 must not override the worker's newer one
+    epa_table.merge_and_publish(2024, [{"team": 100, "epa": 5.0, "updated": now - 120}],
+                                epa_table.claim_pending(2024))
+
+    reader = epa_table.get_reader(2024)
+    assert reader.lookup(100)["epa"] == pytest.approx(10.0)
+    assert reader.lookup(200)["epa"] == pytest.approx(20.0)
+    assert epa_table.claim_pending(2024) == []
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import httpx
+from unittest.mock import patch, AsyncMock
+from epa_calculator import EPACalculator
+from epa_timeseries import team_epa_series, series_points, clear_series
+from utils.downsample import lttb_indices
+from main import app
+
+
+def make_matches(event_code, scores, team=1, date=None):
+    return [
+        {"eventCode": event_code, "eventName": event_code, "eventDate": date, "tournamentLevel": "QUALIFICATION",
+         "matchNumber": number,
+         "teams": [{"teamNumber": team, "station": "Red1"}, {"teamNumber": 2, "station": "Blue1"}],
+         "scoreRedFinal": score, "scoreBlueFinal": 20}
+        for number, score in enumerate(scores, start=1)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def fresh_series():
+    clear_series()
+    yield
+    clear_series()
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[437] = 10.0
+    keep = lttb_indices(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep.tolist()
+    assert np.all(np.diff(keep) > 0)
+    assert len(lttb_indices(x[:10], y[:10], 50)) == 10
+
+
+def test_last_point_matches_historical_epa():
+    calculator = EPACalculator()
+    matches = {2023: make_matches("A", [30, 50, 10]), 2024: make_matches("B", [40, 60, 80, 5])}
+    series = team_epa_series(1, matches, calculator)
+    assert len(series.points) == 7
+    assert series.points[-1]["epa"] == round(calculator.calculate_historical_epa(matches, 1), 2)
+    assert series.points[2]["seasonEPA"] == round(calculator.calculate_season_epa(matches[2023], 1), 2)
+
+
+def test_series_extends_incrementally_and_rebuilds_on_changes():
+    calculator = EPACalculator()
+    matches = {2024: make_matches("A", [30, 50])}
+    series = team_epa_series(1, matches, calculator)
+    grown = {2024: make_matches("A", [30, 50, 70])}
+    assert team_epa_series(1, grown, calculator) is series
+    assert len(series.points) == 3
+
+    corrected = {2024: make_matches("A", [35, 50, 70])}
+    rebuilt = team_epa_series(1, corrected, calculator)
+    assert rebuilt is not series
+    assert rebuilt.points[-1]["epa"] == round(calculator.calculate_historical_epa(corrected, 1), 2)
+
+
+def test_event_granularity_and_downsampling():
+    matches = {2024: make_matches("A", [30, 50]) + make_matches("B", [40]) + make_matches("C", list(range(20, 80)))}
+    series = team_epa_series(1, matches)
+    by_event = series_points(series, "event")
+    assert [point["eventCode"] for point in by_event["points"]] == ["A", "B", "C"]
+    assert by_event["historicalEPA"] == series.points[-1]["epa"]
+
+    sampled = series_points(series, "match", max_points=10)
+    assert sampled["pointCount"] == 63 and sampled["downsampled"]
+    assert len(sampled["points"]) == 10
+    assert sampled["points"][-1] == series.points[-1]
+
+
+@pytest.mark.asyncio
+async def test_points_follow_event_dates_and_end_at_the_scalar_epa():
+    events = [{"code": "LATE", "name": "Late", "dateStart": "2025-02-01T00:00:00"},
+              {"code": "EARLY", "name": "Early", "dateStart": "2024-11-02T00:00:00"}]
+    scores = {"LATE": [90], "EARLY": [30, 50]}
+
+    async def fake_api(endpoint, params=None):
+        season = int(endpoint.split("/")[1])
+        if endpoint.endswith("/events"):
+            return {"events": events if season == 2024 else []}
+        return {"matches": make_matches(endpoint.rsplit("/", 1)[1], scores[endpoint.rsplit("/", 1)[1]])}
+
+    calculator = EPACalculator(seasons=[2024])
+    with patch("epa_calculator.ftc_api_request", side_effect=fake_api):
+        matches = await calculator.get_team_matches(1)
+    series = team_epa_series(1, matches, calculator)
+    assert [point["eventCode"] for point in series.points] == ["EARLY", "EARLY", "LATE"]
+    assert [point["date"] for point in series.points] == ["2024-11-02", "2024-11-02", "2025-02-01"]
+    assert [point["matchNumber"] for point in series.points[:2]] == [1, 2]
+    assert series.points[-1]["epa"] == round(calculator.calculate_historical_epa(matches, 1), 2)
+
+
+@pytest.mark.asyncio
+async def test_epa_history_endpoint():
+    matches = {2024: make_matches("A", [30, 50, 70])}
+    cached = AsyncMock(return_value={"teamNumber": 1, "historicalEPA": 0.0, "matches": matches})
+    fetch = AsyncMock()
+    with patch("main.ParallelEPAProcessor.calculate_team_epa", new=cached), \
+            patch("main.EPACalculator.get_team_matches", new=fetch):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/teams/1/epa-history", params={"granularity": "event"})
+            bad_granularity = await client.get("/api/teams/1/epa-history", params={"granularity": "week"})
+            bad_points = await client.get("/api/teams/1/epa-history", params={"maxPoints": 2})
+
+    assert response.status_code == 200
+    assert response.json()["pointCount"] == 1
+    # Matches come from the team EPA cache rather than a fresh fetch
+    fetch.assert_not_called()
+    assert bad_granularity.status_code == 400
+    assert bad_points.status_code == 400
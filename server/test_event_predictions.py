@@ -0,0 +1,162 @@
+import copy
+import httpx
+import pytest
+from unittest.mock import patch
+from epa_parallel import ParallelEPAProcessor
+from event_predictions import build_delta, event_fingerprint, match_key, remember_version
+from main import app
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import set_api_transport
+import warm_start
+
+TEAMS = [{"teamNumber": 1}, {"teamNumber": 2}, {"teamNumber": 3}, {"teamNumber": 4}]
+MATCHES = [
+    {"matchNumber": 1, "tournamentLevel": "QUALIFICATION", "actualStartTime": "2025-04-03T09:00:00",
+     "scoreRedFinal": 50, "scoreBlueFinal": 40},
+    {"matchNumber": 2, "tournamentLevel": "QUALIFICATION", "actualStartTime": "2025-04-03T09:10:00",
+     "scoreRedFinal": 60, "scoreBlueFinal": 70},
+]
+
+def test_fingerprint_tracks_roster_and_latest_scored_match():
+    base = event_fingerprint(TEAMS, MATCHES)
+    assert event_fingerprint(list(reversed(TEAMS)), list(reversed(MATCHES))) == base
+
+    unplayed = MATCHES + [{"matchNumber": 3, "tournamentLevel": "QUALIFICATION",
+                           "scoreRedFinal": None, "scoreBlueFinal": None}]
+    assert event_fingerprint(TEAMS, unplayed) == base
+
+    played = MATCHES + [{"matchNumber": 3, "tournamentLevel": "QUALIFICATION",
+                         "actualStartTime": "2025-04-03T09:20:00", "scoreRedFinal": 10, "scoreBlueFinal": 20}]
+    assert event_fingerprint(TEAMS, played) != base
+
+    corrected = copy.deepcopy(MATCHES)
+    corrected[1]["scoreBlueFinal"] = 71
+    assert event_fingerprint(TEAMS, corrected) != base
+    assert event_fingerprint(TEAMS + [{"teamNumber": 5}], MATCHES) != base
+
+def make_response(matches, teams=TEAMS, epas=None):
+    epas = epas or {str(team["teamNumber"]): 10.0 for team in teams}
+    return {
+        "teams": teams,
+        "matches": matches,
+        "teamEPAs": epas,
+        "teamEPAStatus": {team: "fresh" for team in epas},
+        "predictions": [{"matchNumber": match["matchNumber"], "redWinProbability": 0.5} for match in matches],
+        "partial": False,
+        "version": event_fingerprint(teams, matches),
+    }
+
+def test_delta_contains_only_changed_items():
+    old = make_response(MATCHES)
+    corrected = copy.deepcopy(MATCHES)
+    corrected[1]["scoreBlueFinal"] = 71
+    new = make_response(corrected, epas={**old["teamEPAs"], "3": 12.5})
+    history = remember_version(remember_version(None, old["version"], old), new["version"], new)
+
+    delta = build_delta(history, old["version"], new["version"], new)
+    assert delta["delta"] is True
+    assert delta["sinceVersion"] == old["version"]
+    assert delta["matches"] == [corrected[1]]
+    assert delta["predictions"] == []
+    assert delta["teamEPAs"] == {"3": 12.5}
+    assert delta["removedMatches"] == []
+
+    unchanged = build_delta(history, new["version"], new["version"], new)
+    assert unchanged["matches"] == [] and unchanged["teamEPAs"] == {}
+
+def test_delta_falls_back_to_full_response():
+    old = make_response(MATCHES)
+    history = remember_version(None, old["version"], old)
+    assert build_delta(history, "unknown", old["version"], old) is None
+
+    # Roster changes and deltas touching most of the matches are sent in full
+    grown = make_response(MATCHES, teams=TEAMS + [{"teamNumber": 5}])
+    assert build_delta(history, old["version"], grown["version"], grown) is None
+    rescored = copy.deepcopy(MATCHES)
+    for match in rescored:
+        match["scoreRedFinal"] += 1
+    rescored_response = make_response(rescored)
+    assert build_delta(history, old["version"], rescored_response["version"], rescored_response) is None
+
+def test_version_history_is_bounded():
+    history = None
+    with patch("event_predictions.VERSION_HISTORY", 3):
+        for number in range(5):
+            response = make_response(MATCHES[:1], epas={"1": float(number)})
+            history = remember_version(history, f"v{number}", response)
+    assert list(history) == ["v2", "v3", "v4"]
+    assert match_key(MATCHES[0]) in history["v4"]["matches"]
+
+@pytest.mark.asyncio
+async def test_event_predictions_cached_until_a_new_result_lands():
+    warm_start.clear_caches()
+    mock_app = create_mock_ftc_api(num_teams=24, target_event_code="CACHE")
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    computed = []
+
+    async def fake_epas(self, team_numbers, event_start_date=None):
+        computed.append(len(team_numbers))
+        return [{"teamNumber": team, "historicalEPA": float(team % 50), "status": "fresh"} for team in team_numbers]
+
+    try:
+        with patch.object(ParallelEPAProcessor, "calculate_multiple_team_epas", fake_epas):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                request = {"season": 2024, "eventCode": "CACHE"}
+                first = (await client.post("/api/event-predictions-epa", json=request)).json()
+                second = (await client.post("/api/event-predictions-epa", json=request)).json()
+                assert len(computed) == 1
+                assert second == first
+
+                # A new scored match changes the fingerprint even while the match list is in the response cache
+                matches = mock_app.state.data.matches["CACHE"]
+                matches.append({**matches[-1], "matchNumber": matches[-1]["matchNumber"] + 1,
+                                "actualStartTime": "2099-01-01T00:00:00"})
+                third = (await client.post("/api/event-predictions-epa", json=request)).json()
+    finally:
+        set_api_transport(None)
+        warm_start.clear_caches()
+
+    assert len(computed) == 2
+    assert third["version"] != first["version"]
+    assert len(third["predictions"]) == len(first["predictions"]) + 1
+
+@pytest.mark.asyncio
+async def test_event_predictions_delta_since_client_version():
+    warm_start.clear_caches()
+    mock_app = create_mock_ftc_api(num_teams=24, target_event_code="DELTA")
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+
+    async def fake_epas(self, team_numbers, event_start_date=None):
+        return [{"teamNumber": team, "historicalEPA": float(team % 50), "status": "fresh"} for team in team_numbers]
+
+    try:
+        with patch.object(ParallelEPAProcessor, "calculate_multiple_team_epas", fake_epas):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                request = {"season": 2024, "eventCode": "DELTA"}
+                first = (await client.post("/api/event-predictions-epa", json=request)).json()
+                same = (await client.post("/api/event-predictions-epa",
+                                          json={**request, "sinceVersion": first["version"]})).json()
+
+                matches = mock_app.state.data.matches["DELTA"]
+                added = {**matches[-1], "matchNumber": matches[-1]["matchNumber"] + 1,
+                         "actualStartTime": "2099-01-01T00:00:00"}
+                matches.append(added)
+                delta = (await client.post("/api/event-predictions-epa",
+                                           json={**request, "sinceVersion": first["version"]})).json()
+                unknown = (await client.post("/api/event-predictions-epa",
+                                             json={**request, "sinceVersion": "not-a-version"})).json()
+    finally:
+        set_api_transport(None)
+        warm_start.clear_caches()
+
+    assert same["delta"] is True and same["matches"] == [] and same["predictions"] == []
+    assert delta["delta"] is True
+    assert delta["sinceVersion"] == first["version"]
+    assert [match["matchNumber"] for match in delta["matches"]] == [added["matchNumber"]]
+    assert [prediction["matchKey"] for prediction in delta["predictions"]] == [match_key(added)]
+    assert unknown["delta"] is False
+    assert len(unknown["matches"]) == len(first["matches"]) + 1
+    # Full responses carry the same keys, so a delta can be merged into them
+    assert first["delta"] is False
+    assert [match["matchKey"] for match in first["matches"]] == [match_key(match) for match in matches[:-1]]
+    assert [prediction["matchKey"] for prediction in first["predictions"]] == [match["matchKey"] for match in first["matches"]]
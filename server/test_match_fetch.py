@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from match_fetch import fetch_team_historical_matches, fetch_team_season_matches, split_matches_by_level
+
+EVENTS = {
+    2023: [{"code": "A23", "name": "Event A"}, {"code": "B23", "name": "Event B"}],
+    2024: [{"code": "A24", "name": "Event C"}],
+}
+
+
+def make_fake_api(in_flight, peak, calls=None):
+    calls = calls if calls is not None else []
+
+    async def fake_ftc_api_request(endpoint, params=None):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.01)
+            season = int(endpoint.split("/")[1])
+            if endpoint.endswith("/events"):
+                if season not in EVENTS:
+                    raise HTTPException(status_code=404, detail="No events")
+                return {"events": EVENTS[season]}
+            assert "tournamentLevel" not in (params or {})
+            calls.append(endpoint)
+            return {"matches": [
+                {"matchNumber": 1, "tournamentLevel": "QUALIFICATION"},
+                {"matchNumber": 1, "tournamentLevel": "PLAYOFF"},
+                {"matchNumber": 2, "tournamentLevel": "PRACTICE"},
+            ]}
+        finally:
+            in_flight[0] -= 1
+    return fake_ftc_api_request
+
+
+def test_split_matches_by_level():
+    by_level = split_matches_by_level([
+        {"tournamentLevel": "QUALIFICATION"},
+        {"tournamentLevel": "SEMIFINAL"},
+        {"tournamentLevel": "PLAYOFF"},
+        {"tournamentLevel": "PRACTICE"},
+        None,
+    ])
+    assert len(by_level["qual"]) == 1
+    assert len(by_level["playoff"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_season_matches_keep_event_and_level_order():
+    calls = []
+    with patch("match_fetch.ftc_api_request", make_fake_api([0], [0], calls)):
+        matches = await fetch_team_season_matches(2023, 1234)
+
+    # One unfiltered request per event, split locally
+    assert sorted(calls) == ["/2023/matches/A23", "/2023/matches/B23"]
+    assert [(m["eventCode"], m["tournamentLevel"]) for m in matches] == [
+        ("A23", "qual"), ("A23", "playoff"), ("B23", "qual"), ("B23", "playoff"),
+    ]
+    assert matches[0]["eventName"] == "Event A"
+
+
+@pytest.mark.asyncio
+async def test_historical_matches_fan_out_is_bounded():
+    in_flight, peak = [0], [0]
+    with patch("match_fetch.ftc_api_request", make_fake_api(in_flight, peak)):
+        history = await fetch_team_historical_matches(1234, seasons=range(2022, 2025), concurrency=3)
+
+    assert list(history) == [2022, 2023, 2024]
+    assert history[2022] == []
+    assert len(history[2023]) == 4
+    assert len(history[2024]) == 2
+    assert 1 < peak[0] <= 3
+
+
+@pytest.mark.asyncio
+async def test_historical_matches_propagate_non_404_errors():
+    async def failing_request(endpoint, params=None):
+        raise HTTPException(status_code=500, detail="upstream down")
+
+    with patch("match_fetch.ftc_api_request", failing_request):
+        with pytest.raises(HTTPException) as error:
+            await fetch_team_historical_matches(1234, seasons=[2024])
+    assert error.value.status_code == 500
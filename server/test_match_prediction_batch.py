@@ -0,0 +1,81 @@
+import random
+import httpx
+import pytest
+from unittest.mock import patch
+from epa_calculator import EPACalculator
+from epa_parallel import ParallelEPAProcessor
+from main import app
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import set_api_transport, response_cache
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_vectorized_probabilities_match_scalar_formula():
+    rng = random.Random(3)
+    team_epas = {str(team): rng.uniform(-50, 300) for team in range(1, 40)}
+    red = [rng.sample(range(1, 45), 2) for _ in range(200)]  # some teams have no EPA
+    blue = [rng.sample(range(1, 45), rng.choice([1, 2, 3])) for _ in range(200)]
+    calculator = EPACalculator()
+
+    vectorized = calculator.calculate_win_probabilities(red, blue, team_epas)
+    for index in range(200):
+        scalar = calculator.calculate_match_win_probability(red[index], blue[index], team_epas)
+        assert round(float(vectorized["red_win_probability"][index]), 3) == scalar["red_win_probability"]
+        assert abs(vectorized["red_epa"][index] - vectorized["blue_epa"][index]) == pytest.approx(scalar["win_margin"])
+
+def test_extreme_differences_do_not_overflow():
+    result = EPACalculator().calculate_win_probabilities([[1]], [[2]], {"1": 0.0, "2": 1e6})
+    assert result["red_win_probability"][0] == 0.0
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_with_epa_map():
+    async with client() as http:
+        response = await http.post("/api/match-prediction/batch", json={
+            "matchups": [[[1, 2], [3, 4]], {"redTeams": [3, 4], "blueTeams": [1, 2]}, [[1, 2], [9]]],
+            "teamEpas": {"1": 120, "2": 80, "3": 60, "4": 40},
+        })
+    body = response.json()
+    assert response.status_code == 200
+    assert body["count"] == 3
+    assert body["redEPA"] == [200, 100, 200]
+    assert body["redWinProbability"][0] == pytest.approx(1 - body["redWinProbability"][1], abs=1e-3)
+    assert body["predictedWinner"] == "RBR"
+    assert body["teamsWithoutEPA"] == [9]
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_resolves_epas_from_event():
+    response_cache.reset()
+    set_api_transport(httpx.ASGITransport(app=create_mock_ftc_api(num_teams=8, target_event_code="BATCH")))
+    requested = []
+
+    async def fake_epas(self, team_numbers, event_start_date=None):
+        requested.extend(team_numbers)
+        return [{"teamNumber": team, "historicalEPA": float(team), "status": "fresh"} if team != 40 else
+                {"teamNumber": team, "historicalEPA": 0.0, "status": "missing", "error": "upstream down"}
+                for team in team_numbers]
+
+    try:
+        with patch.object(ParallelEPAProcessor, "calculate_multiple_team_epas", fake_epas):
+            async with client() as http:
+                response = await http.post("/api/match-prediction/batch", json={
+                    "season": 2024, "eventCode": "BATCH",
+                    "matchups": [[[10, 20], [30, 40]]], "teamEpas": {"10": 500},
+                })
+    finally:
+        set_api_transport(None)
+    assert sorted(requested) == [20, 30, 40]
+    assert response.json()["redEPA"] == [520]
+    assert response.json()["blueEPA"] == [30]
+    assert response.json()["teamsWithoutEPA"] == [40]
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_rejects_bad_matchups():
+    async with client() as http:
+        assert (await http.post("/api/match-prediction/batch", json={"matchups": "x"})).status_code == 400
+        assert (await http.post("/api/match-prediction/batch", json={"matchups": [[[1]]]})).status_code == 400
+        for body in ({"matchups": [[[1, 2], 3]]},
+                     {"matchups": [[[1, 2], [{"team": 3}]]]},
+                     {"matchups": [[[1], [2]]], "teamEpas": [1, 2]},
+                     {"matchups": [[[1], [2]]], "teamEpas": {"1": "high"}}):
+            assert (await http.post("/api/match-prediction/batch", json=body)).status_code == 400
@@ -0,0 +1,32 @@
+from microbench import run_microbenchmarks, check_regressions, time_callable
+
+def test_run_microbenchmarks_single_team():
+    results = run_microbenchmarks({"team": 1}, repeat=1, min_time=0.001)
+
+    assert set(results) == {
+        "calculate_match_epa@team",
+        "calculate_season_epa@team",
+        "calculate_historical_epa@team",
+        "calculate_match_win_probability@team",
+        "predict_matches@team",
+        "_calculate_team_stats@team",
+        "find_best_alliance_partner@team",
+    }
+    for result in results.values():
+        assert result["opsPerSec"] > 0
+        assert result["peakKiB"] >= 0
+
+def test_time_callable_calibrates_loops():
+    timing = time_callable(lambda: sum(range(100)), repeat=2, min_time=0.001)
+
+    assert timing["loops"] >= 1
+    assert timing["medianSeconds"] > 0
+
+def test_check_regressions_respects_threshold():
+    baseline = {"a@team": {"opsPerSec": 100.0}, "b@team": {"opsPerSec": 100.0}}
+    results = {"a@team": {"opsPerSec": 85.0}, "b@team": {"opsPerSec": 70.0}, "c@team": {"opsPerSec": 1.0}}
+
+    regressions = check_regressions(results, baseline, threshold_pct=20)
+
+    assert [regression["benchmark"] for regression in regressions] == ["b@team"]
+    assert regressions[0]["changePct"] == -30.0
@@ -0,0 +1,140 @@
+import asyncio
+import httpx
+import numpy as np
+import pytest
+import alliance_matchmaker_fixed
+from alliance_matchmaker_fixed import AllianceMatchmaker
+from main import app
+from match_store import match_store
+from opr import OPRSystem, SparseMatrix, compute_opr, conjugate_gradient, event_opr
+
+
+def make_matches(contributions, num_matches=400, noise=0.0, seed=0, with_components=True):
+    """Random 2v2 qualification matches whose alliance components are sums of `contributions` rows."""
+    rng = np.random.default_rng(seed)
+    teams = list(contributions)
+    matches = []
+    for number in range(num_matches):
+        picked = rng.choice(teams, 4, replace=False)
+        match = {"matchNumber": number + 1, "tournamentLevel": "QUALIFICATION", "teams": [
+            {"teamNumber": int(team), "station": station}
+            for team, station in zip(picked, ("Red1", "Red2", "Blue1", "Blue2"))
+        ]}
+        for color, alliance in (("Red", picked[:2]), ("Blue", picked[2:])):
+            auto, teleop, endgame = np.sum([contributions[team] for team in alliance], axis=0) + rng.normal(0, noise, 3)
+            match[f"score{color}Final"] = auto + teleop + endgame
+            if with_components:
+                match[f"score{color}Auto"], match[f"score{color}Teleop"], match[f"score{color}End"] = auto, teleop, endgame
+        matches.append(match)
+    return matches
+
+
+CONTRIBUTIONS = {team: np.array([5.0 + team % 7, 20.0 + 3 * (team % 5), 10.0 + team % 3]) for team in range(100, 130)}
+
+
+def test_sparse_products_match_dense():
+    rng = np.random.default_rng(1)
+    rows, cols = rng.integers(0, 20, 60), rng.integers(0, 8, 60)
+    matrix = SparseMatrix(rows, cols, (20, 8), rng.normal(size=60))
+    dense = np.zeros((20, 8))
+    np.add.at(dense, (rows, cols), matrix.data)
+    x, y = rng.normal(size=(8, 3)), rng.normal(size=20)
+    assert np.allclose(matrix.matvec(x), dense @ x)
+    assert np.allclose(matrix.rmatvec(y), dense.T @ y)
+
+
+def test_conjugate_gradient_solves_each_column():
+    rng = np.random.default_rng(2)
+    basis = rng.normal(size=(12, 12))
+    system = basis @ basis.T + 12 * np.eye(12)
+    b = rng.normal(size=(12, 4))
+    x, iterations = conjugate_gradient(lambda v: system @ v, b)
+    assert np.allclose(system @ x, b, atol=1e-6)
+    assert iterations <= 12 * 10
+
+
+def test_opr_recovers_component_contributions():
+    result = compute_opr(make_matches(CONTRIBUTIONS), ridge=1e-6)
+    for team, (auto, teleop, endgame) in CONTRIBUTIONS.items():
+        opr = result.team(team)
+        assert opr["auto"] == pytest.approx(auto, abs=1e-3)
+        assert opr["teleop"] == pytest.approx(teleop, abs=1e-3)
+        assert opr["endgame"] == pytest.approx(endgame, abs=1e-3)
+        assert opr["total"] == pytest.approx(auto + teleop + endgame, abs=1e-3)
+    assert result.team(999) is None
+
+
+def test_opr_matches_dense_ridge_solution():
+    system = OPRSystem((match, 1.0) for match in make_matches(CONTRIBUTIONS, num_matches=40, noise=4.0))
+    solution, _ = system.solve(ridge=2.0)
+    design = np.zeros(system.design.shape)
+    design[system.design.rows, system.design.cols] = 1.0
+    prior = system.targets.mean(axis=0) / 2
+    dense = prior + np.linalg.solve(design.T @ design + 2.0 * np.eye(design.shape[1]),
+                                    design.T @ (system.targets - np.outer(design.sum(axis=1), prior)))
+    assert np.allclose(solution, dense, atol=1e-5)
+
+
+def test_alliances_without_components_only_count_toward_total():
+    matches = make_matches(CONTRIBUTIONS) + make_matches(
+        {team: value * 3 for team, value in CONTRIBUTIONS.items()}, num_matches=50, seed=3, with_components=False)
+    opr = compute_opr(matches, ridge=1e-6).team(100)
+    assert opr["auto"] == pytest.approx(CONTRIBUTIONS[100][0], abs=1e-3)
+    assert opr["total"] > CONTRIBUTIONS[100].sum() + 1
+
+
+def test_event_opr_uses_stored_qualification_matches():
+    matches = make_matches(CONTRIBUTIONS, num_matches=200)
+    playoff = {**matches[0], "tournamentLevel": "PLAYOFF", "scoreRedFinal": 10_000}
+    match_store.put_event(2024, "OPRTEST", matches + [playoff])
+    try:
+        result = event_opr(2024, "OPRTEST")
+    finally:
+        match_store.clear()
+    assert len(result) == len(CONTRIBUTIONS)
+    assert result.team(100)["total"] < 1_000
+
+
+@pytest.mark.asyncio
+async def test_matchmaker_uses_component_opr():
+    matches = make_matches(CONTRIBUTIONS, num_matches=300)
+    team_matches = {team: {2024: [match for match in matches
+                                  if any(slot["teamNumber"] == team for slot in match["teams"])]}
+                    for team in CONTRIBUTIONS}
+    even = AllianceMatchmaker("even")
+    opr = AllianceMatchmaker("opr")
+    result = await opr.find_best_alliance_partner(100, list(CONTRIBUTIONS), {}, team_matches)
+
+    assert len(result["bestMatches"]) == 3
+    stats = result["bestMatches"][0]["team1Stats"]
+    assert stats["auto"] == pytest.approx(CONTRIBUTIONS[100][0], abs=0.2)
+    assert even._calculate_team_stats(team_matches[100], 100) != stats
+    with pytest.raises(ValueError):
+        AllianceMatchmaker("dense")
+
+
+@pytest.mark.asyncio
+async def test_matchmaker_solves_opr_once_per_request(monkeypatch):
+    matches = make_matches(CONTRIBUTIONS, num_matches=100)
+    team_matches = {team: {2024: [match for match in matches
+                                  if any(slot["teamNumber"] == team for slot in match["teams"])]}
+                    for team in CONTRIBUTIONS}
+    solves = []
+    real_solve = alliance_matchmaker_fixed.compute_weighted_opr
+    monkeypatch.setattr(alliance_matchmaker_fixed, "compute_weighted_opr",
+                        lambda *args: solves.append(1) or real_solve(*args))
+    matchmaker = AllianceMatchmaker("opr")
+    await asyncio.gather(*[matchmaker.find_best_alliance_partner(team, list(CONTRIBUTIONS), {}, team_matches)
+                           for team in list(CONTRIBUTIONS)[:4]])
+    assert len(solves) == 1
+
+
+@pytest.mark.asyncio
+async def test_matchmaker_rejects_unknown_component_model():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        single = await client.post("/api/alliance-matchmaker",
+                                   json={"season": 2024, "eventCode": "X", "teamNumber": 1, "componentModel": "dense"})
+        batch = await client.post("/api/alliance-matchmaker/batch",
+                                  json={"season": 2024, "eventCode": "X", "teamNumbers": [1], "componentModel": "dense"})
+    assert single.status_code == 400
+    assert batch.status_code == 400
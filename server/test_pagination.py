@@ -0,0 +1,91 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from main import app
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import ftc_api_paginate, set_api_transport, response_cache
+
+@pytest.fixture
+def mock_api():
+    response_cache.reset()
+    mock_app = create_mock_ftc_api(num_teams=120)
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    yield mock_app
+    set_api_transport(None)
+
+@pytest.mark.asyncio
+async def test_paginate_yields_every_page_in_order(mock_api):
+    first_page = await anext(ftc_api_paginate("/2024/teams", "teams"))
+    teams = [team async for team in ftc_api_paginate("/2024/teams", "teams", {"page": 3}, window=2)]
+
+    assert teams[0] == first_page
+    numbers = [team["teamNumber"] for team in teams]
+    assert len(numbers) > 100
+    assert numbers == sorted(set(numbers))
+
+@pytest.mark.asyncio
+async def test_paginate_single_response_without_page_metadata(mock_api):
+    events = [event async for event in ftc_api_paginate("/2024/events", "events")]
+    assert events and all("code" in event for event in events)
+
+@pytest.mark.asyncio
+async def test_paginate_stops_requesting_when_consumer_stops(mock_api):
+    async def fake_request(endpoint, params=None):
+        requested.append(params["page"])
+        return {"teams": [{"teamNumber": params["page"]}], "pageTotal": 50}
+
+    requested = []
+    with patch("utils.api_utils.ftc_api_request", fake_request):
+        pages = ftc_api_paginate("/2024/teams", "teams", window=4)
+        async for team in pages:
+            if team["teamNumber"] == 2:
+                break
+        await pages.aclose()
+    assert max(requested) <= 6
+
+@pytest.mark.asyncio
+async def test_paginate_waits_for_cancelled_pages_when_a_page_fails(mock_api):
+    async def fake_request(endpoint, params=None):
+        page = params["page"]
+        if page == 2:
+            raise HTTPException(status_code=503, detail="FTC API unavailable")
+        if page > 2:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(page)
+                raise
+        return {"teams": [{"teamNumber": page}], "pageTotal": 5}
+
+    cancelled = []
+    with patch("utils.api_utils.ftc_api_request", fake_request):
+        with pytest.raises(HTTPException):
+            [team async for team in ftc_api_paginate("/2024/teams", "teams", window=4)]
+    assert sorted(cancelled) == [3, 4, 5]
+
+@pytest.mark.asyncio
+async def test_teams_endpoint_streams_all_pages(mock_api):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        single = (await client.get("/api/teams/2024")).json()
+        streamed = (await client.get("/api/teams/2024", params={"allPages": "true"})).json()
+
+    assert single["pageTotal"] > 1
+    assert streamed["count"] == single["teamCountTotal"] == len(streamed["teams"])
+    assert streamed["teams"][:len(single["teams"])] == single["teams"]
+
+@pytest.mark.asyncio
+async def test_teams_stream_stays_valid_json_when_a_later_page_fails(mock_api):
+    async def fake_request(endpoint, params=None):
+        if params.get("page") == 3:
+            raise HTTPException(status_code=503, detail="FTC API unavailable")
+        return {"teams": [{"teamNumber": params.get("page")}], "pageTotal": 4}
+
+    with patch("utils.api_utils.ftc_api_request", fake_request), patch("main.ftc_api_request", fake_request):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/teams/2024", params={"allPages": "true"})
+
+    body = response.json()
+    assert body["teams"] == [{"teamNumber": 1}, {"teamNumber": 2}]
+    assert body["count"] == 2 and body["error"] == "FTC API unavailable"
@@ -3,7 +3,13 @@ import sys
 import asyncio
 import time
 import pytest
-from epa_parallel import ParallelEPAProcessor
+from unittest.mock import patch
+from fastapi import HTTPException
+from epa_calculator import EPACalculator
+from epa_parallel import ParallelEPAProcessor, team_epa_cache, team_epa_key
+from utils.api_utils import response_cache
+from utils.circuit_breaker import api_breaker
+from mock_ftc_api import SyntheticSeasonData
 
 # Add the current directory to path for importing modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -32,7 +38,10 @@ async def test_multiple_team_epa_calculation():
         assert result['teamNumber'] in team_numbers
     
     # Benchmark against sequential processing
-    # Process teams one at a time
+    # Process teams one at a time, without the caches (or breaker state) the parallel run left behind
+    team_epa_cache.reset()
+    response_cache.reset()
+    api_breaker.reset()
     start_time = time.time()
     sequential_results = []
     for team in team_numbers:
@@ -101,6 +110,130 @@ async def test_match_prediction_parallelization():
     print(f"\nMatch prediction parallel processing time: {parallel_time:.2f} seconds")
 
 
+def test_vectorized_predictions_match_per_match_results():
+    """predict_matches must produce exactly what calculate_match_win_probability does per match."""
+    data = SyntheticSeasonData(40, seed=11)
+    matches = [match for event in data.events[data.target_season] for match in data.matches[event["code"]]]
+    team_epas = {str(team): float((team * 37) % 150) for team in data.team_numbers[:-5]}  # some teams lack EPAs
+    processor = ParallelEPAProcessor()
+
+    predictions = processor.predict_matches(matches, team_epas)
+
+    assert len(predictions) == len(matches)
+    for match, prediction in zip(matches, predictions):
+        red = [team['teamNumber'] for team in match['teams'] if 'Red' in team['station']]
+        blue = [team['teamNumber'] for team in match['teams'] if 'Blue' in team['station']]
+        assert prediction == {
+            'matchNumber': match['matchNumber'],
+            'prediction': processor.calculator.calculate_match_win_probability(red, blue, team_epas),
+        }
+
+
+
+def test_vectorized_predictions_keep_the_tie_fallback():
+    teams = lambda red, blue: [{"teamNumber": red, "station": "Red1"}, {"teamNumber": blue, "station": "Blue1"}]
+    matches = [{"matchNumber": 1, "teams": teams(1, 2)},   # Blue so far ahead that 10^(ΔEPA/divisor) overflows
+               {"matchNumber": 2, "teams": teams(3, 1)},   # team 3's EPA is None
+               {"matchNumber": 3, "teams": teams(2, 1)}]   # Red far ahead: a certain win, not a tie
+    team_epas = {"1": 0.0, "2": 1e6, "3": None}
+    processor = ParallelEPAProcessor()
+
+    predictions = processor.predict_matches(matches, team_epas)
+
+    assert [prediction["prediction"]["predicted_winner"] for prediction in predictions] == ["Tie", "Tie", "Red"]
+    for match, prediction in zip(matches, predictions):
+        red, blue = match["teams"][0]["teamNumber"], match["teams"][1]["teamNumber"]
+        assert prediction["prediction"] == processor.calculator.calculate_match_win_probability([red], [blue], team_epas)
+@pytest.mark.asyncio
+async def test_concurrent_team_epa_requests_share_one_computation():
+    team_epa_cache.reset()
+    calls = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fake_get_team_matches(self, team_number, start_date=None, failures=None):
+        calls.append((team_number, start_date))
+        started.set()
+        await release.wait()
+        return {}
+
+    with patch.object(EPACalculator, "get_team_matches", fake_get_team_matches):
+        first = asyncio.create_task(ParallelEPAProcessor().calculate_team_epa(4242, "2024-03-01"))
+        second = asyncio.create_task(ParallelEPAProcessor().calculate_team_epa(4242, "2024-03-01T09:00:00"))
+        other_cutoff = asyncio.create_task(ParallelEPAProcessor().calculate_team_epa(4242, "2024-04-01"))
+        await started.wait()
+        await asyncio.sleep(0)
+        first.cancel()  # One caller giving up must not cancel the shared work
+        release.set()
+        results = await asyncio.gather(second, other_cutoff)
+
+    assert first.cancelled()
+    assert sorted(calls) == [(4242, "2024-03-01"), (4242, "2024-04-01")]
+    assert results[0]["teamNumber"] == 4242
+    assert await team_epa_cache.get(team_epa_key(4242, "2024-03-01")) is not None
+    team_epa_cache.reset()
+
+
+@pytest.mark.asyncio
+async def test_team_epa_computation_cancelled_when_every_caller_leaves():
+    team_epa_cache.reset()
+    cancelled = asyncio.Event()
+
+    async def fake_get_team_matches(self, team_number, start_date=None, failures=None):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with patch.object(EPACalculator, "get_team_matches", fake_get_team_matches):
+        waiter = asyncio.create_task(ParallelEPAProcessor().calculate_team_epa(4343))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    assert await team_epa_cache.get(team_epa_key(4343)) is None
+
+
+
+@pytest.mark.asyncio
+async def test_upstream_failure_is_not_cached_as_a_fresh_epa():
+    team_epa_cache.reset()
+    key = team_epa_key(1234, "2024-03-01")
+    team_epa_cache.set_local(key, {"teamNumber": 1234, "historicalEPA": 55.0, "matches": {}},
+                             stored_at=time.time() - team_epa_cache.ttl - 60)
+
+    async def unavailable(endpoint, params=None):
+        raise HTTPException(status_code=503, detail="FTC API unavailable (circuit open)")
+
+    with patch("epa_calculator.ftc_api_request", side_effect=unavailable):
+        results = await ParallelEPAProcessor().calculate_multiple_team_epas([1234], "2024-03-01")
+
+    # The last good value is served as stale and the failure never reaches the cache
+    assert results[0]["status"] == "stale" and results[0]["historicalEPA"] == 55.0
+    assert "503" in results[0]["error"]
+    stored_at, value = team_epa_cache.peek(key)
+    assert value["historicalEPA"] == 55.0 and stored_at < time.time() - team_epa_cache.ttl
+    team_epa_cache.reset()
+
+
+@pytest.mark.asyncio
+async def test_partially_fetched_epa_is_degraded_and_not_cached():
+    team_epa_cache.reset()
+    match = {"teams": [{"teamNumber": 1235, "station": "Red1"}, {"teamNumber": 2, "station": "Blue1"}],
+             "scoreRedFinal": 60, "scoreBlueFinal": 20}
+
+    async def newest_season_only(self, team_number, start_date=None, failures=None):
+        failures.append("2023: 500 upstream error")
+        return {2024: [match]}
+
+    with patch.object(EPACalculator, "get_team_matches", newest_season_only):
+        results = await ParallelEPAProcessor().calculate_multiple_team_epas([1235], "2024-03-01")
+
+    assert results[0]["status"] == "degraded"
+    assert results[0]["historicalEPA"] == EPACalculator().calculate_historical_epa({2024: [match]}, 1235)
+    assert team_epa_cache.peek(team_epa_key(1235, "2024-03-01")) is None
+
 if __name__ == "__main__":
     asyncio.run(test_multiple_team_epa_calculation())
     asyncio.run(test_match_prediction_parallelization())
@@ -0,0 +1,48 @@
+import json
+import os
+import httpx
+import pytest
+from fastapi import FastAPI
+import profiling
+from mock_ftc_api import create_mock_ftc_api
+from utils.api_utils import ftc_api_request, set_api_transport, response_cache
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    response_cache.reset()
+    mock_app = create_mock_ftc_api(num_teams=6, target_event_code="PROF", latency_ms=5)
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+
+    app = FastAPI()
+    app.middleware("http")(profiling.profiling_middleware)
+
+    @app.get("/teams")
+    async def teams():
+        return await ftc_api_request("/2024/teams", {"eventCode": "PROF"})
+
+    yield app
+    set_api_transport(None)
+
+@pytest.mark.asyncio
+async def test_profile_written_when_requested(profiled_app, tmp_path):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=profiled_app), base_url="http://test") as client:
+        response = await client.get("/teams", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert "upstream;dur=" in response.headers["Server-Timing"]
+    with open(os.path.join(tmp_path, f"{profile_id}.json")) as summary_file:
+        summary = json.load(summary_file)
+    assert summary["apiCalls"] == 1
+    assert summary["spans"][0]["endpoint"] == "/2024/teams"
+    assert summary["upstreamSeconds"] >= 0.005
+    assert os.path.exists(os.path.join(tmp_path, f"{profile_id}.folded"))
+
+@pytest.mark.asyncio
+async def test_unprofiled_requests_untouched(profiled_app, tmp_path):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=profiled_app), base_url="http://test") as client:
+        response = await client.get("/teams")
+
+    assert "X-Profile-Id" not in response.headers
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import pytest
+import rating_engine
+from epa_calculator import EPACalculator
+from match_store import match_store
+from rating_engine import (
+    SeasonRatings, clear_season_ratings, current_season_ratings, get_season_ratings, refresh_season_ratings,
+    season_match_stream
+)
+
+
+def make_match(number, red, blue, red_score, blue_score, when, level="QUALIFICATION"):
+    return {
+        "matchNumber": number, "tournamentLevel": level, "actualStartTime": when,
+        "teams": [{"teamNumber": red[0], "station": "Red1"}, {"teamNumber": red[1], "station": "Red2"},
+                  {"teamNumber": blue[0], "station": "Blue1"}, {"teamNumber": blue[1], "station": "Blue2"}],
+        "scoreRedFinal": red_score, "scoreBlueFinal": blue_score,
+    }
+
+
+EVENT_A = [
+    make_match(1, (1, 2), (3, 4), 100, 60, "2024-01-06T09:00:00"),
+    make_match(2, (1, 3), (2, 4), 90, 70, "2024-01-06T09:10:00"),
+    make_match(3, (1, 4), (2, 3), None, None, "2024-01-06T09:20:00"),
+]
+EVENT_B = [
+    make_match(1, (1, 5), (2, 6), 120, 40, "2024-02-03T09:00:00"),
+    make_match(1, (1, 5), (2, 6), 110, 50, "2024-02-03T14:00:00", level="PLAYOFF"),
+]
+
+
+@pytest.fixture
+def stored_season():
+    clear_season_ratings()
+    match_store.put_event(2024, "B", EVENT_B, {"code": "B", "dateStart": "2024-02-03T00:00:00"})
+    match_store.put_event(2024, "A", EVENT_A, {"code": "A", "dateStart": "2024-01-06T00:00:00"})
+    yield
+    match_store.clear()
+    clear_season_ratings()
+
+
+def test_stream_is_chronological_and_skips_unscored():
+    stream = season_match_stream([("B", None, EVENT_B), ("A", None, EVENT_A)])
+    assert [(code, match["matchNumber"], match["tournamentLevel"]) for code, _, match in stream] == [
+        ("A", 1, "QUALIFICATION"), ("A", 2, "QUALIFICATION"), ("B", 1, "QUALIFICATION"), ("B", 1, "PLAYOFF"),
+    ]
+
+
+def test_single_pass_updates_and_history():
+    ratings = SeasonRatings(2024, season_match_stream([("A", None, EVENT_A)]), k=0.5)
+    initial = (100 + 60 + 90 + 70) / 8
+    assert ratings.initial == initial
+    # Match 1: red predicted 2 * initial, scored 100
+    after_first = initial + 0.5 * (100 - 2 * initial) / 2
+    assert ratings.rating_after(1, 0) == pytest.approx(after_first)
+    assert ratings.rating_after(1, 1) == pytest.approx(ratings.rating(1))
+    assert ratings.rating_after(5, 1) is None
+    assert ratings.red_win_probability[0] == pytest.approx(0.5)
+    assert ratings.rating_after(3, 0) < initial < ratings.rating_after(2, 0)
+    # 1 and 3 (one winner, one loser) against 2 and 4 is an even matchup again
+    assert ratings.red_win_probability[1] == pytest.approx(0.5)
+    assert list(ratings.red_won) == [1.0, 1.0]
+
+
+def test_ratings_at_any_point_in_time(stored_season):
+    ratings = get_season_ratings(2024)
+    assert len(ratings) == 4
+    assert ratings.rating_at(1, "2024-01-01") is None
+    assert ratings.rating_at(1, "2024-01-06T09:05:00") == ratings.rating_after(1, 0)
+    assert ratings.rating_at(1, "2024-02-01") == ratings.rating_after(1, 1)
+    assert ratings.rating_at(1, "2025-01-01") == ratings.rating(1)
+    assert ratings.snapshot(0) == {team: ratings.rating_after(team, 0) for team in (1, 2, 3, 4)}
+
+    # Reused until the season's stored matches change
+    assert get_season_ratings(2024) is ratings
+    match_store.put_event(2024, "C", [make_match(1, (7, 8), (5, 6), 80, 80, "2024-03-01T09:00:00")])
+    assert get_season_ratings(2024) is not ratings
+
+
+def test_calculator_selects_rating_model(stored_season):
+    team_matches = {2024: [{**match, "eventCode": "A"} for match in EVENT_A[:2]]}
+    average = EPACalculator("average").calculate_historical_epa(team_matches, 1)
+    rating = EPACalculator("rating").calculate_historical_epa(team_matches, 1)
+    assert rating == pytest.approx(get_season_ratings(2024).rating_after(1, 1))
+    assert rating != pytest.approx(average)
+
+    # Matches missing from the store fall back to the average model
+    unstored = {2024: [{**match, "eventCode": "Z"} for match in EVENT_A[:2]]}
+    assert EPACalculator("rating").calculate_historical_epa(unstored, 1) == pytest.approx(
+        EPACalculator("average").calculate_historical_epa(unstored, 1))
+    with pytest.raises(ValueError):
+        EPACalculator("elo")
+
+
+def test_store_versions_change_on_every_put(stored_season):
+    version = match_store.version(2024)
+    updated = match_store.last_updated(2024)
+    match_store.put_event(2024, "A", EVENT_A)
+    assert match_store.version(2024) > version
+    assert match_store.last_updated(2024) >= updated
+    assert match_store.version(2023) == 0 and match_store.last_updated(2023) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_ratings_are_never_replayed_on_the_event_loop(stored_season, monkeypatch):
+    replay_threads = []
+    real_init = SeasonRatings.__init__
+
+    def recording_init(self, *args, **kwargs):
+        replay_threads.append(threading.current_thread())
+        real_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(rating_engine.SeasonRatings, "__init__", recording_init)
+    assert current_season_ratings(2024) is None
+    first, second = await asyncio.gather(refresh_season_ratings(2024), refresh_season_ratings(2024))
+    assert first is second and len(replay_threads) == 1
+
+    match_store.put_event(2024, "C", [make_match(1, (7, 8), (5, 6), 80, 80, "2024-03-01T09:00:00")])
+    # The stale replay is served while the new one runs in a worker thread
+    assert current_season_ratings(2024) is first
+    refreshed = await refresh_season_ratings(2024)
+    assert refreshed is not first and refreshed.rating(7) is not None
+    assert threading.main_thread() not in replay_threads
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_is_kept_and_its_failure_logged(stored_season, monkeypatch, capsys):
+    def failing_init(self, *args, **kwargs):
+        raise RuntimeError("replay failed")
+
+    monkeypatch.setattr(rating_engine.SeasonRatings, "__init__", failing_init)
+    assert current_season_ratings(2024) is None
+    (refresh,) = rating_engine._background_refreshes
+    await asyncio.wait([refresh])
+    await asyncio.sleep(0)
+
+    assert not rating_engine._background_refreshes
+    assert "Error refreshing season ratings: replay failed" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import httpx
+import pytest
+from alliance_matchmaker_fixed import AllianceMatchmaker
+from epa_calculator import EPACalculator
+from main import app
+from match_store import match_store
+from mock_ftc_api import SyntheticSeasonData, create_mock_ftc_api
+from season_table import accumulate_season, build_season_table, clear_season_tables
+from utils.api_utils import set_api_transport
+import warm_start
+
+@pytest.fixture
+def mock_api():
+    warm_start.clear_caches()
+    clear_season_tables()
+    mock_app = create_mock_ftc_api(num_teams=60, target_event_code="BOARD")
+    set_api_transport(httpx.ASGITransport(app=mock_app))
+    yield mock_app
+    set_api_transport(None)
+    clear_season_tables()
+    warm_start.clear_caches()
+
+def test_single_pass_matches_per_team_calculations():
+    data = SyntheticSeasonData(30, seed=5)
+    events = [{"code": event["code"], "matches": data.matches[event["code"]]} for event in data.events[2024]]
+    accumulators = accumulate_season(events)
+    calculator = EPACalculator()
+    matchmaker = AllianceMatchmaker()
+
+    for team in data.team_numbers[:10]:
+        quals = [match for event in events for match in event["matches"]
+                 if match["tournamentLevel"] == "QUALIFICATION"
+                 and any(slot["teamNumber"] == team for slot in match["teams"])]
+        if not quals:
+            continue
+        accumulator = accumulators[team]
+        assert accumulator.season_epa() == pytest.approx(calculator.calculate_season_epa(quals, team))
+        stats = matchmaker._calculate_team_stats({2024: quals}, team)
+        assert round(accumulator.auto / accumulator.matches, 1) == pytest.approx(stats["auto"], abs=0.051)
+        assert accumulator.matches == len(quals)
+
+@pytest.mark.asyncio
+async def test_leaderboard_sorting_filtering_and_paging(mock_api):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = (await client.get("/api/leaderboard/2024", params={"pageSize": 10})).json()
+        calls_after_build = sum(mock_api.state.calls.values())
+        second = (await client.get("/api/leaderboard/2024", params={"pageSize": 10, "page": 2})).json()
+        by_teleop = (await client.get("/api/leaderboard/2024", params={"sort": "teleop", "order": "asc"})).json()
+        state = first["teams"][0]["state"]
+        filtered = (await client.get("/api/leaderboard/2024", params={"state": state.lower(), "pageSize": 500})).json()
+        bad_sort = await client.get("/api/leaderboard/2024", params={"sort": "name"})
+
+    # Paging, sorting and filtering are served from the table without new upstream calls
+    assert sum(mock_api.state.calls.values()) == calls_after_build
+
+    epas = [team["epa"] for team in first["teams"] + second["teams"]]
+    assert epas == sorted(epas, reverse=True)
+    assert [team["rank"] for team in first["teams"] + second["teams"]] == list(range(1, 21))
+    assert first["teamCount"] >= 60 and first["pageTotal"] == -(-first["teamCount"] // 10)
+
+    teleop = [team["teleop"] for team in by_teleop["teams"]]
+    assert teleop == sorted(teleop)
+
+    assert filtered["teams"] and all(team["state"] == state for team in filtered["teams"])
+    assert filtered["teamCount"] == len(filtered["teams"]) < first["teamCount"]
+    assert bad_sort.status_code == 400
+
+@pytest.mark.asyncio
+async def test_table_rebuilds_when_store_changes(mock_api, monkeypatch):
+    import season_table
+    monkeypatch.setattr(season_table, "SEASON_TABLE_MIN_AGE", 0)
+    first = await season_table.get_season_table(2024)
+    assert await season_table.get_season_table(2024) is first
+
+    match_store.put_event(2024, "EXTRA", [{
+        "matchNumber": 1, "tournamentLevel": "QUALIFICATION", "scoreRedFinal": 500, "scoreBlueFinal": 0,
+        "teams": [{"teamNumber": 99999, "station": "Red1"}, {"teamNumber": 99998, "station": "Blue1"}],
+    }])
+    rebuilt = await season_table.get_season_table(2024)
+    assert rebuilt is not first
+    assert rebuilt.query(page_size=1)["teams"][0]["teamNumber"] == 99999
+    assert len(build_season_table(2024)) == len(rebuilt)
+
+@pytest.mark.asyncio
+async def test_refresh_waits_for_min_age(mock_api, monkeypatch):
+    import season_table
+    first = await season_table.get_season_table(2024)
+    assert await season_table.get_season_table(2024, refresh=True) is first
+
+    monkeypatch.setattr(season_table, "SEASON_TABLE_MIN_AGE", 0)
+    assert await season_table.get_season_table(2024, refresh=True) is not first
+
+@pytest.mark.asyncio
+async def test_events_stored_before_they_finished_are_refetched(mock_api):
+    import season_table
+    assert await season_table.load_season_matches(2024) > 0
+    assert await season_table.load_season_matches(2024) == 0
+
+    # Stored while still in progress: refetched from upstream, not from the response cache
+    record = match_store.get_event(2024, "BOARD")
+    record["updated"] = season_table.event_finished_at(record["event"]) - 3600
+    matches_calls = mock_api.state.calls["matches"]
+    assert await season_table.load_season_matches(2024) == 1
+    assert mock_api.state.calls["matches"] == matches_calls + 1
+    assert match_store.get_event(2024, "BOARD")["updated"] > record["updated"]
+
+def test_needs_refresh():
+    from season_table import needs_refresh
+    upcoming = {"code": "LATER", "dateEnd": "2999-01-01T00:00:00"}
+    assert needs_refresh(None, upcoming)
+    assert needs_refresh({"updated": 1e9, "event": upcoming}, upcoming)
+    finished = {"code": "DONE", "dateEnd": "2020-01-01T00:00:00"}
+    assert not needs_refresh({"updated": 1.8e9, "event": finished}, finished)
+    assert needs_refresh({"updated": 0.0, "event": None}, {"code": "NODATE"})
@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import patch
+from backtest import load_synthetic, run_backtest
+from epa_calculator import EPACalculator
+from match_store import match_store
+from rating_engine import SeasonRatings
+from sweep import SweepData, env_settings, grid_configs, random_configs, run_sweep
+
+SEASONS = [2022, 2023, 2024]
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    events = load_synthetic(60, seed=5)
+    match_store.clear()
+    return events, SweepData(events, SEASONS, [2023, 2024])
+
+
+def test_calculator_parameters_are_configurable():
+    matches = [
+        {"teams": [{"teamNumber": 1, "station": "Red1"}, {"teamNumber": 2, "station": "Blue1"}],
+         "scoreRedFinal": score, "scoreBlueFinal": 10}
+        for score in (10, 20, 40)
+    ]
+    flat = EPACalculator(recency_slope=0.0).calculate_season_epa(matches, 1)
+    assert flat == pytest.approx(sum(score * (1 + 10 / score) for score in (10, 20, 40)) / 3)
+    assert EPACalculator(recency_slope=1.0).calculate_season_epa(matches, 1) > flat
+    calculator = EPACalculator(divisor=100, year_weights={2024: 1.0})
+    assert calculator.calculate_match_win_probability([1], [2], {"1": 100.0, "2": 0.0})["red_win_probability"] == 0.909
+    assert calculator.calculate_historical_epa({2023: matches}, 1) == 0.0
+
+
+@pytest.mark.parametrize("model", ["average", "rating"])
+def test_sweep_evaluation_matches_backtest(synthetic, model):
+    events, data = synthetic
+    config = {"yearWeights": {2024: 1.0, 2023: 0.6, 2022: 0.3}, "recencySlope": 0.4, "k": 0.3, "divisor": 150.0}
+    calculator_settings = {"year_weights": config["yearWeights"], "recency_slope": 0.4, "k": 0.3, "divisor": 150.0}
+    metrics = data.evaluate(config, model)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr("backtest.EPACalculator", lambda model: EPACalculator(model, **calculator_settings))
+        expected = run_backtest(seasons=[2023, 2024], model=model, events=events)["overall"]
+    assert metrics["matches"] == expected["matches"]
+    assert metrics["brier"] == pytest.approx(expected["brier"], abs=1e-4)
+    assert metrics["logLoss"] == pytest.approx(expected["logLoss"], abs=1e-4)
+    assert metrics["accuracy"] == pytest.approx(expected["accuracy"], abs=1e-4)
+
+
+def test_sweep_ranks_settings(synthetic):
+    _, data = synthetic
+    configs = grid_configs([{2024: 1.0, 2023: 0.7, 2022: 0.5}], [0.0, 0.2], [0.2], [50.0, 400.0, 5000.0])
+    results = run_sweep(data, configs, workers=2, metric="brier")
+    assert [result["rank"] for result in results] == list(range(1, 7))
+    assert [result["brier"] for result in results] == sorted(result["brier"] for result in results)
+    # A huge divisor predicts every match as a coin flip
+    assert results[-1]["divisor"] == 5000.0
+    assert all(result["earlyBrier"] is not None and result["calibrationError"] >= 0 for result in results)
+
+
+def test_rating_sweep_replays_once_per_k(synthetic):
+    _, data = synthetic
+    configs = grid_configs([{2024: 1.0, 2023: 0.5}], [0.0, 0.3], [0.2, 0.4], [150.0])
+    with patch("sweep.SeasonRatings", wraps=SeasonRatings) as replay:
+        results = run_sweep(data, configs[::-1], model="rating")
+    assert len(results) == 4
+    assert replay.call_count == 2 * len(SEASONS)
+
+
+def test_random_configs_and_env_settings():
+    configs = random_configs(5, SEASONS, seed=1)
+    assert len(configs) == 5
+    assert all(config["yearWeights"][2024] == 1.0 >= config["yearWeights"][2023] >= config["yearWeights"][2022]
+               for config in configs)
+    settings = env_settings({"yearWeights": {2024: 1.0, 2023: 0.5}, "recencySlope": 0.1, "k": 0.3, "divisor": 200.0},
+                            "rating")
+    assert settings["FTC_EPA_YEAR_WEIGHTS"] == "2024:1.0,2023:0.5"
+    assert settings["FTC_RATING_K"] == "0.3"
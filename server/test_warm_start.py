@@ -0,0 +1,42 @@
+import time
+import pytest
+import warm_start
+from epa_parallel import team_epa_cache
+from match_store import match_store
+from utils.api_utils import response_cache
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    warm_start.clear_caches()
+    yield
+    warm_start.clear_caches()
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    response_cache.set_local("/2024/teams?{}", b'{"teams": []}')
+    team_epa_cache.set_local("12345@2024-03-01", {"teamNumber": 12345, "historicalEPA": 42.0, "matches": {}})
+    match_store.put_event(2024, "USCAFFFAQ", [
+        {"matchNumber": 1, "teams": [{"teamNumber": 12345, "station": "Red1"}, {"teamNumber": 6789, "station": "Blue1"}]}
+    ])
+
+    counts = warm_start.save_snapshot(path)
+    warm_start.clear_caches()
+    assert warm_start.load_snapshot(path)
+
+    assert counts == {"responses": 1, "teamEPAs": 1, "events": 1}
+    assert response_cache.get_local("/2024/teams?{}") == b'{"teams": []}'
+    assert team_epa_cache.get_local("12345@2024-03-01")["historicalEPA"] == 42.0
+    assert match_store.team_events(2024, 6789) == ["USCAFFFAQ"]
+
+def test_snapshot_keeps_entry_age(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    response_cache.set_local("old", b"{}", stored_at=time.time() - response_cache.ttl - 1)
+    warm_start.save_snapshot(path)
+    warm_start.clear_caches()
+    warm_start.load_snapshot(path)
+
+    assert response_cache.get_local("old") is None
+    assert response_cache.peek("old") is not None
+
+def test_missing_snapshot(tmp_path):
+    assert warm_start.load_snapshot(str(tmp_path / "missing.pkl")) is False
@@ -3,12 +3,125 @@ from dotenv import load_dotenv
 import base64
 import httpx
 import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict
 from fastapi import HTTPException
+from utils.cache import create_cache, request_key
+from utils.cassette import get_active_cassette, RECORD, REPLAY
+from utils.request_stats import current_request_stats, clear_request_stats
+from utils.deadline import start_deadline, time_remaining
+from utils.circuit_breaker import api_breaker, is_upstream_failure
 
 load_dotenv()
 
-async def ftc_api_request(endpoint: str, params: dict | None = None, max_retries: int = 3):
-    FTC_API_BASE_URL = "https://ftc-api.firstinspires.org/v2.0"
+# Optional transport override used to point the client at a local mock API
+# (see mock_ftc_api.py / benchmark_suite.py). None means the real network.
+_api_transport: httpx.AsyncBaseTransport | None = None
+
+# Raw response bodies keyed by request; parsed per hit so callers can mutate results freely
+RESPONSE_CACHE_TTL = float(os.getenv("FTC_CACHE_TTL", "600"))
+# Expired responses younger than this are served immediately while a background refresh runs
+RESPONSE_STALE_TTL = float(os.getenv("FTC_CACHE_STALE_TTL", "86400"))
+response_cache = create_cache("responses", RESPONSE_CACHE_TTL, RESPONSE_STALE_TTL)
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+# Upper bound on concurrent HTTP requests to the FTC API across the whole process
+API_CONCURRENCY = int(os.getenv("FTC_API_CONCURRENCY", "20"))
+_api_limiters: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+def api_limiter() -> asyncio.Semaphore:
+    """The process-wide request limiter for the running event loop."""
+    loop = asyncio.get_running_loop()
+    limiter = _api_limiters.get(loop)
+    if limiter is None:
+        # Semaphores are bound to one loop; drop limiters of loops that have finished
+        for stale_loop in [other for other in _api_limiters if other.is_closed()]:
+            del _api_limiters[stale_loop]
+        limiter = _api_limiters[loop] = asyncio.Semaphore(API_CONCURRENCY)
+    return limiter
+
+def set_api_transport(transport: httpx.AsyncBaseTransport | None):
+    """Route every ftc_api_request through the given httpx transport (None restores the network)."""
+    global _api_transport
+    _api_transport = transport
+
+async def ftc_api_request(endpoint: str, params: dict | None = None, max_retries: int = 3,
+                          bypass_cache: bool = False):
+    """GET an FTC API endpoint through the response cache.
+
+    bypass_cache skips cached and stale responses (the fresh response is still cached) for
+    callers that must see the latest upstream data.
+    """
+    # Under a request deadline the whole call (limiter wait, retries, backoff) must finish in time
+    remaining = time_remaining()
+    if remaining is None:
+        return await _ftc_api_request(endpoint, params, max_retries, bypass_cache=bypass_cache)
+    if remaining <= 0:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(_ftc_api_request(endpoint, params, max_retries, remaining, bypass_cache),
+                                      remaining)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+
+async def _ftc_api_request(endpoint: str, params: dict | None, max_retries: int, budget: float | None = None,
+                           bypass_cache: bool = False):
+    stats = current_request_stats()
+    cassette = get_active_cassette()
+    if cassette is not None and cassette.mode == REPLAY:
+        replay_start = time.perf_counter()
+        try:
+            return await cassette.replay(endpoint, params)
+        finally:
+            if stats is not None:
+                stats.record_api_call(endpoint, time.perf_counter() - replay_start)
+
+    cache_key = request_key(endpoint, params)
+    if bypass_cache:
+        return await _fetch_upstream(endpoint, params, cache_key, max_retries, budget)
+    cached_body = await response_cache.get(cache_key)
+    if cached_body is not None:
+        if stats is not None:
+            entry = response_cache.peek(cache_key)
+            stats.record_cache_hit(time.time() - entry[0] if entry else 0.0)
+        return json.loads(cached_body)
+
+    # Stale-while-revalidate: an expired response is served at once and refreshed in the background
+    stale = response_cache.peek(cache_key)
+    if stale is not None and time.time() - stale[0] <= RESPONSE_STALE_TTL:
+        stored_at, stale_body = stale
+        if not api_breaker.is_open():
+            _schedule_refresh(endpoint, params, cache_key)
+        if stats is not None:
+            stats.record_cache_hit(time.time() - stored_at, stale=True)
+        return json.loads(stale_body)
+
+    return await _fetch_upstream(endpoint, params, cache_key, max_retries, budget)
+
+def _schedule_refresh(endpoint: str, params: dict | None, cache_key: str):
+    running = _refresh_tasks.get(cache_key)
+    if running is not None and not running.done() and running.get_loop() is asyncio.get_running_loop():
+        return
+    _refresh_tasks[cache_key] = asyncio.create_task(_refresh_response(endpoint, params, cache_key))
+
+async def _refresh_response(endpoint: str, params: dict | None, cache_key: str):
+    # Runs outside the triggering request: no deadline, no stats attribution
+    start_deadline(None)
+    clear_request_stats()
+    try:
+        await _fetch_upstream(endpoint, params, cache_key, max_retries=1)
+    except Exception as e:
+        print(f"Background refresh of {endpoint} failed: {str(e)}")
+    finally:
+        _refresh_tasks.pop(cache_key, None)
+
+async def _fetch_upstream(endpoint: str, params: dict | None, cache_key: str, max_retries: int,
+                          budget: float | None = None):
+    stats = current_request_stats()
+    cassette = get_active_cassette()
+    FTC_API_BASE_URL = os.getenv("FTC_API_BASE_URL", "https://ftc-api.firstinspires.org/v2.0")
     FTC_USERNAME = os.getenv("FTC_API_USERNAME")
     FTC_AUTH_KEY = os.getenv("FTC_API_KEY")
 
@@ -21,23 +134,84 @@ async def ftc_api_request(endpoint: str, params: dict | None = None, max_retries
     }
     
     timeout = httpx.Timeout(10.0, connect=5.0)
+    if budget is not None:
+        timeout = httpx.Timeout(min(10.0, budget), connect=min(5.0, budget))
     for attempt in range(max_retries):
+        if not api_breaker.allow_request():
+            raise HTTPException(status_code=503, detail="FTC API unavailable (circuit open)")
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(
-                    f"{FTC_API_BASE_URL}{endpoint}",
-                    headers=headers,
-                    params=params
-                )
+            async with httpx.AsyncClient(timeout=timeout, transport=_api_transport) as client:
+                async with api_limiter():
+                    request_start = time.perf_counter()
+                    response = await client.get(
+                        f"{FTC_API_BASE_URL}{endpoint}",
+                        headers=headers,
+                        params=params
+                    )
+                    latency = time.perf_counter() - request_start
+                if cassette is not None and cassette.mode == RECORD:
+                    body = response.json() if response.is_success else response.text
+                    cassette.record(endpoint, params, response.status_code, latency, body)
+                if is_upstream_failure(response.status_code):
+                    api_breaker.record_failure()
+                else:
+                    api_breaker.record_success()
+                if stats is not None and not response.is_success:
+                    stats.record_api_call(endpoint, latency, status=response.status_code)
                 response.raise_for_status()
-                return response.json()
+                parse_start = time.perf_counter()
+                data = response.json()
+                await response_cache.set(cache_key, response.content)
+                if stats is not None:
+                    stats.record_api_call(endpoint, latency, time.perf_counter() - parse_start, response.status_code)
+                return data
         except httpx.TimeoutException:
+            api_breaker.record_failure()
             if attempt == max_retries - 1:
                 raise HTTPException(status_code=504, detail="Request timed out after multiple retries")
             await asyncio.sleep(2 ** attempt)  # Exponential backoff
         except httpx.HTTPError as e:
             if isinstance(e, httpx.HTTPStatusError):
                 raise HTTPException(status_code=e.response.status_code, detail=str(e))
+            api_breaker.record_failure()
             if attempt == max_retries - 1:
                 raise HTTPException(status_code=500, detail=str(e))
-            await asyncio.sleep(2 ** attempt)
\ No newline at end of file
+            await asyncio.sleep(2 ** attempt)
+
+
+async def ftc_api_paginate(endpoint: str, records_key: str, params: dict | None = None,
+                           window: int | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every record of a paginated list endpoint, page by page, in order.
+
+    Page 1 is fetched first to read pageTotal; the remaining pages are fetched
+    concurrently (at most `window` pages ahead, each through the request
+    limiter) and their records yielded as soon as every earlier page is done,
+    so only the pages in the window are held in memory. Endpoints without
+    page metadata yield the records of the single response.
+    """
+    window = max(1, window or API_CONCURRENCY)
+    params = {key: value for key, value in (params or {}).items() if key != "page"}
+    first_page = await ftc_api_request(endpoint, {**params, "page": 1})
+    if not isinstance(first_page, dict):
+        return
+    for record in first_page.get(records_key) or []:
+        yield record
+    page_total = int(first_page.get("pageTotal") or 1)
+    del first_page
+
+    pending: deque = deque()
+    next_page = 2
+    try:
+        while next_page <= page_total or pending:
+            while next_page <= page_total and len(pending) < window:
+                pending.append(asyncio.create_task(ftc_api_request(endpoint, {**params, "page": next_page})))
+                next_page += 1
+            page = await pending.popleft()
+            for record in (page or {}).get(records_key) or []:
+                yield record
+    finally:
+        # The consumer stopped early (or a page failed): don't leave requests running
+        for task in pending:
+            task.cancel()
+        # Wait for them to finish so none outlives the generator or leaves an unretrieved exception
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,455 @@
+"""
+Cache backends shared by the API client and the EPA layer.
+
+Every backend implements the same async interface (get, get_many, set,
+set_many, delete, clear). get_many/set_many are batched so that remote
+backends resolve a whole batch in one round trip.
+
+* MemoryCache - per-process dict with TTLs; also the L1 tier of every cache.
+* DiskCache   - SQLite file shared by all processes on one host.
+* RedisCache  - any server speaking the Redis protocol (RESP), shared across
+                hosts; commands for a batch are pipelined on one connection.
+
+create_cache() picks the shared tier from the environment and always puts a
+MemoryCache in front of it:
+
+    FTC_CACHE_BACKEND   memory (default) | disk | redis
+    FTC_CACHE_DIR       directory for the disk backend (default cache/)
+    FTC_REDIS_URL       redis://[:password@]host:port/db (default redis://localhost:6379/0)
+"""
+import asyncio
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Hashable, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def request_key(endpoint: str, params: dict | None) -> str:
+    """Canonical cache key for an FTC API request; None-valued params are ignored."""
+    clean = {key: str(value) for key, value in (params or {}).items() if value is not None}
+    return f"{endpoint}?{json.dumps(clean, sort_keys=True, separators=(',', ':'))}"
+
+
+class CacheBackend:
+    """Async cache interface. Keys are strings; values are any picklable object."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        """Like get_many, but each value comes with the time it was stored."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any):
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """Dict-backed cache whose entries expire `ttl` seconds after being stored.
+
+    Expired entries stay visible to peek() (for stale fallbacks) until they are
+    `retention` seconds old (default: ttl), then they are evicted when touched
+    and by a sweep at most every PRUNE_INTERVAL seconds. Timestamps are
+    wall-clock so entries keep their age across a warm-start restore. The
+    *_local/peek/dump/load/reset/prune helpers are synchronous.
+    """
+
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self, ttl: float, retention: Optional[float] = None):
+        super().__init__(ttl)
+        self.retention = max(ttl, retention if retention is not None else ttl)
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._pruned_at = time.time()
+
+    def _live_entry(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.retention:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get_local(self, key: Hashable) -> Optional[Any]:
+        entry = self._live_entry(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.time() - stored_at > self.ttl:
+            return None
+        return value
+
+    def set_local(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        self._entries[key] = (stored_at if stored_at is not None else time.time(), value)
+        if time.time() - self._pruned_at > self.PRUNE_INTERVAL:
+            self.prune()
+
+    def peek(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """Return (stored_at, value) even if the entry has expired (but is still retained)."""
+        return self._live_entry(key)
+
+    def prune(self) -> int:
+        """Evict every entry past retention; returns how many were dropped."""
+        now = time.time()
+        self._pruned_at = now
+        dead = [key for key, (stored_at, _) in self._entries.items() if now - stored_at > self.retention]
+        for key in dead:
+            del self._entries[key]
+        return len(dead)
+
+    def dump(self) -> Dict[Hashable, Tuple[float, Any]]:
+        now = time.time()
+        return {key: entry for key, entry in self._entries.items() if now - entry[0] <= self.retention}
+
+    def load(self, entries: Iterable[Tuple[Hashable, Tuple[float, Any]]]):
+        now = time.time()
+        for key, entry in entries:
+            if now - entry[0] <= self.retention:
+                self._entries[key] = entry
+
+    def reset(self):
+        self._entries.clear()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        for key in keys:
+            value = self.get_local(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        found = {}
+        for key in keys:
+            entry = self._live_entry(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl:
+                found[key] = entry
+        return found
+
+    async def set_many(self, items: Dict[str, Any]):
+        for key, value in items.items():
+            self.set_local(key, value)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(CacheBackend):
+    """SQLite-backed cache; one file per namespace, safe for several worker processes.
+
+    Queries run in a thread (a locked database can block for up to the 5s busy
+    timeout) and expired rows are deleted at most every PRUNE_INTERVAL seconds.
+    """
+
+    BATCH = 500  # SQLite's default limit on bound parameters is 999
+    PRUNE_INTERVAL = 300.0
+
+    def __init__(self, path: str, ttl: float):
+        super().__init__(ttl)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored_at REAL, value BLOB)")
+        self._db_lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def _get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        found = {}
+        oldest = time.time() - self.ttl
+        with self._db_lock:
+            for start in range(0, len(keys), self.BATCH):
+                batch = keys[start:start + self.BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, stored_at, value FROM cache WHERE stored_at >= ? AND key IN ({','.join('?' * len(batch))})",
+                    [oldest, *batch],
+                ).fetchall()
+                for key, stored_at, value in rows:
+                    found[key] = (stored_at, pickle.loads(value))
+        return found
+
+    def _set_many(self, items: Dict[str, Any]):
+        now = time.time()
+        rows = [(key, now, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for key, value in items.items()]
+        with self._db_lock:
+            self._db.executemany("INSERT OR REPLACE INTO cache (key, stored_at, value) VALUES (?, ?, ?)", rows)
+            if now - self._pruned_at > self.PRUNE_INTERVAL:
+                self._prune(now)
+
+    def _prune(self, now: float) -> int:
+        self._pruned_at = now
+        return self._db.execute("DELETE FROM cache WHERE stored_at < ?", (now - self.ttl,)).rowcount
+
+    def _execute(self, sql: str, params: Tuple = ()):
+        with self._db_lock:
+            self._db.execute(sql, params)
+
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        if not keys:
+            return {}
+        return await asyncio.to_thread(self._get_entries, keys)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        return {key: value for key, (_, value) in (await self.get_entries(keys)).items()}
+
+    async def set_many(self, items: Dict[str, Any]):
+        if items:
+            await asyncio.to_thread(self._set_many, items)
+
+    async def prune(self) -> int:
+        """Delete every expired row; returns how many were removed."""
+        def prune():
+            with self._db_lock:
+                return self._prune(time.time())
+        return await asyncio.to_thread(prune)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM cache WHERE key = ?", (key,))
+
+    async def clear(self):
+        await asyncio.to_thread(self._execute, "DELETE FROM cache")
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(CacheBackend):
+    """Minimal pipelined RESP client; keys are prefixed with `<namespace>:`."""
+
+    def __init__(self, url: str, ttl: float, namespace: str):
+        super().__init__(ttl)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self.namespace = namespace
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _key(self, key: str) -> bytes:
+        return f"{self.namespace}:{key}".encode()
+
+    @staticmethod
+    def _encode(command: List[Any]) -> bytes:
+        parts = [f"*{len(command)}\r\n".encode()]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            return RedisError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            return None if count < 0 else [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(["AUTH", self.password])
+        if self.db:
+            setup.append(["SELECT", self.db])
+        if setup:
+            await self._send(setup)
+
+    async def _send(self, commands: List[List[Any]]) -> List[Any]:
+        self._writer.write(b"".join(self._encode(command) for command in commands))
+        await self._writer.drain()
+        replies = [await self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def pipeline(self, commands: List[List[Any]]) -> List[Any]:
+        """Send all commands in one write and read every reply: one network round trip."""
+        if not commands:
+            return []
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections and locks are bound to the loop that created them
+            self._loop, self._lock, self._writer = loop, asyncio.Lock(), None
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                await self._connect()
+            try:
+                return await self._send(commands)
+            except RedisError:
+                raise
+            except BaseException:
+                # Cancelled or failed between write and read: unread replies would be taken by the next
+                # command, so the connection is dropped
+                writer, self._writer = self._writer, None
+                if writer is not None:
+                    writer.close()
+                raise
+
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        if not keys:
+            return {}
+        (values,) = await self.pipeline([["MGET", *[self._key(key) for key in keys]]])
+        found = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            entry = pickle.loads(value)
+            # Values are stored as (stored_at, value); anything else predates that and is a miss
+            if isinstance(entry, tuple) and len(entry) == 2 and isinstance(entry[0], float):
+                found[key] = entry
+        return found
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        return {key: value for key, (_, value) in (await self.get_entries(keys)).items()}
+
+    async def set_many(self, items: Dict[str, Any]):
+        expire = max(1, math.ceil(self.ttl))
+        now = time.time()
+        await self.pipeline([
+            ["SET", self._key(key), pickle.dumps((now, value), protocol=pickle.HIGHEST_PROTOCOL), "EX", expire]
+            for key, value in items.items()
+        ])
+
+    async def delete(self, key: str):
+        await self.pipeline([["DEL", self._key(key)]])
+
+    async def clear(self):
+        cursor = b"0"
+        while True:
+            (reply,) = await self.pipeline([["SCAN", cursor, "MATCH", f"{self.namespace}:*", "COUNT", 1000]])
+            cursor, keys = reply
+            if keys:
+                await self.pipeline([["DEL", *keys]])
+            if cursor in (b"0", "0"):
+                break
+
+
+class TieredCache(CacheBackend):
+    """A per-process MemoryCache in front of a shared backend."""
+
+    def __init__(self, local: MemoryCache, shared: CacheBackend):
+        super().__init__(local.ttl)
+        self.local = local
+        self.shared = shared
+
+    def get_local(self, key: Hashable) -> Optional[Any]:
+        return self.local.get_local(key)
+
+    def set_local(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        self.local.set_local(key, value, stored_at)
+
+    def peek(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        return self.local.peek(key)
+
+    def dump(self) -> Dict[Hashable, Tuple[float, Any]]:
+        return self.local.dump()
+
+    def load(self, entries: Iterable[Tuple[Hashable, Tuple[float, Any]]]):
+        self.local.load(entries)
+
+    def prune(self) -> int:
+        return self.local.prune()
+
+    def reset(self):
+        self.local.reset()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = await self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            try:
+                shared = await self.shared.get_entries(missing)
+            except Exception as e:
+                print(f"Shared cache read failed: {str(e)}")
+                shared = {}
+            for key, (stored_at, value) in shared.items():
+                # Keep the shared entry's age so it expires locally when it does there
+                self.local.set_local(key, value, stored_at)
+                found[key] = value
+        return found
+
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[float, Any]]:
+        await self.get_many(keys)
+        return await self.local.get_entries(keys)
+
+    async def set_many(self, items: Dict[str, Any]):
+        await self.local.set_many(items)
+        try:
+            await self.shared.set_many(items)
+        except Exception as e:
+            print(f"Shared cache write failed: {str(e)}")
+
+    async def delete(self, key: str):
+        await self.local.delete(key)
+        await self.shared.delete(key)
+
+    async def clear(self):
+        await self.local.clear()
+        await self.shared.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+def create_cache(namespace: str, ttl: float, retention: Optional[float] = None) -> CacheBackend:
+    """Build the cache for one namespace according to FTC_CACHE_BACKEND.
+
+    `retention` is how long expired entries stay available to peek() in the
+    per-process tier (default: evicted once expired).
+    """
+    backend = os.getenv("FTC_CACHE_BACKEND", "memory").lower()
+    local = MemoryCache(ttl, retention)
+    if backend == "disk":
+        directory = os.getenv("FTC_CACHE_DIR", "cache")
+        return TieredCache(local, DiskCache(os.path.join(directory, f"{namespace}.sqlite3"), ttl))
+    if backend == "redis":
+        url = os.getenv("FTC_REDIS_URL", "redis://localhost:6379/0")
+        return TieredCache(local, RedisCache(url, ttl, namespace))
+    return local
@@ -0,0 +1,133 @@
+"""
+Record/replay cassettes for ftc_api_request.
+
+In record mode every upstream response (endpoint, params, status, latency and
+body) is appended to a gzip-compressed JSON-lines file. In replay mode the
+same responses are served from that file, optionally sleeping for the
+original (or scaled) latency, so investigations and regression tests can run
+offline against real-shaped data.
+
+Enable from the environment:
+    FTC_CASSETTE_MODE=record|replay
+    FTC_CASSETTE_PATH=cassettes/event.jsonl.gz
+    FTC_CASSETTE_LATENCY_SCALE=1.0   (replay only, 0 disables the delay)
+"""
+import asyncio
+import atexit
+import gzip
+import json
+import os
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+from fastapi import HTTPException
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+def cassette_key(endpoint: str, params: dict | None) -> Tuple[str, str]:
+    """Canonical lookup key; None-valued params are dropped as httpx would send them empty."""
+    clean = {key: str(value) for key, value in (params or {}).items() if value is not None}
+    return endpoint, json.dumps(clean, sort_keys=True, separators=(",", ":"))
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._writer = None
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._loaded = False
+
+    def _load(self):
+        entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        with gzip.open(self.path, "rt", encoding="utf-8") as cassette_file:
+            try:
+                for line in cassette_file:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"Skipping truncated cassette record in {self.path}")
+                        continue
+                    entries[cassette_key(entry["endpoint"], entry.get("params"))].append(entry)
+            except (EOFError, gzip.BadGzipFile, zlib.error):
+                # A recorder killed mid-write leaves a truncated last gzip member; keep the complete records
+                print(f"Cassette {self.path} ends in a truncated stream; using the records before it")
+        self._entries = entries
+        self._loaded = True
+        print(f"Loaded {sum(len(v) for v in self._entries.values())} cassette entries from {self.path}")
+
+    def record(self, endpoint: str, params: dict | None, status: int, latency: float, body: Any):
+        """Append one upstream response to the cassette."""
+        if self._writer is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = gzip.open(self.path, "at", encoding="utf-8")
+        entry = {
+            "endpoint": endpoint,
+            "params": {key: value for key, value in (params or {}).items() if value is not None},
+            "status": status,
+            "latency": round(latency, 4),
+            "body": body,
+        }
+        self._writer.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._writer.flush()
+
+    async def replay(self, endpoint: str, params: dict | None) -> Any:
+        """Serve a recorded response, repeating the last one once a key's recordings are exhausted."""
+        if not self._loaded:
+            self._load()
+        key = cassette_key(endpoint, params)
+        entries = self._entries.get(key)
+        if not entries:
+            raise HTTPException(status_code=404, detail=f"No cassette entry for {endpoint} {key[1]}")
+        position = self._positions[key]
+        entry = entries[min(position, len(entries) - 1)]
+        self._positions[key] = position + 1
+        if self.latency_scale > 0 and entry.get("latency"):
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        if entry.get("status", 200) >= 400:
+            raise HTTPException(status_code=entry["status"], detail=str(entry.get("body")))
+        return entry["body"]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+_active_cassette: Optional[Cassette] = None
+_env_checked = False
+
+
+def set_cassette(cassette: Optional[Cassette]):
+    """Install (or with None, remove) the cassette used by ftc_api_request."""
+    global _active_cassette, _env_checked
+    if _active_cassette is not None and _active_cassette is not cassette:
+        _active_cassette.close()
+    _active_cassette = cassette
+    _env_checked = True
+
+
+def get_active_cassette() -> Optional[Cassette]:
+    """Return the installed cassette, creating it from FTC_CASSETTE_* on first use."""
+    global _active_cassette, _env_checked
+    if not _env_checked:
+        _env_checked = True
+        mode = os.getenv("FTC_CASSETTE_MODE")
+        if mode:
+            _active_cassette = Cassette(
+                os.getenv("FTC_CASSETTE_PATH", "cassettes/ftc_api.jsonl.gz"),
+                mode.lower(),
+                float(os.getenv("FTC_CASSETTE_LATENCY_SCALE", "1.0")),
+            )
+            atexit.register(_active_cassette.close)
+    return _active_cassette
@@ -0,0 +1,82 @@
+"""
+Circuit breaker for the upstream FTC API.
+
+closed     every request goes upstream; consecutive failures are counted
+open       after `failure_threshold` consecutive failures; requests fail fast
+           (or are served from stale cache) for `reset_timeout` seconds
+half-open  after the timeout one probe request is let through; success
+           closes the circuit, failure opens it again
+
+Only upstream trouble counts as failure (5xx, 429, timeouts, connection
+errors); 4xx answers such as 404 mean the API is healthy.
+"""
+import os
+import time
+from typing import Dict, Any
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def is_upstream_failure(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def _probe_available(self, now: float) -> bool:
+        # A probe that never reported back (e.g. cancelled) is replaced after reset_timeout
+        return self.probe_started is None or now - self.probe_started >= self.reset_timeout
+
+    def allow_request(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probe_started = None
+        if self.state == HALF_OPEN and self._probe_available(now):
+            self.probe_started = now
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        """True while requests would be rejected (does not consume the half-open probe)."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            return now - self.opened_at < self.reset_timeout
+        return self.state == HALF_OPEN and not self._probe_available(now)
+
+    def record_success(self):
+        if self.state != CLOSED:
+            print("FTC API circuit closed")
+        self.reset()
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"FTC API circuit opened after {self.failures} consecutive failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures}
+
+
+api_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("FTC_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("FTC_BREAKER_RESET", "30")),
+)
@@ -0,0 +1,45 @@
+"""
+Per-request latency budgets.
+
+An endpoint runs under `with request_deadline(seconds):`; the absolute
+deadline lives in a context variable, so every task it spawns (asyncio.gather,
+create_task) sees the same deadline, and it is restored on exit so a handler
+called from another route does not leave its deadline behind.
+ftc_api_request caps its timeouts and retries to the time remaining and fails
+fast with a 504 once it has passed. start_deadline sets (or clears) it for
+the rest of the current context, e.g. in background tasks.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(seconds: Optional[float]) -> Optional[float]:
+    """Set a deadline `seconds` from now for the current context (None or <= 0 clears it)."""
+    deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+    _deadline.set(deadline)
+    return deadline
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Run the block under a deadline `seconds` from now, restoring the previous one afterwards."""
+    token = _deadline.set(time.monotonic() + seconds if seconds and seconds > 0 else None)
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_expired() -> bool:
+    remaining = time_remaining()
+    return remaining is not None and remaining <= 0
@@ -0,0 +1,35 @@
+"""
+Downsampling of chart series.
+
+lttb_indices implements Largest-Triangle-Three-Buckets (Steinarsson, 2013):
+the first and last points are kept and every bucket in between contributes the
+point forming the largest triangle with the previously kept point and the
+average of the next bucket. Peaks and turning points survive, so a long
+series can be sent with a few hundred points and still chart the same shape.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of at most `threshold` points to keep (all of them when the series is short enough)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    every = (count - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        areas = np.abs((x[anchor] - average_x) * (y[start:end] - y[anchor])
+                       - (x[anchor] - x[start:end]) * (average_y - y[anchor]))
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    selected[-1] = count - 1
+    return selected
@@ -0,0 +1,72 @@
+"""
+Per-request accounting shared between the API client and middleware.
+
+A RequestStats object is installed in a context variable at the start of an
+HTTP request; ftc_api_request and the EPA layer add to it. Tasks spawned with
+asyncio.gather inherit the same object, so totals cover the whole request.
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.api_calls = 0
+        self.upstream_seconds = 0.0
+        self.json_seconds = 0.0
+        self.cache_hits = 0
+        self.stale_hits = 0
+        self.max_data_age: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+
+    def record_api_call(self, endpoint: str, upstream_seconds: float, json_seconds: float = 0.0,
+                        status: Optional[int] = None):
+        self.api_calls += 1
+        self.upstream_seconds += upstream_seconds
+        self.json_seconds += json_seconds
+        self.spans.append({
+            "name": "ftc_api_request",
+            "endpoint": endpoint,
+            "offset": round(time.perf_counter() - self.started - upstream_seconds - json_seconds, 6),
+            "upstream": round(upstream_seconds, 6),
+            "json": round(json_seconds, 6),
+            "status": status,
+        })
+
+    def record_cache_hit(self, age_seconds: float, stale: bool = False):
+        """A response served from cache; `stale` when past its TTL (stale-while-revalidate)."""
+        self.cache_hits += 1
+        self.stale_hits += int(stale)
+        self.max_data_age = max(self.max_data_age or 0.0, age_seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "apiCalls": self.api_calls,
+            "upstreamSeconds": round(self.upstream_seconds, 6),
+            "jsonSeconds": round(self.json_seconds, 6),
+            "elapsedSeconds": round(time.perf_counter() - self.started, 6),
+            "cacheHits": self.cache_hits,
+            "staleHits": self.stale_hits,
+            "maxDataAgeSeconds": None if self.max_data_age is None else round(self.max_data_age, 3),
+        }
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request_stats() -> RequestStats:
+    """Install a fresh RequestStats for the current context and return it."""
+    stats = RequestStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def clear_request_stats():
+    """Detach the current context (e.g. a background task) from the request's stats."""
+    _request_stats.set(None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
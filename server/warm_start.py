@@ -0,0 +1,111 @@
+"""
+Warm-start snapshots of the in-process caches.
+
+On shutdown (and every FTC_SNAPSHOT_INTERVAL seconds) the in-memory tier of
+the response cache, the computed team EPA cache and the local match store are written to a single
+pickle file; on startup it is loaded back so the first requests after a deploy
+hit warm caches. Pickle keeps loading to a single binary read with no JSON
+re-parsing. Entries keep their original timestamps, so TTLs still apply.
+
+    FTC_SNAPSHOT_PATH      snapshot file (default cache/warm_start.pkl)
+    FTC_SNAPSHOT_INTERVAL  seconds between periodic snapshots, 0 to disable
+    FTC_SNAPSHOT_ENABLED   set to 0 to disable loading and saving entirely
+"""
+import asyncio
+import os
+import pickle
+import time
+from typing import Dict, Any
+from epa_parallel import team_epa_cache
+from event_predictions import event_prediction_cache
+from match_store import match_store
+from utils.api_utils import response_cache
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ENABLED = os.getenv("FTC_SNAPSHOT_ENABLED", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_PATH = os.getenv("FTC_SNAPSHOT_PATH", os.path.join("cache", "warm_start.pkl"))
+SNAPSHOT_INTERVAL = float(os.getenv("FTC_SNAPSHOT_INTERVAL", "600"))
+
+
+def clear_caches():
+    """Drop every in-process cache (used by benchmarks to measure cold paths)."""
+    response_cache.reset()
+    team_epa_cache.reset()
+    event_prediction_cache.reset()
+    match_store.clear()
+
+
+async def clear_all_caches():
+    """Like clear_caches, but also empties shared (disk/Redis) cache tiers."""
+    await response_cache.clear()
+    await team_epa_cache.clear()
+    await event_prediction_cache.clear()
+    match_store.clear()
+
+
+def build_snapshot() -> Dict[str, Any]:
+    """Shallow-copy every cache; cheap enough to run on the event loop."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "savedAt": time.time(),
+        "responses": response_cache.dump(),
+        "teamEPAs": team_epa_cache.dump(),
+        "matchStore": match_store.dump(),
+    }
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: str = SNAPSHOT_PATH) -> Dict[str, Any]:
+    """Atomically pickle a snapshot to `path` and return entry counts."""
+    start_time = time.time()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        pickle.dump(snapshot, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    counts = {
+        "responses": len(snapshot["responses"]),
+        "teamEPAs": len(snapshot["teamEPAs"]),
+        "events": len(snapshot["matchStore"]),
+    }
+    print(f"Saved warm-start snapshot {counts} to {path} in {time.time() - start_time:.2f} seconds")
+    return counts
+
+
+def save_snapshot(path: str = SNAPSHOT_PATH) -> Dict[str, Any]:
+    return write_snapshot(build_snapshot(), path)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> bool:
+    """Load a snapshot written by save_snapshot; returns False if none could be used."""
+    if not os.path.exists(path):
+        print(f"No warm-start snapshot at {path}")
+        return False
+    start_time = time.time()
+    try:
+        with open(path, "rb") as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+    except Exception as e:
+        print(f"Error loading warm-start snapshot {path}: {str(e)}")
+        return False
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        print(f"Ignoring warm-start snapshot with version {snapshot.get('version')}")
+        return False
+    response_cache.load(snapshot["responses"].items())
+    team_epa_cache.load(snapshot["teamEPAs"].items())
+    match_store.load(snapshot["matchStore"])
+    print(f"Loaded warm-start snapshot from {path} in {time.time() - start_time:.2f} seconds "
+          f"({len(response_cache)} responses, {len(team_epa_cache)} team EPAs, {len(match_store)} events)")
+    return True
+
+
+async def periodic_snapshots(interval: float = SNAPSHOT_INTERVAL, path: str = SNAPSHOT_PATH):
+    """Background task that saves a snapshot every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Copy on the loop, pickle in a worker thread so requests are not blocked
+            await asyncio.to_thread(write_snapshot, build_snapshot(), path)
+        except Exception as e:
+            print(f"Error saving periodic warm-start snapshot: {str(e)}")
@@ -200,11 +200,13 @@ class FTCApi {
         }
     }
 
-    async getEventPredictionsAndEPA(season, eventCode) {
+    async getEventPredictionsAndEPA(season, eventCode, sinceVersion = null) {
         try {
+            // With sinceVersion the server may answer with only the changes (response.delta === true)
             const response = await this.axiosInstance.post('/event-predictions-epa', {
                 season,
-                eventCode
+                eventCode,
+                ...(sinceVersion ? { sinceVersion } : {})
             });
             return response.data;
         } catch (error) {